@@ -0,0 +1,105 @@
+"""
+Benchmark: cache backend lookups against a local Redis stand-in
+Compares per-key round trips with pipelined bulk reads and the near-cache
+
+Starts utils.resp_server.LocalRespServer in-process on a free port (or
+uses --url for a real server), fills it with segment-sized values and
+reads them back:
+
+    get x N        one round trip per key (what a naive client does)
+    get_many       one MGET for all keys (TTSScheduler.prepare)
+    near get x N   NearCache after the first read: no round trip
+    memory get x N InProcessCache, the default backend
+
+Each variant first checks that every value comes back intact.
+
+Usage:
+    cd backend
+    python benchmarks/bench_cache_backend.py [--keys 8] [--rounds 500] [--url redis://host:6379/0]
+"""
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+from urllib.parse import urlparse
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from utils.cache_backend import InProcessCache, NearCache, RedisCache
+from utils.resp_server import LocalRespServer
+
+
+async def timed(rounds: int, call) -> float:
+    """Median-free simple timing: total seconds for `rounds` awaited calls"""
+    start = time.perf_counter()
+    for _ in range(rounds):
+        await call()
+    return time.perf_counter() - start
+
+
+async def run(keys: int, rounds: int, url: str):
+    server = None
+    if url:
+        parsed = urlparse(url)
+        remote = RedisCache(parsed.hostname, parsed.port or 6379, int(parsed.path.lstrip('/') or 0), parsed.password, prefix="bench:")
+    else:
+        server = LocalRespServer()
+        port = await server.start()
+        remote = RedisCache(port=port, prefix="bench:")
+
+    values = {f"audio:seg_ur_{i:020d}.mp3": bytes([i % 256]) * 8000 for i in range(keys)}
+    names = list(values)
+    await remote.set_many(values, ttl=60)
+    near = NearCache(remote, InProcessCache(), ttl=30)
+    memory = InProcessCache()
+    await memory.set_many(values)
+
+    # Correctness first
+    assert [await remote.get(k) for k in names] == list(values.values()), "get returned wrong values"
+    assert await remote.get_many(names) == values, "get_many returned wrong values"
+    assert await near.get_many(names) == values, "near-cache returned wrong values"
+    assert await remote.get("missing") is None
+    assert remote.get_stats()['errors'] == 0
+
+    async def per_key():
+        for key in names:
+            await remote.get(key)
+
+    async def near_per_key():
+        for key in names:
+            await near.get(key)
+
+    async def memory_per_key():
+        for key in names:
+            await memory.get(key)
+
+    results = [
+        (f"get x {keys}", await timed(rounds, per_key)),
+        ("get_many (one MGET)", await timed(rounds, lambda: remote.get_many(names))),
+        (f"near get x {keys}", await timed(rounds, near_per_key)),
+        (f"memory get x {keys}", await timed(rounds, memory_per_key)),
+    ]
+
+    print(f"Server: {url or 'local stand-in'}, keys per lookup: {keys} x 8 KB, rounds: {rounds}")
+    print(f"{'':24}{'µs/lookup':>12}{'speedup':>10}")
+    baseline = results[0][1]
+    for name, seconds in results:
+        print(f"{name:24}{seconds / rounds * 1e6:12.1f}{baseline / seconds:10.1f}")
+    print(f"Round trips: {remote.get_stats()['round_trips']}")
+
+    await remote.close()
+    if server is not None:
+        await server.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--keys", type=int, default=8, help="Keys per lookup (sentences in a response)")
+    parser.add_argument("--rounds", type=int, default=500, help="Lookups per variant")
+    parser.add_argument("--url", default="", help="redis:// URL of a real server instead of the stand-in")
+    args = parser.parse_args()
+    asyncio.run(run(args.keys, args.rounds, args.url))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,405 @@
+"""
+Micro-benchmarks for the request hot paths
+
+Covers IntentDetector.detect_intent and _extract_entities, interim
+transcripts matched by rescanning vs. with an IncrementalMatcher,
+ResponseGenerator.generate_response, the detect_language, clean_text
+and cleanup_old_files helpers and AudioIndex eviction. Intent patterns, response templates, jokes
+and the audio directory are replaced by synthetic corpora scaled to 1x,
+10x, 100x and 1000x their current size. Text inputs come in two
+lengths: short utterances and 500-character inputs.
+
+Results are written as JSON, one file per run, tagged with the git commit.
+Pass --compare with an older file to print per-case ratios. The exit code
+is 1 when any case got slower than --threshold.
+
+Service logging is raised to WARNING while measuring so the numbers cover
+the code itself (logging cost is measured by bench_logging.py).
+
+Usage:
+    cd backend
+    python benchmarks/bench_hot_paths.py                       # all scales
+    python benchmarks/bench_hot_paths.py --scales 1,10 --budget 0.2
+    python benchmarks/bench_hot_paths.py --compare benchmarks/results/<old>.json
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from config import MAX_AUDIO_FILES  # noqa: E402
+from services.intent_detector import IntentDetector  # noqa: E402
+from services.response_generator import ResponseGenerator  # noqa: E402
+from utils.helpers import clean_text, detect_language, cleanup_old_files  # noqa: E402
+from utils.audio_index import AudioIndex  # noqa: E402
+
+RESULTS_DIR = BACKEND_DIR / "benchmarks" / "results"
+DEFAULT_SCALES = (1, 10, 100, 1000)
+LONG_INPUT_CHARS = 500
+ROUNDS = 5
+
+SHORT_INPUTS = [
+    "السلام علیکم",
+    "وقت کیا ہوا ہے؟",
+    "کراچی میں موسم کیسا ہے؟",
+    "کوئی لطیفہ سناؤ",
+    "Hello, how are you?",
+    "fajr ki namaz kab hai",
+    "some random gibberish xyz123",
+]
+
+# Filler used to pad inputs to LONG_INPUT_CHARS without adding keywords
+_FILLER_WORDS = ["اور", "پھر", "ہم", "نے", "یہ", "بات", "کہی", "the", "and", "then", "we", "said", "this"]
+
+_URDU_LETTERS = "ابپتٹثجچحخدڈذرڑزژسشصضطظعغفقکگلمنوہیے"
+
+
+def make_long_inputs(rng: random.Random) -> List[str]:
+    """Pad each short input with filler words to LONG_INPUT_CHARS characters"""
+    inputs = []
+    for text in SHORT_INPUTS:
+        words = [text]
+        while sum(len(w) + 1 for w in words) < LONG_INPUT_CHARS:
+            words.insert(rng.randrange(len(words) + 1), rng.choice(_FILLER_WORDS))
+        inputs.append(" ".join(words)[:LONG_INPUT_CHARS])
+    return inputs
+
+
+def _synthetic_word(rng: random.Random) -> str:
+    """A random Urdu-script word that does not occur in the inputs"""
+    return "".join(rng.choice(_URDU_LETTERS) for _ in range(rng.randint(4, 8)))
+
+
+def scale_patterns(patterns: Dict, scale: int, rng: random.Random) -> Dict:
+    """
+    Build a pattern set `scale` times the size of the real one
+
+    The real intents and keywords are kept, so real inputs still match;
+    (scale - 1) copies of each intent with synthetic keywords are added.
+    """
+    scaled = dict(patterns)
+    for copy in range(1, scale):
+        for name, data in patterns.items():
+            keywords = data.get('keywords', [])
+            scaled[f"{name}_{copy}"] = {
+                'keywords': [_synthetic_word(rng) for _ in keywords],
+                'confidence': data.get('confidence', 0.5)
+            }
+    return scaled
+
+
+def scale_responses(responses: Dict, jokes: Dict, scale: int):
+    """Repeat every response list and the joke list `scale` times"""
+    scaled = {
+        category: (values * scale if isinstance(values, list) else values)
+        for category, values in responses.items()
+    }
+    return scaled, {'jokes': jokes['jokes'] * scale}
+
+
+class Case:
+    """One benchmark: a callable run over a cycle of inputs"""
+
+    def __init__(self, name: str, params: Dict, func: Callable, inputs: List,
+                 setup: Callable = None, teardown: Callable = None):
+        self.name = name
+        self.params = params
+        self.func = func
+        self.inputs = inputs
+        self.setup = setup
+        self.teardown = teardown
+        self._next = 0
+
+    @property
+    def key(self) -> str:
+        params = ",".join(f"{k}={v}" for k, v in self.params.items())
+        return f"{self.name}[{params}]"
+
+    def _time(self, iterations: int) -> float:
+        # Keep cycling across rounds so slow cases still see every input
+        func, inputs = self.func, self.inputs
+        count, offset = len(inputs), self._next
+        start = time.perf_counter()
+        for i in range(offset, offset + iterations):
+            func(inputs[i % count])
+        elapsed = time.perf_counter() - start
+        self._next = (offset + iterations) % count
+        return elapsed
+
+    def run(self, budget: float) -> Dict:
+        """
+        Calibrate iterations to fill `budget` seconds, then time ROUNDS rounds
+
+        Returns:
+            Result dictionary with per-call times in microseconds
+        """
+        if self.setup:
+            self.setup()
+        try:
+            # Calibrate: grow until one round takes budget / ROUNDS
+            iterations = 1
+            target = budget / ROUNDS
+            while True:
+                elapsed = self._time(iterations)
+                if elapsed >= target or iterations >= 1_000_000:
+                    break
+                iterations = max(iterations * 2, int(iterations * target / max(elapsed, 1e-9)))
+            rounds = [self._time(iterations) / iterations * 1e6 for _ in range(ROUNDS)]
+        finally:
+            if self.teardown:
+                self.teardown()
+        return {
+            'name': self.name,
+            'params': self.params,
+            'iterations': iterations,
+            'rounds': ROUNDS,
+            'median_us': round(statistics.median(rounds), 3),
+            'min_us': round(min(rounds), 3),
+            'mean_us': round(statistics.mean(rounds), 3),
+            'stdev_us': round(statistics.stdev(rounds), 3) if len(rounds) > 1 else 0.0
+        }
+
+
+def _word_prefixes(text: str) -> List[str]:
+    """Interim transcripts of text: every prefix ending on a word"""
+    words = text.split()
+    return [" ".join(words[:i]) for i in range(1, len(words) + 1)]
+
+
+def _match_incrementally(detector: IntentDetector, prefixes: List[str]):
+    matcher = detector.incremental_matcher()
+    for text in prefixes:
+        matcher.update(text)
+    return matcher.result()
+
+
+def build_cases(scales: List[int], seed: int) -> List[Case]:
+    """Create every benchmark case for the requested scales"""
+    rng = random.Random(seed)
+    short_inputs = SHORT_INPUTS
+    long_inputs = make_long_inputs(rng)
+    lengths = {'short': short_inputs, 'long': long_inputs}
+    cases = []
+
+    # Text helpers and entity extraction do not depend on corpus size
+    detector = IntentDetector()
+    for length, inputs in lengths.items():
+        cases.append(Case('helpers.clean_text', {'input': length}, clean_text, inputs))
+        cases.append(Case('helpers.detect_language', {'input': length}, detect_language, inputs))
+        lowered = [clean_text(text).lower() for text in inputs]
+        cases.append(Case(
+            'intent._extract_entities', {'input': length},
+            lambda text: detector._extract_entities(text, 'weather'), lowered
+        ))
+
+    base_patterns = dict(detector.patterns)
+    generator = ResponseGenerator()
+    base_responses, base_jokes = generator.responses, generator.jokes
+    intents = list(ResponseGenerator.STATIC_RESPONSE_CATEGORIES) + ['time', 'date', 'joke']
+    users = [f"user_{i}" for i in range(50)] + [None]
+
+    for scale in scales:
+        scaled_detector = IntentDetector.__new__(IntentDetector)
+        scaled_detector.patterns = scale_patterns(base_patterns, scale, rng)
+        scaled_detector.version = 0
+        scaled_detector.compile_patterns()
+        for length, inputs in lengths.items():
+            cases.append(Case(
+                'intent.detect_intent', {'scale': scale, 'input': length},
+                scaled_detector.detect_intent, inputs
+            ))
+            # One utterance per input, arriving as word-by-word interim transcripts
+            interims = [_word_prefixes(text) for text in inputs]
+            cases.append(Case(
+                'intent.interim_transcripts', {'scale': scale, 'input': length, 'mode': 'rescan'},
+                lambda prefixes, d=scaled_detector: [d.detect_intent(text) for text in prefixes], interims
+            ))
+            cases.append(Case(
+                'intent.interim_transcripts', {'scale': scale, 'input': length, 'mode': 'incremental'},
+                lambda prefixes, d=scaled_detector: _match_incrementally(d, prefixes), interims
+            ))
+
+        scaled_generator = ResponseGenerator.__new__(ResponseGenerator)
+        scaled_generator.__dict__.update(generator.__dict__)
+        scaled_generator.responses, scaled_generator.jokes = scale_responses(base_responses, base_jokes, scale)
+        scaled_generator._joke_cursors = type(generator._joke_cursors)()
+        calls = [(intent, {'user_id': users[i % len(users)]}) for i, intent in enumerate(intents * 4)]
+        cases.append(Case(
+            'response.generate_response', {'scale': scale},
+            lambda call, g=scaled_generator: g.generate_response(call[0], 0.9, {}, call[1]), calls
+        ))
+
+        cases.append(_cleanup_case(MAX_AUDIO_FILES * scale))
+        cases.append(_audio_index_case(MAX_AUDIO_FILES * scale))
+
+    return cases
+
+
+def _cleanup_case(max_files: int) -> Case:
+    """
+    cleanup_old_files on a directory holding one file over the limit
+
+    Each call deletes the oldest file; the call input recreates one file
+    first so every iteration does a full scan plus one deletion.
+    """
+    state = {}
+
+    def setup():
+        state['tmp'] = tempfile.TemporaryDirectory()
+        state['dir'] = Path(state['tmp'].name)
+        for i in range(max_files):
+            (state['dir'] / f"seed_{i}.mp3").write_bytes(b"x")
+        state['next'] = 0
+
+    def call(_):
+        (state['dir'] / f"new_{state['next']}.mp3").write_bytes(b"x")
+        state['next'] += 1
+        cleanup_old_files(state['dir'], max_files=max_files)
+
+    def teardown():
+        state['tmp'].cleanup()
+
+    return Case('helpers.cleanup_old_files', {'files': max_files}, call, [None], setup, teardown)
+
+
+def _audio_index_case(max_files: int) -> Case:
+    """
+    AudioIndex.record + evict, the same work as _cleanup_case without the scan
+
+    Each call records one new file and evicts the least recently used one
+    (grace period off), through the shared SQLite index.
+    """
+    state = {}
+
+    def setup():
+        state['tmp'] = tempfile.TemporaryDirectory()
+        state['dir'] = Path(state['tmp'].name)
+        for i in range(max_files):
+            (state['dir'] / f"seed_{i}.mp3").write_bytes(b"x")
+        state['index'] = AudioIndex(state['dir'], grace_seconds=0)
+        state['next'] = 0
+
+    def call(_):
+        name = f"new_{state['next']}.mp3"
+        (state['dir'] / name).write_bytes(b"x")
+        state['next'] += 1
+        state['index'].record(name)
+        state['index'].evict(max_files)
+
+    def teardown():
+        state['tmp'].cleanup()
+
+    return Case('audio_index.record_evict', {'files': max_files}, call, [None], setup, teardown)
+
+
+def run_metadata(scales: List[int]) -> Dict:
+    """Describe the environment and commit the results belong to"""
+    def git(*args):
+        try:
+            return subprocess.run(
+                ['git', *args], cwd=BACKEND_DIR, capture_output=True, text=True, timeout=10
+            ).stdout.strip()
+        except Exception:
+            return ''
+
+    return {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'commit': git('rev-parse', '--short', 'HEAD') or None,
+        'dirty': bool(git('status', '--porcelain', '--untracked-files=no')),
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'scales': scales
+    }
+
+
+def compare(current: Dict, baseline: Dict, threshold: float) -> bool:
+    """
+    Print median ratios against a baseline run
+
+    Returns:
+        True if any case regressed by more than `threshold`
+    """
+    def keyed(run):
+        return {
+            f"{r['name']}[{','.join(f'{k}={v}' for k, v in r['params'].items())}]": r
+            for r in run['results']
+        }
+
+    old, new = keyed(baseline), keyed(current)
+    regressed = False
+    print(f"\nCompared with {baseline['meta'].get('commit')} ({baseline['meta'].get('timestamp')})")
+    print(f"{'case':58}{'old µs':>12}{'new µs':>12}{'ratio':>8}")
+    for key, result in new.items():
+        if key not in old:
+            continue
+        ratio = result['median_us'] / old[key]['median_us'] if old[key]['median_us'] else 1.0
+        flag = ""
+        if ratio > 1 + threshold:
+            flag = "  ⚠️ slower"
+            regressed = True
+        elif ratio < 1 - threshold:
+            flag = "  ✅ faster"
+        print(f"{key:58}{old[key]['median_us']:>12}{result['median_us']:>12}{ratio:>8.2f}{flag}")
+    return regressed
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Hot path micro-benchmarks")
+    parser.add_argument("--scales", default=",".join(map(str, DEFAULT_SCALES)),
+                        help="Corpus scale factors, comma separated")
+    parser.add_argument("--budget", type=float, default=0.5, help="Seconds of timing per case")
+    parser.add_argument("--filter", default="", help="Only run cases whose name contains this")
+    parser.add_argument("--seed", type=int, default=1, help="Seed for synthetic corpora")
+    parser.add_argument("--output", help="Result file (default benchmarks/results/<timestamp>_<commit>.json)")
+    parser.add_argument("--compare", help="Earlier result file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Relative slowdown counted as regression")
+    args = parser.parse_args(argv)
+
+    scales = [int(s) for s in args.scales.split(",") if s.strip()]
+    for name in ('services.intent_detector', 'services.response_generator', 'utils.helpers'):
+        logging.getLogger(name).setLevel(logging.WARNING)
+
+    meta = run_metadata(scales)
+    results = []
+    print(f"{'case':58}{'iterations':>12}{'median µs':>14}{'min µs':>12}")
+    for case in build_cases(scales, args.seed):
+        if args.filter and args.filter not in case.name:
+            continue
+        result = case.run(args.budget)
+        results.append(result)
+        print(f"{case.key:58}{result['iterations']:>12}{result['median_us']:>14}{result['min_us']:>12}",
+              flush=True)
+
+    run = {'meta': meta, 'results': results}
+    output = Path(args.output) if args.output else (
+        RESULTS_DIR / f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{meta['commit'] or 'nogit'}.json"
+    )
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(run, ensure_ascii=False, indent=2), encoding='utf-8')
+    print(f"\n📄 Results written to {output}")
+
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text(encoding='utf-8'))
+        if compare(run, baseline, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,143 @@
+"""
+Benchmark: per-request logging overhead
+Compares the old setup (one synchronous FileHandler per module) with the
+queue-based setup (QueueHandler per module, one listener thread writing a
+single daily file)
+
+Reports wall time and CPU time spent on the request thread. --stall-ms
+simulates a slow disk by sleeping on every flush; the synchronous setup
+pays that on the request thread, the queued setup does not.
+
+Usage:
+    cd backend
+    python benchmarks/bench_logging.py [--requests 20000] [--stall-ms 0]
+"""
+import argparse
+import logging
+import logging.handlers
+import queue
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from config import LOG_FORMAT, LOG_DATE_FORMAT
+from utils.logger import DailyFileHandler, _InProcessQueueHandler
+
+# Modules that log on every request and how many INFO lines each writes
+MODULES = {
+    "main": 2,
+    "services.command_service": 5,
+    "services.intent_detector": 1,
+    "services.response_generator": 1,
+    "services.speech_service": 1,
+}
+
+
+def _make_loggers(prefix: str, handler_factory):
+    """Create one logger per module with handlers from handler_factory"""
+    loggers = []
+    for module, lines in MODULES.items():
+        logger = logging.getLogger(f"{prefix}.{module}")
+        logger.handlers.clear()
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+        logger.addHandler(handler_factory())
+        loggers.append((logger, lines))
+    return loggers
+
+
+class _StallingMixin:
+    """Sleep on every flush to imitate a slow or contended disk"""
+    stall = 0.0
+
+    def flush(self):
+        super().flush()
+        if self.stall:
+            time.sleep(self.stall)
+
+
+class StallingFileHandler(_StallingMixin, logging.FileHandler):
+    pass
+
+
+class StallingDailyFileHandler(_StallingMixin, DailyFileHandler):
+    pass
+
+
+def _run(loggers, requests: int):
+    """Log one request's worth of lines `requests` times; return (wall, cpu) seconds"""
+    text = "السلام علیکم، کیا حال ہے؟"
+    start = time.perf_counter()
+    cpu_start = time.thread_time()
+    for i in range(requests):
+        for logger, lines in loggers:
+            for _ in range(lines):
+                logger.info(f"⚡ Processing command: '{text}' (user: user_{i})")
+    return time.perf_counter() - start, time.thread_time() - cpu_start
+
+
+def bench_sync(directory: Path, requests: int, stall: float):
+    """Old behaviour: every module owns a FileHandler on the same file"""
+    formatter = logging.Formatter(fmt=LOG_FORMAT, datefmt=LOG_DATE_FORMAT)
+
+    def factory():
+        handler = StallingFileHandler(directory / "sync.log", encoding='utf-8', mode='a')
+        handler.stall = stall
+        handler.setFormatter(formatter)
+        return handler
+
+    loggers = _make_loggers("bench_sync", factory)
+    elapsed = _run(loggers, requests)
+    for logger, _ in loggers:
+        for handler in logger.handlers:
+            handler.close()
+    return elapsed
+
+
+def bench_queued(directory: Path, requests: int, stall: float):
+    """New behaviour: QueueHandler per module, one listener owns the file"""
+    formatter = logging.Formatter(fmt=LOG_FORMAT, datefmt=LOG_DATE_FORMAT)
+    log_queue = queue.SimpleQueue()
+    file_handler = StallingDailyFileHandler(directory, prefix="queued")
+    file_handler.stall = stall
+    file_handler.setFormatter(formatter)
+    listener = logging.handlers.QueueListener(log_queue, file_handler)
+    listener.start()
+
+    loggers = _make_loggers("bench_queued", lambda: _InProcessQueueHandler(log_queue))
+    elapsed = _run(loggers, requests)
+
+    drain_start = time.perf_counter()
+    listener.stop()
+    drain = time.perf_counter() - drain_start
+    file_handler.close()
+    return elapsed, drain
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=20000, help="Simulated requests")
+    parser.add_argument("--stall-ms", type=float, default=0.0, help="Simulated disk stall per flush")
+    args = parser.parse_args()
+
+    stall = args.stall_ms / 1000
+    lines_per_request = sum(MODULES.values())
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = Path(tmp)
+        sync_wall, sync_cpu = bench_sync(directory, args.requests, stall)
+        (queued_wall, queued_cpu), drain = bench_queued(directory, args.requests, stall)
+
+    def per_request(seconds):
+        return seconds / args.requests * 1e6
+
+    print(f"Requests: {args.requests}, log lines per request: {lines_per_request}, stall: {args.stall_ms} ms")
+    print(f"{'':30}{'wall µs/req':>14}{'cpu µs/req':>14}")
+    print(f"{'sync FileHandler per module':30}{per_request(sync_wall):14.1f}{per_request(sync_cpu):14.1f}")
+    print(f"{'QueueHandler + listener':30}{per_request(queued_wall):14.1f}{per_request(queued_cpu):14.1f}")
+    print(f"Listener drain after run: {drain * 1000:.1f} ms (background thread)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Benchmark: per-request response serialization cost of /process-command
+Compares the old path with the fast path
+
+Old path: CommandResponse(...) is validated in the handler, then FastAPI
+validates it again against response_model, runs jsonable_encoder and
+renders it with the standard JSONResponse.
+
+Fast path: the handler puts the service result, which it trusts, straight
+into a dict shaped like CommandResponse and renders it with
+FastJSONResponse (orjson when installed). The stdlib row shows the same
+path without orjson. The model_construct row is here because skipping
+validation that way is no cheaper under pydantic 2.5: model_construct
+runs in Python and costs more than the compiled validator.
+
+Usage:
+    cd backend
+    python benchmarks/bench_serialization.py [--requests 20000]
+"""
+import argparse
+import asyncio
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from unittest import mock
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from models.schemas import CommandResponse
+from utils import json_response
+from utils.json_response import FastJSONResponse
+
+# A typical service result: one long Urdu sentence plus metadata
+RESULT = {
+    'response_text': "السلام علیکم! میں آپ کا اردو وائس اسسٹنٹ ہوں۔ آج کراچی میں موسم صاف ہے اور درجہ حرارت 32 ڈگری ہے۔",
+    'audio_file': "speech_3f2a9c0d1e4b5a6c7d8e.mp3",
+    'intent': "weather",
+    'confidence': 0.92,
+    'language': "ur",
+}
+
+
+async def bench_old(requests: int) -> float:
+    """Validate in the handler, re-validate via response_model, render with JSONResponse"""
+    field = create_response_field(name="Response_process_command", type_=CommandResponse)
+    start = time.perf_counter()
+    for _ in range(requests):
+        response = CommandResponse(**RESULT, timestamp=datetime.now())
+        content = await serialize_response(field=field, response_content=response, is_coroutine=True)
+        JSONResponse(content).body
+    return time.perf_counter() - start
+
+
+def bench_construct(requests: int) -> float:
+    """model_construct without validation, model_dump, FastJSONResponse"""
+    start = time.perf_counter()
+    for _ in range(requests):
+        response = CommandResponse.model_construct(**RESULT, timestamp=datetime.now())
+        FastJSONResponse(response.model_dump()).body
+    return time.perf_counter() - start
+
+
+def bench_fast(requests: int) -> float:
+    """Plain dict from the service result, FastJSONResponse"""
+    start = time.perf_counter()
+    for _ in range(requests):
+        FastJSONResponse({
+            'response_text': RESULT['response_text'],
+            'audio_file': RESULT['audio_file'],
+            'intent': RESULT['intent'],
+            'confidence': RESULT['confidence'],
+            'language': RESULT['language'],
+            'timestamp': datetime.now()
+        }).body
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=20000, help="Serialized responses per variant")
+    args = parser.parse_args()
+
+    old = asyncio.run(bench_old(args.requests))
+    construct = bench_construct(args.requests)
+    fast = bench_fast(args.requests)
+    with mock.patch.object(json_response, "orjson", None):
+        fast_stdlib = bench_fast(args.requests)
+
+    def per_request(seconds):
+        return seconds / args.requests * 1e6
+
+    print(f"Requests: {args.requests}, orjson: {'yes' if json_response.orjson else 'not installed'}")
+    print(f"{'':44}{'µs/req':>10}{'speedup':>10}")
+    print(f"{'validate + response_model + JSONResponse':44}{per_request(old):10.2f}{1:10.2f}")
+    print(f"{'model_construct + FastJSONResponse':44}{per_request(construct):10.2f}{old / construct:10.2f}")
+    print(f"{'dict + FastJSONResponse':44}{per_request(fast):10.2f}{old / fast:10.2f}")
+    print(f"{'dict + FastJSONResponse (stdlib json)':44}{per_request(fast_stdlib):10.2f}{old / fast_stdlib:10.2f}")
+
+
+if __name__ == "__main__":
+    main()
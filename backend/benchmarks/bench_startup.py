@@ -0,0 +1,88 @@
+"""
+Benchmark: cold start, from process start to the first served request
+Starts the app in fresh interpreters and reports the startup milestones
+
+Each run is a new Python process that imports main, runs the lifespan
+startup and serves GET /health in-process. The milestones come from
+utils.startup.StartupTimer (ms since process start):
+
+    main_imported   config, FastAPI, services and utilities imported
+                    (includes the test client, ~0.1-0.2 s, imported first)
+    services_ready  sub-services built and the TTS scheduler started
+    ready           lifespan startup finished
+    first_request   first response sent
+
+The exit code is 1 when the median first_request exceeds the budget
+(STARTUP_BUDGET_MS, or --budget-ms).
+
+Usage:
+    cd backend
+    python benchmarks/bench_startup.py [--runs 5] [--budget-ms 3000]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+from config import STARTUP_BUDGET_MS  # noqa: E402
+
+MILESTONES = ('main_imported', 'services_ready', 'ready', 'first_request')
+
+# Runs inside each fresh interpreter; prints the timer stats as the last line
+_DRIVER = """
+import json, sys
+from fastapi.testclient import TestClient
+import main
+with TestClient(main.app) as client:
+    gtts_imported = 'gtts' in sys.modules
+    client.get('/health')
+    stats = main.startup_timer.get_stats()
+stats['gtts_imported'] = gtts_imported
+print(json.dumps(stats))
+"""
+
+
+def run_once(env: dict) -> dict:
+    """Start one fresh interpreter and return its startup stats"""
+    result = subprocess.run(
+        [sys.executable, "-c", _DRIVER],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=5, help="Fresh processes to start")
+    parser.add_argument("--budget-ms", type=float, default=STARTUP_BUDGET_MS, help="Allowed median first_request")
+    args = parser.parse_args()
+
+    env = dict(os.environ, LOG_LEVEL="WARNING", LOOP_MONITOR_ENABLED="false")
+    env.setdefault("TTS_BACKEND", "offline")
+
+    runs = [run_once(env) for _ in range(args.runs)]
+
+    print(f"Runs: {args.runs}, measured from: {runs[0]['measured_from']}, TTS backend: {env['TTS_BACKEND']}")
+    print(f"{'milestone':18}{'median ms':>12}{'min ms':>10}{'max ms':>10}")
+    medians = {}
+    for name in MILESTONES:
+        values = [run['milestones_ms'][name] for run in runs if name in run['milestones_ms']]
+        if not values:
+            continue
+        medians[name] = statistics.median(values)
+        print(f"{name:18}{medians[name]:12.1f}{min(values):10.1f}{max(values):10.1f}")
+    print(f"gTTS imported during startup: {any(run['gtts_imported'] for run in runs)}")
+
+    first = medians.get('first_request', float('inf'))
+    verdict = "within" if first <= args.budget_ms else "OVER"
+    print(f"Median first request {first:.0f} ms - {verdict} budget of {args.budget_ms:.0f} ms")
+    sys.exit(0 if first <= args.budget_ms else 1)
+
+
+if __name__ == "__main__":
+    main()
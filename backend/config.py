@@ -1,6 +1,9 @@
 """
 Configuration file for Urdu Voice Assistant
 Handles all application settings and paths
+
+Importing this module has no side effects: it only reads environment
+variables. The application calls ensure_directories() when it starts.
 """
 
 import os
@@ -15,6 +18,7 @@ API_VERSION = "1.0.0"
 API_PREFIX = "/api/v1"
 PROJECT_NAME = "Urdu Voice Assistant"
 PROJECT_DESCRIPTION = "Production-ready Urdu Voice Assistant for Pakistani users"
+STATIC_PAYLOAD_MAX_AGE = int(os.getenv("STATIC_PAYLOAD_MAX_AGE", "0"))  # Cache-Control for /, /commands, /intents (0 = always revalidate)
 
 # CORS Settings
 CORS_ORIGINS = [
@@ -26,7 +30,12 @@ CORS_ORIGINS = [
 
 # Audio Settings
 AUDIO_OUTPUT_DIR = BASE_DIR / "audio_outputs"
-MAX_AUDIO_FILES = 100
+# One file per distinct sentence plus one joined file per multi-sentence reply:
+# the default warm-up set alone is about 100 files, and each new reply adds 1-3
+MAX_AUDIO_FILES = int(os.getenv("MAX_AUDIO_FILES", "1000"))  # Least recently used files beyond this are evicted
+AUDIO_INDEX_FILE = AUDIO_OUTPUT_DIR / ".audio_index.db"  # SQLite index shared by all worker processes
+AUDIO_EVICTION_GRACE_SECONDS = float(os.getenv("AUDIO_EVICTION_GRACE_SECONDS", "60"))  # Files used more recently are never evicted
+SYNTHESIS_LOCK_TIMEOUT_SECONDS = float(os.getenv("SYNTHESIS_LOCK_TIMEOUT_SECONDS", "30"))  # Wait for another worker's synthesis this long
 AUDIO_FORMAT = "mp3"
 AUDIO_QUALITY = "high"  # Options: low, medium, high
 
@@ -36,11 +45,130 @@ FALLBACK_LANGUAGE = "en"  # English
 SPEECH_RATE = 1.0  # Normal speed
 SUPPORTED_LANGUAGES = ["ur", "en", "mixed"]
 
+# TTS Scheduler Settings
+TTS_WORKERS = int(os.getenv("TTS_WORKERS", "4"))  # Concurrent synthesis jobs
+TTS_QUEUE_MAX_DEPTH = int(os.getenv("TTS_QUEUE_MAX_DEPTH", "64"))  # Pending jobs before 503
+TTS_RATE_LIMIT_PER_SEC = float(os.getenv("TTS_RATE_LIMIT_PER_SEC", "10"))  # Upstream calls per second
+TTS_RATE_LIMIT_BURST = int(os.getenv("TTS_RATE_LIMIT_BURST", "10"))  # Token bucket capacity
+TTS_RETRY_AFTER_SECONDS = int(os.getenv("TTS_RETRY_AFTER_SECONDS", "2"))  # Retry-After on 503
+TTS_WORKER_PROCESSES = int(os.getenv("TTS_WORKER_PROCESSES", "0"))  # 0 = synthesize in API process threads
+TTS_BACKEND = os.getenv("TTS_BACKEND", "gtts").lower()  # "gtts" or "offline" (silent audio, no network)
+TTS_OFFLINE_LATENCY_MS = float(os.getenv("TTS_OFFLINE_LATENCY_MS", "0"))  # Simulated synthesis time per sentence
+
+# Client Rate Limiting (token buckets per user_id and per client IP, per endpoint)
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "True").lower() == "true"
+RATE_LIMIT_COMMANDS_PER_MINUTE = float(os.getenv("RATE_LIMIT_COMMANDS_PER_MINUTE", "60"))  # process-command and WebSocket turns
+RATE_LIMIT_COMMANDS_BURST = int(os.getenv("RATE_LIMIT_COMMANDS_BURST", "10"))  # Commands allowed back to back
+RATE_LIMIT_SPEECH_PER_MINUTE = float(os.getenv("RATE_LIMIT_SPEECH_PER_MINUTE", "10"))  # test-speech and stream-speech (arbitrary text, rarely cached)
+RATE_LIMIT_SPEECH_BURST = int(os.getenv("RATE_LIMIT_SPEECH_BURST", "3"))  # Speech requests allowed back to back
+RATE_LIMIT_IP_FACTOR = float(os.getenv("RATE_LIMIT_IP_FACTOR", "5"))  # A client IP gets this many users' worth (NAT, shared proxies)
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))  # Buckets kept per process (~120 bytes each plus the key)
+# Peers whose X-Forwarded-For header names the client (comma-separated addresses);
+# "*" trusts any peer and takes the address the nearest proxy appended (one proxy
+# hop, e.g. Railway, where the edge proxy addresses change)
+FORWARDED_ALLOW_IPS = os.getenv("FORWARDED_ALLOW_IPS", "127.0.0.1")
+RATE_LIMITS = {
+    f"{API_PREFIX}/process-command": (RATE_LIMIT_COMMANDS_PER_MINUTE, RATE_LIMIT_COMMANDS_BURST),
+    f"{API_PREFIX}/ws/conversation": (RATE_LIMIT_COMMANDS_PER_MINUTE, RATE_LIMIT_COMMANDS_BURST),
+    f"{API_PREFIX}/test-speech": (RATE_LIMIT_SPEECH_PER_MINUTE, RATE_LIMIT_SPEECH_BURST),
+    f"{API_PREFIX}/stream-speech": (RATE_LIMIT_SPEECH_PER_MINUTE, RATE_LIMIT_SPEECH_BURST)
+}  # Path -> (requests per minute, burst) per user; unlisted paths are not limited
+
+# Readiness & Cache Warm-up Settings
+WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "True").lower() == "true"
+WARMUP_INTENTS = [
+    intent.strip()
+    for intent in os.getenv("WARMUP_INTENTS", "greeting,farewell,thanks,how_are_you,help,unknown").split(",")
+    if intent.strip()
+]  # Intents whose response templates are synthesized before the server reports ready
+WARMUP_TIMEOUT_SECONDS = float(os.getenv("WARMUP_TIMEOUT_SECONDS", "90"))  # Report ready anyway after this
+TTS_LATENCY_BUDGET_MS = float(os.getenv("TTS_LATENCY_BUDGET_MS", "3000"))  # Median synthesis time above this = degraded
+TTS_PROBE_INTERVAL_SECONDS = float(os.getenv("TTS_PROBE_INTERVAL_SECONDS", "60"))  # Probe TTS when idle this long (0 = never)
+TTS_PROBE_WINDOW = 20  # Recent synthesis timings judged against the budget
+
+# Speculative Prefetch Settings
+PREFETCH_ENABLED = os.getenv("PREFETCH_ENABLED", "True").lower() == "true"
+PREFETCH_TOP_INTENTS = int(os.getenv("PREFETCH_TOP_INTENTS", "2"))  # Most likely next intents to prefetch
+PREFETCH_MIN_PROBABILITY = float(os.getenv("PREFETCH_MIN_PROBABILITY", "0.2"))  # Skip unlikely transitions
+PREFETCH_MAX_CANDIDATES = int(os.getenv("PREFETCH_MAX_CANDIDATES", "8"))  # Responses prefetched per predicted intent
+PREFETCH_LEDGER_SIZE = int(os.getenv("PREFETCH_LEDGER_SIZE", "512"))  # Prefetched responses tracked for hit/waste accounting
+PREFETCH_MAX_TRACKED_USERS = int(os.getenv("PREFETCH_MAX_TRACKED_USERS", "10000"))  # Per-user state (last intent, joke cursor) kept in memory
+
+# Conversation Session Settings (in-memory history per WebSocket conversation)
+SESSION_MAX_TURNS = int(os.getenv("SESSION_MAX_TURNS", "10"))  # Turns kept per conversation
+SESSION_MAX_CONVERSATIONS = int(os.getenv("SESSION_MAX_CONVERSATIONS", "100000"))  # Least recently used conversations evicted beyond this
+SESSION_MAX_BYTES = int(os.getenv("SESSION_MAX_BYTES", str(64 * 1024 * 1024)))  # Hard memory cap for all sessions
+SESSION_IDLE_TTL_SECONDS = float(os.getenv("SESSION_IDLE_TTL_SECONDS", "1800"))  # Forget conversations idle this long (0 = never)
+SESSION_MAX_USER_ID_LENGTH = 128  # Longer user ids are not tracked
+
+# Interim Transcript Speculation Settings
+SPECULATION_ENABLED = os.getenv("SPECULATION_ENABLED", "True").lower() == "true"
+SPECULATION_STABLE_UPDATES = int(os.getenv("SPECULATION_STABLE_UPDATES", "2"))  # Interim transcripts the leading intent must hold
+SPECULATION_CONFIDENCE_DELTA = 0.05  # Confidence change that still counts as stable
+SPECULATION_MIN_CONFIDENCE = float(os.getenv("SPECULATION_MIN_CONFIDENCE", "0.5"))  # Weaker leads are not acted on
+SPECULATION_MAX_PER_UTTERANCE = 2  # Speculative responses started per utterance
+
+# Cache Backend Settings
+CACHE_BACKEND_URL = os.getenv("CACHE_BACKEND_URL", "memory://")  # memory:// (this process) or redis://[:password@]host:port/db (shared by all nodes)
+CACHE_KEY_PREFIX = os.getenv("CACHE_KEY_PREFIX", "uva:")  # Namespace for keys in a shared server
+CACHE_TIMEOUT_SECONDS = float(os.getenv("CACHE_TIMEOUT_SECONDS", "0.25"))  # A slower cache call counts as a miss
+CACHE_RETRY_SECONDS = float(os.getenv("CACHE_RETRY_SECONDS", "5"))  # After a cache server failure, calls are skipped (misses) this long
+CACHE_POOL_SIZE = int(os.getenv("CACHE_POOL_SIZE", "4"))  # Connections to the cache server per process
+CACHE_MEMORY_MAX_ENTRIES = int(os.getenv("CACHE_MEMORY_MAX_ENTRIES", "4096"))  # In-process cache / near-cache size
+CACHE_MEMORY_MAX_BYTES = int(os.getenv("CACHE_MEMORY_MAX_BYTES", str(16 * 1024 * 1024)))
+CACHE_NEAR_TTL_SECONDS = float(os.getenv("CACHE_NEAR_TTL_SECONDS", "30"))  # Near-cache entry lifetime in front of the server (0 = no near-cache)
+CACHE_INTENT_TTL_SECONDS = int(os.getenv("CACHE_INTENT_TTL_SECONDS", "3600"))  # Cached intent detection results
+CACHE_AUDIO_TTL_SECONDS = int(os.getenv("CACHE_AUDIO_TTL_SECONDS", "604800"))  # Synthesized segments shared with other nodes
+CACHE_AUDIO_MAX_BYTES = int(os.getenv("CACHE_AUDIO_MAX_BYTES", "524288"))  # Larger segments are not shared
+
+# WebSocket Conversation Settings (/api/v1/ws/conversation)
+WS_MAX_CONNECTIONS = int(os.getenv("WS_MAX_CONNECTIONS", "10000"))  # Open conversations per process; more are refused
+WS_IDLE_TIMEOUT_SECONDS = float(os.getenv("WS_IDLE_TIMEOUT_SECONDS", "300"))  # Close conversations silent this long (0 = never)
+WS_MAX_MESSAGE_BYTES = int(os.getenv("WS_MAX_MESSAGE_BYTES", "8192"))  # Largest client message accepted
+WS_PING_INTERVAL_SECONDS = float(os.getenv("WS_PING_INTERVAL_SECONDS", "20"))  # Keepalive pings through proxies and NATs
+WS_SERVER_OPTIONS = {
+    "ws_max_size": WS_MAX_MESSAGE_BYTES,
+    "ws_max_queue": 4,  # Turns waiting per connection (answered in order)
+    "ws_ping_interval": WS_PING_INTERVAL_SECONDS,
+    "ws_ping_timeout": WS_PING_INTERVAL_SECONDS,
+    # Per-connection zlib state costs hundreds of KB and MP3 does not compress
+    "ws_per_message_deflate": False
+}  # uvicorn settings used by serve.py and main.py
+
 # Logging Configuration
 LOG_DIR = BASE_DIR / "logs"
 LOG_LEVEL = "INFO"
 LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
 LOG_DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+LOG_BACKUP_DAYS = int(os.getenv("LOG_BACKUP_DAYS", "14"))  # Daily log files kept
+
+# Structured Request Log (one JSON line per request in logs/requests_YYYYMMDD.jsonl)
+REQUEST_LOG_ENABLED = os.getenv("REQUEST_LOG_ENABLED", "True").lower() == "true"
+REQUEST_LOG_SAMPLE_RATE = float(os.getenv("REQUEST_LOG_SAMPLE_RATE", "1.0"))  # Fraction of successful requests logged
+REQUEST_LOG_INCLUDE_TEXT = os.getenv("REQUEST_LOG_INCLUDE_TEXT", "False").lower() == "true"  # Keep utterances (replay corpus)
+
+# Interaction Analytics (append-only SQLite store in WAL mode, written in batches)
+ANALYTICS_ENABLED = os.getenv("ANALYTICS_ENABLED", "True").lower() == "true"
+ANALYTICS_DB_PATH = Path(os.getenv("ANALYTICS_DB_PATH", str(LOG_DIR / "analytics.db")))  # Shared by all workers
+ANALYTICS_BUFFER_SIZE = int(os.getenv("ANALYTICS_BUFFER_SIZE", "20000"))  # Records awaiting a flush; more are dropped
+ANALYTICS_BATCH_SIZE = int(os.getenv("ANALYTICS_BATCH_SIZE", "1000"))  # A full batch is flushed without waiting
+ANALYTICS_FLUSH_INTERVAL_SECONDS = float(os.getenv("ANALYTICS_FLUSH_INTERVAL_SECONDS", "2"))  # Longest a record waits in memory
+ANALYTICS_INCLUDE_TEXT = os.getenv("ANALYTICS_INCLUDE_TEXT", "False").lower() == "true"  # Store the user's text
+ANALYTICS_RETENTION_DAYS = float(os.getenv("ANALYTICS_RETENTION_DAYS", "30"))  # Older records are deleted; 0 keeps them forever
+ANALYTICS_MAX_BUCKETS = 1000  # Time windows returned by one aggregate query
+
+# Admin & Profiling Settings
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")  # Empty disables admin endpoints and header-triggered profiling
+PROFILE_DIR = LOG_DIR / "profiles"
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))  # Fraction of commands profiled automatically
+PROFILE_MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", "50"))  # Newest profiles kept
+TRACEMALLOC_FRAMES = int(os.getenv("TRACEMALLOC_FRAMES", "0"))  # > 0 traces allocations from startup
+
+# Event Loop Lag Monitor Settings
+LOOP_MONITOR_ENABLED = os.getenv("LOOP_MONITOR_ENABLED", "True").lower() == "true"
+LOOP_LAG_INTERVAL_MS = float(os.getenv("LOOP_LAG_INTERVAL_MS", "100"))  # How often the loop is probed
+LOOP_LAG_THRESHOLD_MS = float(os.getenv("LOOP_LAG_THRESHOLD_MS", "100"))  # Lag that counts as a stall (stack captured)
+LOOP_STALL_HISTORY = 20  # Recent stalls kept with their stacks
 
 # Data Files Paths
 DATA_DIR = BASE_DIR / "data"
@@ -61,16 +189,19 @@ SERVER_RELOAD = RELOAD  # Backward compatibility
 MIN_CONFIDENCE_THRESHOLD = 0.5
 UNKNOWN_INTENT_THRESHOLD = 0.3
 
-# Create required directories if they don't exist
-AUDIO_OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
-LOG_DIR.mkdir(parents=True, exist_ok=True)
-DATA_DIR.mkdir(parents=True, exist_ok=True)
+# Cold Start Settings
+STARTUP_BUDGET_MS = float(os.getenv("STARTUP_BUDGET_MS", "3000"))  # Process start -> first served request
+
+# Pre-fork Server Settings (serve.py)
+WEB_WORKERS = int(os.getenv("WEB_CONCURRENCY", "0"))  # Forked API workers (0 = one per CPU)
+WORKER_STATS_INTERVAL_SECONDS = float(os.getenv("WORKER_STATS_INTERVAL_SECONDS", "5"))  # How often workers publish their stats
 
 # Environment variables (can be overridden by .env file)
 DEBUG_MODE = os.getenv("DEBUG", "False").lower() == "true"
 MAX_REQUEST_SIZE = int(os.getenv("MAX_REQUEST_SIZE", "5242880"))  # 5MB default
 
-print(f"✅ Configuration loaded successfully!")
-print(f"📁 Base Directory: {BASE_DIR}")
-print(f"🎤 Audio Output: {AUDIO_OUTPUT_DIR}")
-print(f"📝 Logs Directory: {LOG_DIR}")
+
+def ensure_directories():
+    """Create the runtime directories (audio store, logs) if they don't exist"""
+    for directory in (AUDIO_OUTPUT_DIR, LOG_DIR):
+        directory.mkdir(parents=True, exist_ok=True)
@@ -2,14 +2,17 @@
 Main FastAPI Application for Urdu Voice Assistant
 Production-ready REST API server with complete voice command processing
 """
-from fastapi import FastAPI, HTTPException, Query
+from fastapi import FastAPI, HTTPException, Query, Request, WebSocket
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse, PlainTextResponse
 from fastapi.staticfiles import StaticFiles
 from contextlib import asynccontextmanager
+import asyncio
+import os
+import time
 from pathlib import Path
 from datetime import datetime
-import uvicorn
+from typing import Optional
 
 # Import configurations
 from config import (
@@ -21,7 +24,15 @@ from config import (
     PORT,
     RELOAD,
     AUDIO_OUTPUT_DIR,
-    PROJECT_DESCRIPTION
+    PROJECT_DESCRIPTION,
+    ADMIN_TOKEN,
+    LOOP_MONITOR_ENABLED,
+    COMMANDS_FILE,
+    BASE_DIR,
+    LOG_DIR,
+    WORKER_STATS_INTERVAL_SECONDS,
+    WS_SERVER_OPTIONS,
+    ensure_directories
 )
 
 # Import models
@@ -30,21 +41,125 @@ from models.schemas import (
     CommandResponse,
     HealthResponse,
     CommandsListResponse,
+    CommandInfo,
+    ConversationHistoryResponse,
     ErrorResponse
 )
 
 # Import services
 from services.command_service import CommandService
+from services.intent_detector import IntentDetector
+from services.response_generator import ResponseGenerator
+from services.tts_scheduler import TTSPriority, TTSQueueFullError
+from services.speech_service import preload_backend
+from services.readiness import ServiceReadiness
+from services.conversation import ConversationGateway
 
 # Import utilities
 from utils.logger import setup_logger
+from utils.metrics import REGISTRY, INTENTS_TOTAL
+from utils.rate_limit import RateLimiter, RateLimitMiddleware, ForwardedClientMiddleware
+from utils.profiling import RequestProfiler, PROFILE_HEADER, is_admin
+from utils.memory import MemoryInspector, process_memory, proportional_memory, structure_footprints
+from utils.loop_monitor import LoopLagMonitor
+from utils.payload_cache import PayloadCache
+from utils.json_response import FastJSONResponse
+from utils.startup import StartupTimer, FirstRequestMiddleware
+from utils.worker_stats import WorkerStatsBoard
+from utils.helpers import load_json_file
 
 # Setup logger
 logger = setup_logger(__name__)
 
+# Cold start milestones, measured from process start
+startup_timer = StartupTimer()
+startup_timer.mark('main_imported')
+
 # Initialize command service globally
 command_service = None
 
+# Opt-in per-request CPU profiling (inactive unless ADMIN_TOKEN or PROFILE_SAMPLE_RATE is set)
+request_profiler = RequestProfiler()
+
+# tracemalloc snapshots for the admin memory endpoints (idle unless TRACEMALLOC_FRAMES > 0)
+memory_inspector = MemoryInspector()
+
+# Event loop lag probe + watchdog that captures the stack of blocking code
+loop_monitor = LoopLagMonitor() if LOOP_MONITOR_ENABLED else None
+
+ADMIN_TOKEN_HEADER = "X-Admin-Token"
+
+# Startup checks, cache warm-up and TTS health behind /health/ready
+readiness = ServiceReadiness()
+
+# Per-user and per-IP token buckets for the work-heavy endpoints (RATE_LIMITS)
+rate_limiter = RateLimiter()
+
+# Persistent WebSocket conversations (/api/v1/ws/conversation)
+conversations = ConversationGateway(rate_limiter=rate_limiter)
+
+# Serialized bodies + ETags for read-mostly endpoints (/, /commands, /intents)
+payload_cache = PayloadCache()
+SERVER_STARTED_AT = datetime.now().isoformat()
+_started_monotonic = time.monotonic()
+
+# Immutable state loaded before serve.py forks the workers (see preload_shared_state)
+_preloaded = {}
+
+# Shared per-worker stats; serve.py sets these in each forked worker
+worker_board = None
+worker_slot = 0
+metrics_exchange = None
+
+
+def preload_shared_state():
+    """
+    Load the read-only data every worker needs, once, before forking
+    
+    serve.py calls this in the parent process: the intent patterns are
+    loaded and compiled, the response templates loaded and the root and
+    commands payloads serialized there, so the forked workers share those
+    pages copy-on-write instead of each building its own copy.
+    """
+    _preloaded['intent_detector'] = IntentDetector()
+    _preloaded['response_generator'] = ResponseGenerator()
+    payload_cache.get("root", SERVER_STARTED_AT, _root_payload)
+    payload_cache.get("commands", COMMANDS_FILE, _commands_payload)
+    logger.info("📦 Shared state preloaded for workers")
+
+
+def _worker_stats() -> dict:
+    """This process's counters and memory, as published on the worker stats board"""
+    memory = process_memory()
+    proportional = proportional_memory()
+    synthesized = 0
+    if command_service is not None:
+        synthesized = command_service.tts_scheduler.get_stats()['segments']['synthesized']
+    return {
+        'updated_at': time.time(),
+        'commands': int(INTENTS_TOTAL.total()),
+        'synthesized': synthesized,
+        'rss_bytes': memory['rss_bytes'] or 0,
+        'pss_bytes': proportional['pss_bytes'] or 0,
+        'private_bytes': proportional['private_bytes'] or 0
+    }
+
+
+def _worker_label() -> str:
+    """Label pair that tells this worker's Prometheus samples apart"""
+    return f'worker="{worker_slot}"'
+
+
+async def _publish_worker_stats():
+    """Refresh this worker's slot on the stats board (and its metric samples) every few seconds"""
+    while True:
+        worker_board.write(worker_slot, **_worker_stats())
+        if metrics_exchange is not None:
+            await asyncio.to_thread(
+                metrics_exchange.publish, worker_slot, REGISTRY.samples(_worker_label())
+            )
+        await asyncio.sleep(WORKER_STATS_INTERVAL_SECONDS)
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -57,11 +172,18 @@ async def lifespan(app: FastAPI):
     logger.info(f"🚀 Starting {PROJECT_NAME}")
     logger.info("=" * 60)
     
-    global command_service
+    global command_service, worker_board
     try:
         logger.info("Initializing CommandService...")
-        command_service = CommandService()
+        command_service = await CommandService.create(**_preloaded)
+        await command_service.tts_scheduler.start()
+        await command_service.analytics.start()
+        await readiness.start(command_service)
+        await conversations.start()
+        startup_timer.mark('services_ready')
         logger.info("✅ CommandService initialized successfully")
+        if loop_monitor is not None:
+            await loop_monitor.start()
     except Exception as e:
         logger.error(f"❌ Failed to initialize CommandService: {e}")
         raise
@@ -70,17 +192,41 @@ async def lifespan(app: FastAPI):
     logger.info(f"🌐 Server: http://{HOST}:{PORT}")
     logger.info(f"📖 API Docs: http://{HOST}:{PORT}/docs")
     logger.info(f"📖 ReDoc: http://{HOST}:{PORT}/redoc")
+    logger.info(f"📁 Base directory: {BASE_DIR}")
     logger.info(f"🔊 Audio output: {AUDIO_OUTPUT_DIR}")
+    logger.info(f"📝 Logs directory: {LOG_DIR}")
     logger.info(f"🎯 CORS origins: {', '.join(CORS_ORIGINS)}")
     logger.info("=" * 60)
-    logger.info("✅ Server ready to accept requests!")
+    ready_ms = startup_timer.mark('ready')
+    logger.info(f"✅ Server ready to accept requests! ({ready_ms:.0f} ms since process start)")
     logger.info("=" * 60)
     
+    # Import the TTS backend in the background instead of on the first synthesis
+    preload = asyncio.create_task(asyncio.to_thread(preload_backend))
+    
+    # Started directly by uvicorn: a one-slot board so /stats/workers still answers
+    if worker_board is None:
+        worker_board = WorkerStatsBoard(1)
+        worker_board.write(worker_slot, pid=os.getpid(), started_at=time.time())
+    publisher = asyncio.create_task(_publish_worker_stats(), name="worker-stats")
+    
     yield
     
+    await preload
+    publisher.cancel()
+    await asyncio.gather(publisher, return_exceptions=True)
+    
     # Shutdown
     logger.info("=" * 60)
     logger.info("🛑 Shutting down Urdu Voice Assistant...")
+    if loop_monitor is not None:
+        await loop_monitor.stop()
+    await readiness.stop()
+    await conversations.stop()
+    if command_service is not None:
+        await command_service.tts_scheduler.stop()
+        await command_service.analytics.stop()
+        await command_service.cache.close()
     logger.info("👋 Goodbye!")
     logger.info("=" * 60)
 
@@ -93,9 +239,16 @@ app = FastAPI(
     lifespan=lifespan,
     docs_url="/docs",
     redoc_url="/redoc",
-    openapi_url=f"{API_PREFIX}/openapi.json"
+    openapi_url=f"{API_PREFIX}/openapi.json",
+    default_response_class=FastJSONResponse
 )
 
+# Answers 429 to clients over their limit (inside CORS, so browsers can read Retry-After)
+app.add_middleware(RateLimitMiddleware, limiter=rate_limiter)
+
+# Client address from X-Forwarded-For for trusted proxies (FORWARDED_ALLOW_IPS)
+app.add_middleware(ForwardedClientMiddleware)
+
 # Configure CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -105,21 +258,112 @@ app.add_middleware(
     allow_headers=["*"],  # Allows all headers
 )
 
+# Reports the first served request to the startup timer
+app.add_middleware(FirstRequestMiddleware, timer=startup_timer)
+
 # Mount static files for audio (accessible at /audio/)
+ensure_directories()
 app.mount("/audio", StaticFiles(directory=str(AUDIO_OUTPUT_DIR)), name="audio")
 
+
+def _service_busy(error: TTSQueueFullError) -> HTTPException:
+    """
+    Build a 503 response for a saturated TTS queue
+    
+    Args:
+        error: The queue-full error raised by the scheduler
+    
+    Returns:
+        HTTPException with a Retry-After header
+    """
+    logger.warning(f"⚠️ Rejecting request, TTS queue saturated ({error.depth} pending)")
+    return HTTPException(
+        status_code=503,
+        detail="Speech service is busy, please retry shortly",
+        headers={"Retry-After": str(error.retry_after)}
+    )
+
+
+def _validate_speech_params(text: str, lang: str):
+    """
+    Validate text and language query parameters for speech endpoints
+    
+    Raises:
+        HTTPException: 400 for empty/too long text or unsupported language
+    """
+    if not text or len(text.strip()) == 0:
+        raise HTTPException(
+            status_code=400,
+            detail="Text parameter cannot be empty"
+        )
+    
+    if len(text) > 1000:
+        raise HTTPException(
+            status_code=400,
+            detail="Text exceeds maximum length of 1000 characters"
+        )
+    
+    if lang not in ['ur', 'en']:
+        raise HTTPException(
+            status_code=400,
+            detail="Language must be 'ur' (Urdu) or 'en' (English)"
+        )
+
+
+def _require_admin(request: Request):
+    """
+    Reject requests without a valid admin token
+    
+    Admin endpoints answer 404 when ADMIN_TOKEN is not configured, so
+    they do not exist as far as clients can tell.
+    
+    Raises:
+        HTTPException: 404 if admin access is disabled, 403 on a bad token
+    """
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not is_admin(request.headers.get(ADMIN_TOKEN_HEADER)):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
+def _server_timing(timings: dict) -> str:
+    """
+    Format stage durations as a Server-Timing header value
+    
+    Args:
+        timings: Stage name -> duration in seconds
+    
+    Returns:
+        Header value, e.g. "intent;dur=0.21, tts;dur=812.40, total;dur=815.03"
+    """
+    return ", ".join(f"{stage};dur={seconds * 1000:.2f}" for stage, seconds in timings.items())
+
+
+def _http_session(session_id: Optional[str]) -> Optional[str]:
+    """Session store key of a client-chosen conversation id (kept apart from WebSocket ones)"""
+    return f"http:{session_id}" if session_id else None
+
+
 # ============================================================================
 # API ROUTES
 # ============================================================================
 
 @app.get("/", tags=["Root"])
-async def root():
+async def root(request: Request):
     """
     Root endpoint - API information and welcome message
     
+    The body never changes while the server runs, so it is serialized once
+    and answered with 304 when the client sends a matching If-None-Match.
+    
     Returns:
         API metadata and useful links
     """
+    return payload_cache.get("root", SERVER_STARTED_AT, _root_payload).respond(request)
+
+
+def _root_payload() -> dict:
+    """Build the root endpoint body"""
     return {
         "name": PROJECT_NAME,
         "version": API_VERSION,
@@ -130,12 +374,19 @@ async def root():
             "docs": "/docs",
             "redoc": "/redoc",
             "health": "/health",
+            "liveness": "/health/live",
+            "readiness": "/health/ready",
+            "metrics": "/metrics",
             "process_command": f"{API_PREFIX}/process-command",
             "commands": f"{API_PREFIX}/commands",
-            "intents": f"{API_PREFIX}/intents"
+            "intents": f"{API_PREFIX}/intents",
+            "history": f"{API_PREFIX}/history/{{session_id}}",
+            "analytics": f"{API_PREFIX}/analytics/intents",
+            "stream_speech": f"{API_PREFIX}/stream-speech",
+            "conversation": f"{API_PREFIX}/ws/conversation"
         },
         "github": "https://github.com/your-repo",
-        "timestamp": datetime.now().isoformat()
+        "started_at": SERVER_STARTED_AT
     }
 
 
@@ -168,8 +419,51 @@ async def health_check():
         raise HTTPException(status_code=500, detail="Service unhealthy")
 
 
+@app.get("/health/live", tags=["Health"])
+async def liveness():
+    """
+    Liveness probe
+    
+    Answers as long as the process and its event loop are responsive.
+    A failing liveness probe means the instance should be restarted.
+    
+    Returns:
+        dict: {"status": "alive"}
+    """
+    return {"status": "alive", "timestamp": datetime.now()}
+
+
+@app.get("/health/ready", tags=["Health"])
+async def readiness_check():
+    """
+    Readiness probe
+    
+    Returns 503 until the data files are loaded, the audio index is built
+    and the warm-up responses are synthesized, so a load balancer keeps
+    traffic away from a cold instance. Once ready it returns 200 with
+    status "ready", or "degraded" while recent TTS calls are slower than
+    TTS_LATENCY_BUDGET_MS or mostly failing.
+    
+    Returns:
+        JSONResponse: Readiness status, checks, warm-up progress, TTS health
+    
+    Example:
+        GET /health/ready
+        
+        Response (503 while warming up):
+        {
+            "status": "not_ready",
+            "checks": {"data_loaded": true, "audio_index": true, "warmup": false},
+            "warmup": {"texts": 33, "files": 94, "synthesized": 12, "failed": 0, "timed_out": false, "seconds": null},
+            "tts": {"samples": 12, "failures": 0, "median_ms": 640.2, "budget_ms": 3000.0, ...}
+        }
+    """
+    status = readiness.status()
+    return FastJSONResponse(status, status_code=200 if readiness.ready else 503)
+
+
 @app.post(f"{API_PREFIX}/process-command", response_model=CommandResponse, tags=["Commands"])
-async def process_command(request: CommandRequest):
+async def process_command(request: CommandRequest, http_request: Request):
     """
     Process user voice command and generate response
     
@@ -177,13 +471,23 @@ async def process_command(request: CommandRequest):
     It detects intent, generates response, and creates audio.
     
     Args:
-        request: CommandRequest with text, user_id, language
+        request: CommandRequest with text, user_id, language and an
+            optional session_id whose turns the response sees as history
     
     Returns:
         CommandResponse: Response text, audio file, intent, confidence
+        (stage latencies are reported in the Server-Timing header)
+    
+    The result comes from our own services, so the response is built
+    without re-validation and serialized straight to JSON bytes.
+    
+    Sending the admin token in the X-Profile header profiles this request;
+    the profile is listed at GET /api/v1/admin/profiles.
     
     Raises:
-        HTTPException: 400 for invalid input, 500 for processing errors
+        HTTPException: 400 for invalid input, 503 when the TTS queue is
+            saturated (with Retry-After), 500 for processing errors;
+            clients over their rate limit get 429 from RateLimitMiddleware
     
     Example:
         POST /api/v1/process-command
@@ -192,6 +496,7 @@ async def process_command(request: CommandRequest):
         {
             "text": "السلام علیکم، کیا حال ہے؟",
             "user_id": "user_123",
+            "session_id": "web-k3x9q2",
             "language": "auto"
         }
         
@@ -225,28 +530,46 @@ async def process_command(request: CommandRequest):
             )
         
         # Process command through CommandService
-        result = await command_service.process_command(
+        command = command_service.process_command(
             text=request.text,
             user_id=request.user_id,
-            language_hint=request.language
+            language_hint=request.language,
+            session_id=_http_session(request.session_id)
         )
+        trigger = request_profiler.select(http_request.headers.get(PROFILE_HEADER)) \
+            if request_profiler.active else None
+        if trigger is None:
+            result = await command
+        else:
+            result = await request_profiler.run(command, trigger, {
+                'text': request.text[:200],
+                'user_id': request.user_id,
+                'language': request.language
+            })
         
-        # Create response object
-        response = CommandResponse(
-            response_text=result['response_text'],
-            audio_file=result['audio_file'],
-            intent=result['intent'],
-            confidence=result['confidence'],
-            language=result['language'],
-            timestamp=datetime.now()
-        )
+        headers = {}
+        if result.get('timings'):
+            headers["Server-Timing"] = _server_timing(result['timings'])
+        
+        # Trusted internal data shaped like CommandResponse: returning a
+        # Response skips FastAPI's response_model validation pass
+        response = {
+            "response_text": result['response_text'],
+            "audio_file": result['audio_file'],
+            "intent": result['intent'],
+            "confidence": result['confidence'],
+            "language": result['language'],
+            "timestamp": datetime.now()
+        }
         
         logger.info(f"✅ Command processed successfully: {result['intent']} (confidence: {result['confidence']})")
         
-        return response
+        return FastJSONResponse(response, headers=headers)
         
     except HTTPException:
         raise
+    except TTSQueueFullError as e:
+        raise _service_busy(e)
     except Exception as e:
         logger.error(f"❌ Command processing failed: {e}", exc_info=True)
         raise HTTPException(
@@ -324,12 +647,14 @@ async def get_audio(filename: str):
 
 
 @app.get(f"{API_PREFIX}/commands", response_model=CommandsListResponse, tags=["Commands"])
-async def get_commands():
+async def get_commands(request: Request):
     """
     Get list of available commands with examples
     
     Returns detailed information about all supported commands,
-    including examples in Urdu and descriptions.
+    including examples in Urdu and descriptions. commands.json only changes
+    with a restart, so the list is validated and serialized once; later
+    calls send the stored bytes (or 304 for a matching If-None-Match).
     
     Returns:
         CommandsListResponse: List of commands with examples
@@ -351,31 +676,7 @@ async def get_commands():
         }
     """
     try:
-        from config import COMMANDS_FILE
-        from utils.helpers import load_json_file
-        from models.schemas import CommandInfo
-        
-        # Load commands from JSON file
-        commands_data = load_json_file(COMMANDS_FILE)
-        
-        if not commands_data or 'commands' not in commands_data:
-            logger.error("❌ Commands data not available")
-            raise HTTPException(
-                status_code=500,
-                detail="Commands data not available"
-            )
-        
-        # Parse commands into CommandInfo objects
-        commands_list = [
-            CommandInfo(**cmd) for cmd in commands_data['commands']
-        ]
-        
-        logger.info(f"📋 Returning {len(commands_list)} available commands")
-        
-        return CommandsListResponse(
-            commands=commands_list,
-            total=len(commands_list)
-        )
+        return payload_cache.get("commands", COMMANDS_FILE, _commands_payload).respond(request)
         
     except HTTPException:
         raise
@@ -387,12 +688,33 @@ async def get_commands():
         )
 
 
+def _commands_payload() -> dict:
+    """Load, validate and build the /commands body"""
+    commands_data = load_json_file(COMMANDS_FILE)
+    
+    if not commands_data or 'commands' not in commands_data:
+        logger.error("❌ Commands data not available")
+        raise HTTPException(
+            status_code=500,
+            detail="Commands data not available"
+        )
+    
+    commands_list = [CommandInfo(**cmd) for cmd in commands_data['commands']]
+    logger.info(f"📋 Serialized {len(commands_list)} available commands")
+    
+    return CommandsListResponse(
+        commands=commands_list,
+        total=len(commands_list)
+    ).model_dump()
+
+
 @app.get(f"{API_PREFIX}/intents", tags=["Commands"])
-async def get_intents():
+async def get_intents(request: Request):
     """
     Get list of supported intent names
     
-    Returns all intent categories that the system can detect.
+    Returns all intent categories that the system can detect. The body is
+    rebuilt only when the intent detector's pattern version changes.
     
     Returns:
         dict: List of intent names with metadata
@@ -408,14 +730,8 @@ async def get_intents():
         }
     """
     try:
-        result = command_service.get_available_commands()
-        
-        return {
-            "intents": result['intents'],
-            "total": result['total'],
-            "message": "دستیاب intents کی فہرست",
-            "status": "success"
-        }
+        version = command_service.intent_detector.version
+        return payload_cache.get("intents", version, _intents_payload).respond(request)
         
     except Exception as e:
         logger.error(f"❌ Failed to get intents: {e}")
@@ -425,6 +741,66 @@ async def get_intents():
         )
 
 
+def _intents_payload() -> dict:
+    """Build the /intents body"""
+    result = command_service.get_available_commands()
+    return {
+        "intents": result['intents'],
+        "total": result['total'],
+        "message": "دستیاب intents کی فہرست",
+        "status": "success"
+    }
+
+
+@app.get(f"{API_PREFIX}/history/{{session_id}}", response_model=ConversationHistoryResponse, tags=["Commands"])
+async def get_history(
+    session_id: str,
+    limit: Optional[int] = Query(None, ge=1, description="Most recent turns to return")
+):
+    """
+    Get the recent turns of a conversation held over HTTP
+    
+    Turns are recorded for process-command requests that send this
+    session_id. They are kept in memory by the worker process that served
+    them, at most SESSION_MAX_TURNS per conversation, and are forgotten
+    after SESSION_IDLE_TTL_SECONDS without a new turn. Under serve.py with
+    several workers, requests may reach different workers, so the history
+    is complete only with one worker or a load balancer that keeps a
+    session on one worker; WebSocket conversations always are.
+    
+    Args:
+        session_id: Conversation id sent with the commands
+        limit: Return only the most recent this many turns (optional)
+    
+    Returns:
+        ConversationHistoryResponse: Turns from oldest to newest (empty
+        for an unknown or expired conversation)
+    
+    Example:
+        GET /api/v1/history/web-k3x9q2?limit=2
+        
+        Response:
+        {
+            "session_id": "web-k3x9q2",
+            "history": [
+                {
+                    "user_input": "سلام",
+                    "assistant_response": "السلام علیکم! میں آپ کی کیا مدد کر سکتا ہوں؟",
+                    "intent": "greeting",
+                    "timestamp": "2025-10-25T12:00:00"
+                }
+            ],
+            "total": 1
+        }
+    """
+    turns = command_service.sessions.history(_http_session(session_id), limit)
+    return ConversationHistoryResponse(
+        session_id=session_id,
+        history=[turn.to_item() for turn in turns],
+        total=len(turns)
+    )
+
+
 @app.post(f"{API_PREFIX}/test-speech", tags=["Testing"])
 async def test_speech(
     text: str = Query(..., description="Text to convert to speech"),
@@ -457,30 +833,15 @@ async def test_speech(
     """
     try:
         # Validate input
-        if not text or len(text.strip()) == 0:
-            raise HTTPException(
-                status_code=400,
-                detail="Text parameter cannot be empty"
-            )
-        
-        if len(text) > 1000:
-            raise HTTPException(
-                status_code=400,
-                detail="Text exceeds maximum length of 1000 characters"
-            )
-        
-        if lang not in ['ur', 'en']:
-            raise HTTPException(
-                status_code=400,
-                detail="Language must be 'ur' (Urdu) or 'en' (English)"
-            )
+        _validate_speech_params(text, lang)
         
         logger.info(f"🧪 Testing speech generation: lang={lang}, text_length={len(text)}")
         
-        # Generate speech directly
-        audio_filename = command_service.speech_service.text_to_speech(
+        # Generate speech directly (still goes through the TTS queue)
+        audio_filename = await command_service.tts_scheduler.submit(
             text=text,
-            lang=lang
+            lang=lang,
+            priority=TTSPriority.INTERACTIVE
         )
         
         logger.info(f"✅ Test speech generated: {audio_filename}")
@@ -496,6 +857,8 @@ async def test_speech(
         
     except HTTPException:
         raise
+    except TTSQueueFullError as e:
+        raise _service_busy(e)
     except Exception as e:
         logger.error(f"❌ Speech test failed: {e}")
         raise HTTPException(
@@ -504,13 +867,86 @@ async def test_speech(
         )
 
 
+@app.get(f"{API_PREFIX}/stream-speech", tags=["Audio"])
+async def stream_speech(
+    text: str = Query(..., description="Text to convert to speech"),
+    lang: str = Query("ur", description="Language code (ur or en)")
+):
+    """
+    Stream synthesized speech sentence by sentence
+    
+    The text is split at sentence boundaries and the sentences are
+    synthesized concurrently. Audio is streamed in order, so playback can
+    start as soon as the first sentence is ready.
+    
+    Args:
+        text: Text to convert to speech
+        lang: Language code ('ur' for Urdu, 'en' for English)
+    
+    Returns:
+        StreamingResponse: MP3 audio stream
+    
+    Raises:
+        HTTPException: 400 for invalid input, 503 when the TTS queue is saturated
+    
+    Example:
+        GET /api/v1/stream-speech?text=السلام علیکم! کیا حال ہے؟&lang=ur
+        
+        Response: MP3 audio stream
+    """
+    _validate_speech_params(text, lang)
+    
+    try:
+        await command_service.tts_scheduler.prepare(text, lang)
+        futures = command_service.tts_scheduler.enqueue(
+            text=text,
+            lang=lang,
+            priority=TTSPriority.INTERACTIVE
+        )
+    except TTSQueueFullError as e:
+        raise _service_busy(e)
+    
+    logger.info(f"📡 Streaming speech: lang={lang}, segments={len(futures)}")
+    
+    return StreamingResponse(
+        command_service.tts_scheduler.iter_audio(futures),
+        media_type="audio/mpeg",
+        headers={"Cache-Control": "no-store"}
+    )
+
+
+@app.websocket(f"{API_PREFIX}/ws/conversation")
+async def conversation(websocket: WebSocket):
+    """
+    Persistent conversation over a WebSocket
+
+    One connection carries many turns. For each utterance the reply text
+    is pushed as soon as the intent is known, then the audio follows as
+    binary MP3 frames (one per sentence) or as a URL. Errors are reported
+    as messages and the connection stays open. See
+    services/conversation.py for the message format.
+
+    Example:
+        ws://localhost:8000/api/v1/ws/conversation
+
+        -> {"text": "سلام", "audio": "binary", "id": "1"}
+        <- {"type": "response", "id": "1", "intent": "greeting", "response_text": "...", ...}
+        <- {"type": "audio_start", "id": "1", "segments": 2, "format": "mp3"}
+        <- <binary MP3 frame> x 2
+        <- {"type": "audio_end", "id": "1", "audio_file": "speech_....mp3"}
+    """
+    await conversations.serve(websocket, command_service)
+
+
 @app.get(f"{API_PREFIX}/stats", tags=["Statistics"])
 async def get_stats():
     """
     Get API statistics and metrics
     
     Returns information about audio files, supported features,
-    and system status.
+    and system status. Audio and request figures come from counters
+    updated as events happen, so polling this endpoint costs the same
+    however large the audio cache grows.
     
     Returns:
         dict: Statistics and metrics
@@ -522,6 +958,9 @@ async def get_stats():
         {
             "audio_files_generated": 42,
             "total_audio_size_mb": 12.5,
+            "audio_store": {"files": 42, "total_bytes": 13107200, "generated": 57, "evicted": 15},
+            "intents_served": 310,
+            "uptime_seconds": 8640.2,
             "supported_languages": ["ur", "en"],
             "supported_intents": 11,
             "api_version": "1.0.0",
@@ -529,27 +968,33 @@ async def get_stats():
         }
     """
     try:
-        import os
-        
-        # Count audio files
-        audio_files = list(AUDIO_OUTPUT_DIR.glob("*.mp3"))
-        audio_count = len(audio_files)
-        
-        # Calculate total size
-        total_size = sum(f.stat().st_size for f in audio_files if f.exists())
-        total_size_mb = round(total_size / (1024 * 1024), 2)
+        # Counters kept up to date as files are written and evicted (no directory scan)
+        audio = command_service.speech_service.audio_index.get_stats()
         
         # Get service stats
         service_status = command_service.get_service_status()
         
         return {
-            "audio_files_generated": audio_count,
-            "total_audio_size_mb": total_size_mb,
+            "audio_files_generated": audio['files'],
+            "total_audio_size_mb": round(audio['total_bytes'] / (1024 * 1024), 2),
+            "audio_store": audio,
+            "intents_served": int(INTENTS_TOTAL.total()),
+            "uptime_seconds": round(time.monotonic() - _started_monotonic, 1),
             "supported_languages": ["ur", "en"],
             "supported_intents": len(command_service.intent_detector.get_all_intents()),
             "intents": command_service.intent_detector.get_all_intents(),
             "api_version": API_VERSION,
             "service_status": service_status,
+            "tts_queue": command_service.tts_scheduler.get_stats(),
+            "prefetch": command_service.prefetcher.get_stats() if command_service.prefetcher else None,
+            "event_loop": loop_monitor.get_stats() if loop_monitor else None,
+            "payload_cache": payload_cache.get_stats(),
+            "cache_backend": command_service.cache.get_stats(),
+            "conversations": conversations.get_stats(),
+            "rate_limit": rate_limiter.get_stats(),
+            "sessions": command_service.sessions.get_stats(),
+            "startup": startup_timer.get_stats(),
+            "readiness": readiness.status(),
             "status": "operational",
             "timestamp": datetime.now().isoformat()
         }
@@ -563,6 +1008,289 @@ async def get_stats():
         }
 
 
+@app.get(f"{API_PREFIX}/analytics/intents", tags=["Statistics"])
+async def get_intent_analytics(
+    since: Optional[datetime] = Query(None, description="Start of the range (default: 24 hours before until)"),
+    until: Optional[datetime] = Query(None, description="End of the range (default: now)"),
+    window: int = Query(3600, ge=60, description="Window length in seconds")
+):
+    """
+    Get interaction counts per intent over time windows
+    
+    Counts come from the analytics store shared by all workers on the
+    host, so unlike /stats they cover every process. Records reach the
+    store in batches, at most ANALYTICS_FLUSH_INTERVAL_SECONDS late.
+    
+    Args:
+        since: Start of the range (ISO 8601, inclusive)
+        until: End of the range (ISO 8601, exclusive)
+        window: Window length in seconds (at least 60); windows are
+            aligned to multiples of it, so 3600 gives clock hours
+    
+    Returns:
+        dict: Non-empty windows with their counts, and totals per intent
+    
+    Raises:
+        HTTPException: 400 for an empty range or more than 1000 windows
+    
+    Example:
+        GET /api/v1/analytics/intents?since=2025-10-25T00:00:00&window=3600
+        
+        Response:
+        {
+            "since": "2025-10-25T00:00:00",
+            "until": "2025-10-25T12:30:00",
+            "window_seconds": 3600,
+            "windows": [
+                {"start": "2025-10-25T09:00:00", "counts": {"greeting": 12, "weather": 4}, "total": 16},
+                ...
+            ],
+            "totals": {"greeting": 40, "weather": 9, "time": 7},
+            "total": 56
+        }
+    """
+    end = (until or datetime.now()).timestamp()
+    start = since.timestamp() if since else end - 24 * 3600
+    try:
+        return await command_service.analytics.intent_counts(start, end, window)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.get(f"{API_PREFIX}/stats/workers", tags=["Statistics"])
+async def get_worker_stats():
+    """
+    Get per-worker and aggregate statistics
+    
+    Under serve.py every forked worker publishes its counters and memory
+    to a shared board every WORKER_STATS_INTERVAL_SECONDS, so whichever
+    worker answers reports all of them. pss_bytes splits shared pages
+    between the workers mapping them, so its sum is the real combined
+    footprint (rss_bytes counts the shared preloaded state once per worker).
+    Started with plain uvicorn, the only worker is this process.
+    
+    Returns:
+        dict: Workers and their aggregate
+    
+    Example:
+        GET /api/v1/stats/workers
+        
+        Response:
+        {
+            "served_by": 4121,
+            "workers": [
+                {"slot": 0, "pid": 4121, "commands": 152, "synthesized": 40,
+                 "rss_bytes": 61341696, "pss_bytes": 31457280, "restarts": 0, ...},
+                ...
+            ],
+            "aggregate": {"workers": 4, "commands": 610, "pss_bytes": 125829120, ...}
+        }
+    """
+    # Publish first so the answering worker's own figures are current
+    worker_board.write(worker_slot, **_worker_stats())
+    return {
+        "served_by": os.getpid(),
+        **worker_board.snapshot(),
+        "timestamp": datetime.now().isoformat()
+    }
+
+
+@app.get("/metrics", response_class=PlainTextResponse, tags=["Statistics"])
+async def metrics():
+    """
+    Prometheus metrics endpoint
+    
+    Exposes stage latency histograms (labelled by intent and cache outcome),
+    intent counters, TTS cache and failure counters and TTS queue metrics
+    in Prometheus text exposition format.
+    
+    Every sample carries a worker label. Under serve.py the answering
+    worker adds the samples the other workers published within the last
+    few seconds, so each scrape covers all workers and no counter goes
+    backwards because a different worker answered; sum without(worker)
+    to aggregate.
+    
+    Returns:
+        PlainTextResponse: Metrics in text format 0.0.4
+    """
+    peers = None
+    if metrics_exchange is not None:
+        peers = await asyncio.to_thread(metrics_exchange.collect, worker_slot)
+    return PlainTextResponse(
+        REGISTRY.render(_worker_label(), peers),
+        media_type="text/plain; version=0.0.4"
+    )
+
+
+# ============================================================================
+# ADMIN ROUTES (require ADMIN_TOKEN in the X-Admin-Token header)
+# ============================================================================
+
+@app.get(f"{API_PREFIX}/admin/profiles", tags=["Admin"])
+async def list_profiles(request: Request):
+    """
+    List stored request profiles, newest first
+    
+    Profiles are recorded for commands sent with the admin token in the
+    X-Profile header, or sampled with PROFILE_SAMPLE_RATE.
+    
+    Returns:
+        dict: Profiler settings and profiles with request details
+    
+    Example:
+        GET /api/v1/admin/profiles
+        X-Admin-Token: <token>
+        
+        Response:
+        {
+            "profiler": {"active": true, "header_enabled": true, "sample_rate": 0.0, "written": 1},
+            "profiles": [
+                {
+                    "name": "profile_20251025_120000_123456_header.prof",
+                    "size_bytes": 48213,
+                    "text": "موسم کیسا ہے؟",
+                    "wall_ms": 812.4,
+                    "trigger": "header",
+                    ...
+                }
+            ]
+        }
+    """
+    _require_admin(request)
+    profiles = await asyncio.to_thread(request_profiler.list_profiles)
+    return {"profiler": request_profiler.get_stats(), "profiles": profiles}
+
+
+@app.get(f"{API_PREFIX}/admin/profiles/{{name}}", tags=["Admin"])
+async def download_profile(name: str, request: Request):
+    """
+    Download a profile in pstats format
+    
+    Open it with `python -m pstats <file>` or snakeviz, or convert it
+    to speedscope format.
+    
+    Args:
+        name: Profile file name from GET /api/v1/admin/profiles
+    
+    Returns:
+        FileResponse: The .prof file
+    
+    Raises:
+        HTTPException: 404 if the profile does not exist
+    """
+    _require_admin(request)
+    path = request_profiler.get_profile_path(name)
+    if path is None:
+        raise HTTPException(status_code=404, detail=f"Profile not found: {name}")
+    return FileResponse(path, media_type="application/octet-stream", filename=name)
+
+
+@app.get(f"{API_PREFIX}/admin/memory", tags=["Admin"])
+async def memory_report(request: Request):
+    """
+    Report process memory and the footprint of in-process structures
+    
+    Sizes are deep sizes (the structure plus every object it owns, shared
+    objects counted once): intent patterns, response catalog, jokes,
+    per-user session state, prefetch tables, in-flight TTS jobs and metrics.
+    
+    Returns:
+        dict: RSS, structure sizes (largest first) and tracemalloc status
+    
+    Example:
+        GET /api/v1/admin/memory
+        X-Admin-Token: <token>
+        
+        Response:
+        {
+            "process": {"rss_bytes": 85123072, "peak_rss_bytes": 90112000},
+            "structures": [{"name": "intent_patterns", "bytes": 48210, "objects": 402}, ...],
+            "structures_total_bytes": 96512,
+            "tracemalloc": {"tracing": false, "has_baseline": false}
+        }
+    """
+    _require_admin(request)
+    structures = structure_footprints(command_service.memory_structures()) if command_service else []
+    return {
+        "process": process_memory(),
+        "structures": structures,
+        "structures_total_bytes": sum(entry['bytes'] for entry in structures),
+        "tracemalloc": memory_inspector.get_status(),
+        "timestamp": datetime.now().isoformat()
+    }
+
+
+@app.post(f"{API_PREFIX}/admin/memory/snapshot", tags=["Admin"])
+async def memory_snapshot(
+    request: Request,
+    limit: int = Query(20, ge=1, le=200, description="Entries per top list"),
+    group_by: str = Query("lineno", description="lineno, filename or traceback")
+):
+    """
+    Take a tracemalloc snapshot and diff it against the previous one
+    
+    The first call starts tracing and records a baseline. Call again
+    after some traffic to see which allocation sites grew in between.
+    Tracing slows allocations down; stop it with DELETE when done.
+    
+    Returns:
+        dict: Traced totals, top allocation sites and growth since the last snapshot
+    """
+    _require_admin(request)
+    if group_by not in ('lineno', 'filename', 'traceback'):
+        raise HTTPException(status_code=400, detail="group_by must be 'lineno', 'filename' or 'traceback'")
+    result = await asyncio.to_thread(memory_inspector.snapshot, limit, group_by)
+    result["process"] = process_memory()
+    return result
+
+
+@app.get(f"{API_PREFIX}/admin/loop-stalls", tags=["Admin"])
+async def loop_stalls(request: Request):
+    """
+    List recent event loop stalls with the stack of the blocking code
+    
+    A stall is recorded when the loop runs a scheduled probe later than
+    LOOP_LAG_THRESHOLD_MS; the watchdog thread captures the loop thread's
+    stack while it is still blocked.
+    
+    Returns:
+        dict: Lag statistics and recent stalls, newest first
+    
+    Example:
+        GET /api/v1/admin/loop-stalls
+        X-Admin-Token: <token>
+        
+        Response:
+        {
+            "event_loop": {"probes": 5120, "mean_lag_ms": 0.4, "max_lag_ms": 812.0, "stalls": 1, ...},
+            "stalls": [
+                {
+                    "detected_at": "2025-10-25T12:00:00",
+                    "lag_ms": 812.0,
+                    "stack": ['  File "services/speech_service.py", line 70, in write_segment', ...]
+                }
+            ]
+        }
+    """
+    _require_admin(request)
+    if loop_monitor is None:
+        return {"event_loop": None, "stalls": []}
+    return {"event_loop": loop_monitor.get_stats(), "stalls": loop_monitor.get_stalls()}
+
+
+@app.delete(f"{API_PREFIX}/admin/memory/snapshot", tags=["Admin"])
+async def stop_memory_tracing(request: Request):
+    """
+    Stop tracemalloc and drop the baseline snapshot
+    
+    Returns:
+        dict: Tracing status
+    """
+    _require_admin(request)
+    memory_inspector.stop()
+    return {"tracemalloc": memory_inspector.get_status()}
+
+
 # ============================================================================
 # ERROR HANDLERS
 # ============================================================================
@@ -632,10 +1360,14 @@ if __name__ == "__main__":
     print("Press CTRL+C to stop the server")
     print("=" * 60 + "\n")
     
+    import uvicorn
+    
     uvicorn.run(
         "main:app",
         host=HOST,
         port=PORT,
         reload=RELOAD,
-        log_level="info"
+        log_level="info",
+        proxy_headers=False,  # ForwardedClientMiddleware resolves forwarded addresses
+        **WS_SERVER_OPTIONS
     )
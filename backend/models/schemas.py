@@ -3,7 +3,7 @@ Pydantic models for request/response validation
 Defines data schemas for the Urdu Voice Assistant API
 """
 
-from pydantic import BaseModel, Field, validator
+from pydantic import BaseModel, ConfigDict, Field, field_validator
 from typing import Optional, List, Dict, Any
 from datetime import datetime
 
@@ -21,26 +21,35 @@ class CommandRequest(BaseModel):
         None,
         description="Optional user identifier for tracking"
     )
+    session_id: Optional[str] = Field(
+        None,
+        min_length=1,
+        max_length=128,
+        description="Optional conversation id chosen by the client; turns sent with it are kept as history"
+    )
     language: Optional[str] = Field(
         "auto",
         description="Language code: 'ur', 'en', or 'auto' for auto-detection"
     )
     
-    @validator('text')
-    def validate_text(cls, v):
+    @field_validator('text')
+    @classmethod
+    def validate_text(cls, v: str) -> str:
         """Validate and clean text input"""
         if not v or not v.strip():
             raise ValueError("Text cannot be empty")
         return v.strip()
     
-    class Config:
-        schema_extra = {
+    model_config = ConfigDict(
+        json_schema_extra={
             "example": {
                 "text": "السلام علیکم، وقت کیا ہوا ہے؟",
                 "user_id": "user_123",
+                "session_id": "web-k3x9q2",
                 "language": "auto"
             }
         }
+    )
 
 
 class IntentResult(BaseModel):
@@ -61,14 +70,15 @@ class IntentResult(BaseModel):
         description="Extracted entities from the command"
     )
     
-    class Config:
-        schema_extra = {
+    model_config = ConfigDict(
+        json_schema_extra={
             "example": {
                 "intent": "greeting",
                 "confidence": 0.95,
                 "entities": {}
             }
         }
+    )
 
 
 class CommandResponse(BaseModel):
@@ -99,8 +109,8 @@ class CommandResponse(BaseModel):
         description="Response generation timestamp"
     )
     
-    class Config:
-        schema_extra = {
+    model_config = ConfigDict(
+        json_schema_extra={
             "example": {
                 "response_text": "السلام علیکم! کیا حال ہے؟",
                 "audio_file": "/api/v1/audio/response_123.mp3",
@@ -110,6 +120,7 @@ class CommandResponse(BaseModel):
                 "timestamp": "2025-10-24T12:30:00"
             }
         }
+    )
 
 
 class HealthResponse(BaseModel):
@@ -128,14 +139,15 @@ class HealthResponse(BaseModel):
         description="Health check timestamp"
     )
     
-    class Config:
-        schema_extra = {
+    model_config = ConfigDict(
+        json_schema_extra={
             "example": {
                 "status": "healthy",
                 "version": "1.0.0",
                 "timestamp": "2025-10-24T12:30:00"
             }
         }
+    )
 
 
 class CommandInfo(BaseModel):
@@ -154,14 +166,15 @@ class CommandInfo(BaseModel):
         description="Description of the command in Urdu"
     )
     
-    class Config:
-        schema_extra = {
+    model_config = ConfigDict(
+        json_schema_extra={
             "example": {
                 "category": "greeting",
                 "examples": ["سلام", "ہیلو", "آداب"],
                 "description": "اردو وائس اسسٹنٹ سے بات شروع کریں"
             }
         }
+    )
 
 
 class CommandsListResponse(BaseModel):
@@ -176,8 +189,8 @@ class CommandsListResponse(BaseModel):
         description="Total number of commands"
     )
     
-    class Config:
-        schema_extra = {
+    model_config = ConfigDict(
+        json_schema_extra={
             "example": {
                 "commands": [
                     {
@@ -189,6 +202,7 @@ class CommandsListResponse(BaseModel):
                 "total": 8
             }
         }
+    )
 
 
 class ErrorResponse(BaseModel):
@@ -207,14 +221,15 @@ class ErrorResponse(BaseModel):
         description="Error timestamp"
     )
     
-    class Config:
-        schema_extra = {
+    model_config = ConfigDict(
+        json_schema_extra={
             "example": {
                 "error": "Invalid request",
                 "detail": "Text field is required",
                 "timestamp": "2025-10-24T12:30:00"
             }
         }
+    )
 
 
 class AudioGenerationRequest(BaseModel):
@@ -231,13 +246,14 @@ class AudioGenerationRequest(BaseModel):
         description="Language code for speech synthesis"
     )
     
-    class Config:
-        schema_extra = {
+    model_config = ConfigDict(
+        json_schema_extra={
             "example": {
                 "text": "السلام علیکم! کیسے ہیں آپ؟",
                 "language": "ur"
             }
         }
+    )
 
 
 class ConversationHistoryItem(BaseModel):
@@ -260,8 +276,8 @@ class ConversationHistoryItem(BaseModel):
         description="Conversation timestamp"
     )
     
-    class Config:
-        schema_extra = {
+    model_config = ConfigDict(
+        json_schema_extra={
             "example": {
                 "user_input": "وقت کیا ہوا ہے؟",
                 "assistant_response": "ابھی 3:45 دوپہر بجے ہیں",
@@ -269,6 +285,41 @@ class ConversationHistoryItem(BaseModel):
                 "timestamp": "2025-10-24T15:45:00"
             }
         }
+    )
+
+
+class ConversationHistoryResponse(BaseModel):
+    """Response model for a conversation's history"""
+    
+    session_id: str = Field(
+        ...,
+        description="Conversation id sent with the commands"
+    )
+    history: List[ConversationHistoryItem] = Field(
+        ...,
+        description="Recent turns, oldest first"
+    )
+    total: int = Field(
+        ...,
+        description="Number of turns returned"
+    )
+    
+    model_config = ConfigDict(
+        json_schema_extra={
+            "example": {
+                "session_id": "web-k3x9q2",
+                "history": [
+                    {
+                        "user_input": "وقت کیا ہوا ہے؟",
+                        "assistant_response": "ابھی 3:45 دوپہر بجے ہیں",
+                        "intent": "time",
+                        "timestamp": "2025-10-24T15:45:00"
+                    }
+                ],
+                "total": 1
+            }
+        }
+    )
 
 
 # Example usage and validation testing
@@ -282,7 +333,7 @@ if __name__ == "__main__":
         user_id="user_123",
         language="ur"
     )
-    print(f"   ✅ {request.json(ensure_ascii=False, indent=2)}")
+    print(f"   ✅ {request.model_dump_json(indent=2)}")
     
     # Test IntentResult
     print("\n2. IntentResult:")
@@ -291,7 +342,7 @@ if __name__ == "__main__":
         confidence=0.95,
         entities={"greeting_type": "formal"}
     )
-    print(f"   ✅ {intent.json(indent=2)}")
+    print(f"   ✅ {intent.model_dump_json(indent=2)}")
     
     # Test CommandResponse
     print("\n3. CommandResponse:")
@@ -302,6 +353,6 @@ if __name__ == "__main__":
         confidence=0.95,
         language="ur"
     )
-    print(f"   ✅ {response.json(ensure_ascii=False, indent=2)}")
+    print(f"   ✅ {response.model_dump_json(indent=2)}")
     
     print("\n✅ All Pydantic models validated successfully!")
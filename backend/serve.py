@@ -0,0 +1,216 @@
+"""
+Pre-fork server entrypoint for Urdu Voice Assistant
+Loads the shared state once, then forks one API worker per core
+
+The parent process imports the application, loads and compiles the
+read-only data (intent patterns, response templates, static payloads)
+and freezes the garbage collector, so those objects are never touched
+again and their pages stay shared copy-on-write between the workers.
+It then binds the listening socket, forks the workers, each running its
+own uvicorn server (and TTS scheduler) on the shared socket, and
+restarts any worker that dies. SIGTERM / SIGINT stop all workers
+gracefully.
+
+Each worker publishes its counters to a shared board, read by
+GET /api/v1/stats/workers, and its Prometheus samples to a private
+temporary directory, so GET /metrics reports every worker (labelled by
+worker slot) whichever worker answers the scrape.
+
+Usage:
+    cd backend
+    python serve.py [--workers N] [--host 0.0.0.0] [--port 8000]
+
+The worker count defaults to WEB_CONCURRENCY, else one per CPU. Where
+os.fork is unavailable (Windows) a single uvicorn server is started.
+"""
+import gc
+
+# Nothing created while importing and preloading is garbage; collecting it
+# now would only touch (and un-share) objects the workers inherit
+gc.disable()
+
+import argparse
+import os
+import signal
+import socket
+import tempfile
+import threading
+import time
+
+import uvicorn
+
+import main
+from config import HOST, PORT, WEB_WORKERS, WORKER_STATS_INTERVAL_SECONDS, WS_SERVER_OPTIONS
+from utils.logger import setup_logger
+from utils.worker_stats import WorkerMetricsExchange, WorkerStatsBoard
+
+logger = setup_logger("serve")
+
+# A worker dying this soon after it was forked is treated as a crash loop
+CRASH_LOOP_SECONDS = 5
+BACKLOG = 2048
+
+
+def run_worker(
+    sock: socket.socket, slot: int, restarts: int, board: WorkerStatsBoard,
+    exchange: WorkerMetricsExchange
+):
+    """
+    Body of a forked worker: serve the app on the inherited socket
+
+    Args:
+        sock: Listening socket bound by the parent
+        slot: This worker's slot on the stats board
+        restarts: How often this slot has been restarted
+        board: Shared worker stats board
+        exchange: Shared directory of the workers' metric samples
+    """
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    # Frozen (preloaded) objects are not scanned; only new ones are collected
+    gc.enable()
+
+    main.startup_timer.restart()
+    main.worker_board = board
+    main.worker_slot = slot
+    main.metrics_exchange = exchange
+    board.write(
+        slot, pid=os.getpid(), started_at=time.time(), updated_at=0.0, restarts=restarts,
+        commands=0, synthesized=0, rss_bytes=0, pss_bytes=0, private_bytes=0
+    )
+
+    # Forwarded client addresses are resolved by ForwardedClientMiddleware
+    server = uvicorn.Server(uvicorn.Config(
+        main.app, log_level="info", backlog=BACKLOG, proxy_headers=False, **WS_SERVER_OPTIONS
+    ))
+    parent = os.getppid()
+
+    def watch_parent():
+        # A killed parent cannot forward signals; stop instead of serving orphaned
+        while not server.should_exit:
+            if os.getppid() != parent:
+                logger.warning(f"⚠️ Parent {parent} is gone; worker in slot {slot} stopping")
+                server.should_exit = True
+            time.sleep(1)
+
+    threading.Thread(target=watch_parent, name="parent-watch", daemon=True).start()
+    server.run(sockets=[sock])
+
+
+def serve(host: str, port: int, workers: int) -> int:
+    """
+    Preload, fork the workers and supervise them until shut down
+
+    Args:
+        host: Interface to bind
+        port: Port to bind
+        workers: Number of worker processes
+
+    Returns:
+        Process exit code
+    """
+    started = time.perf_counter()
+    main.preload_shared_state()
+    gc.collect()
+    gc.freeze()
+    logger.info(
+        f"📦 Preloaded in {(time.perf_counter() - started) * 1000:.0f} ms, "
+        f"{gc.get_freeze_count()} objects frozen"
+    )
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(BACKLOG)
+    sock.set_inheritable(True)
+
+    board = WorkerStatsBoard(workers)
+    # Samples older than a few publish intervals belong to a hung or dead worker
+    exchange = WorkerMetricsExchange(
+        tempfile.mkdtemp(prefix="uva-metrics-"), max_age=3 * WORKER_STATS_INTERVAL_SECONDS
+    )
+    restarts = [0] * workers
+    children = {}  # pid -> (slot, fork time)
+
+    def spawn(slot: int):
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                run_worker(sock, slot, restarts[slot], board, exchange)
+            except BaseException:
+                logger.exception(f"❌ Worker in slot {slot} crashed")
+                code = 1
+            finally:
+                os._exit(code)
+        children[pid] = (slot, time.monotonic())
+
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        # SIGTERM even for Ctrl+C: uvicorn force-exits on a second SIGINT,
+        # and the terminal already sent one to every worker
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    for slot in range(workers):
+        spawn(slot)
+    logger.info(f"🚀 Serving on http://{host}:{port} with {workers} workers (parent pid {os.getpid()})")
+
+    exit_code = 0
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        slot, forked_at = children.pop(pid, (None, None))
+        if slot is None or stopping:
+            continue
+
+        code = os.waitstatus_to_exitcode(status)
+        if time.monotonic() - forked_at < CRASH_LOOP_SECONDS:
+            logger.error(f"❌ Worker {pid} (slot {slot}) exited with {code} right after start; shutting down")
+            exit_code = 1
+            stop(signal.SIGTERM, None)
+            continue
+        restarts[slot] += 1
+        logger.warning(f"⚠️ Worker {pid} (slot {slot}) exited with {code}; restarting")
+        spawn(slot)
+
+    sock.close()
+    exchange.close()
+    logger.info("👋 All workers stopped")
+    return exit_code
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default=HOST, help="Interface to bind")
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", PORT)), help="Port to bind")
+    parser.add_argument(
+        "--workers", type=int, default=WEB_WORKERS or os.cpu_count() or 1,
+        help="Worker processes (default WEB_CONCURRENCY, else one per CPU)"
+    )
+    args = parser.parse_args()
+
+    if not hasattr(os, "fork"):
+        logger.warning("⚠️ os.fork is not available; starting a single uvicorn server")
+        gc.enable()
+        uvicorn.run(
+            main.app, host=args.host, port=args.port, log_level="info",
+            proxy_headers=False, **WS_SERVER_OPTIONS
+        )
+        return
+    raise SystemExit(serve(args.host, args.port, max(1, args.workers)))
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -1,18 +1,42 @@
 """
 Services package for Urdu Voice Assistant
 Contains all business logic services for command processing
+
+Services are imported on first access, so importing one of them (or the
+package) does not pull in all the others and their dependencies.
 """
-from .speech_service import SpeechService
-from .intent_detector import IntentDetector
-from .response_generator import ResponseGenerator
-from .command_service import CommandService
-
-__all__ = [
-    'SpeechService',
-    'IntentDetector',
-    'ResponseGenerator',
-    'CommandService'
-]
+import importlib
+
+# Public name -> submodule that defines it
+_EXPORTS = {
+    'SpeechService': '.speech_service',
+    'IntentDetector': '.intent_detector',
+    'ResponseGenerator': '.response_generator',
+    'TTSWorkerPool': '.tts_worker',
+    'TTSScheduler': '.tts_scheduler',
+    'TTSPriority': '.tts_scheduler',
+    'TTSQueueFullError': '.tts_scheduler',
+    'ResponsePrefetcher': '.prefetch',
+    'IntentTransitionTable': '.prefetch',
+    'ServiceReadiness': '.readiness',
+    'CommandService': '.command_service'
+}
+
+__all__ = list(_EXPORTS)
 
 __version__ = '1.0.0'
 __author__ = 'Urdu Voice Assistant Team'
+
+
+def __getattr__(name):
+    """Import a service the first time it is accessed"""
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
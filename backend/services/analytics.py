@@ -0,0 +1,373 @@
+"""
+Interaction Analytics - Durable record of every processed command
+Buffers records in memory and appends them to SQLite in batches
+
+record() only appends a tuple to an in-memory buffer, so the request path
+never waits for the disk. A background task writes the buffer with one
+executemany() per batch, on a single writer thread, whenever
+ANALYTICS_BATCH_SIZE records are waiting or ANALYTICS_FLUSH_INTERVAL_SECONDS
+have passed. The buffer holds at most ANALYTICS_BUFFER_SIZE records: when
+the disk falls behind, new records are dropped and counted rather than
+growing memory or slowing requests. Remaining records are written on
+graceful shutdown.
+
+The database runs in WAL mode, so aggregate queries never block the writer
+and every worker process on the host appends to the same file. Records are
+never updated; the table can be copied out for offline analysis while the
+server runs. The user's text is stored only with ANALYTICS_INCLUDE_TEXT,
+and records older than ANALYTICS_RETENTION_DAYS are deleted by the flush
+task about once an hour.
+"""
+import asyncio
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+import sys
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from config import (
+    ANALYTICS_ENABLED,
+    ANALYTICS_DB_PATH,
+    ANALYTICS_BUFFER_SIZE,
+    ANALYTICS_BATCH_SIZE,
+    ANALYTICS_FLUSH_INTERVAL_SECONDS,
+    ANALYTICS_INCLUDE_TEXT,
+    ANALYTICS_RETENTION_DAYS,
+    ANALYTICS_MAX_BUCKETS
+)
+from utils.logger import setup_logger
+from utils.metrics import ANALYTICS_RECORDS_TOTAL
+
+logger = setup_logger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS interactions (
+    ts REAL NOT NULL,
+    user_id TEXT,
+    text TEXT,
+    intent TEXT,
+    confidence REAL,
+    language TEXT,
+    status TEXT NOT NULL,
+    latency_ms REAL,
+    audio_hash TEXT
+);
+CREATE INDEX IF NOT EXISTS interactions_ts_intent ON interactions (ts, intent);
+"""
+_INSERT = "INSERT INTO interactions VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"
+# Range delete on the leading column of the (ts, intent) index
+_PRUNE = "DELETE FROM interactions WHERE ts < ?"
+# Seconds between retention passes; expired rows only need to go eventually
+PRUNE_INTERVAL_SECONDS = 3600
+# The (ts, intent) index covers this query: only the index is read
+_INTENT_COUNTS = """
+SELECT CAST(ts / ? AS INTEGER) AS bucket, intent, COUNT(*)
+FROM interactions
+WHERE ts >= ? AND ts < ?
+GROUP BY bucket, intent
+"""
+
+
+def audio_hash(audio_file: Optional[str]) -> Optional[str]:
+    """
+    Content hash of an audio file, taken from its name
+
+    Args:
+        audio_file: Audio file name such as speech_<sha1>.mp3
+
+    Returns:
+        The hash part of the name, None without a file
+    """
+    if not audio_file:
+        return None
+    return audio_file.rsplit('.', 1)[0].rsplit('_', 1)[-1]
+
+
+class InteractionAnalytics:
+    """Append-only interaction store with batched background writes"""
+
+    def __init__(
+        self,
+        db_path: Path = ANALYTICS_DB_PATH,
+        enabled: bool = ANALYTICS_ENABLED,
+        buffer_size: int = ANALYTICS_BUFFER_SIZE,
+        batch_size: int = ANALYTICS_BATCH_SIZE,
+        flush_interval: float = ANALYTICS_FLUSH_INTERVAL_SECONDS,
+        include_text: bool = ANALYTICS_INCLUDE_TEXT,
+        retention_days: float = ANALYTICS_RETENTION_DAYS
+    ):
+        """
+        Initialize analytics store
+
+        Args:
+            db_path: SQLite database file
+            enabled: Record interactions at all
+            buffer_size: Records held in memory at most; more are dropped
+            batch_size: Buffered records that trigger a flush
+            flush_interval: Seconds between flushes when batches fill slowly
+            include_text: Store the user's text, not just the intent
+            retention_days: Delete records older than this (0 keeps them forever)
+        """
+        self.db_path = Path(db_path)
+        self.enabled = enabled
+        self.buffer_size = max(1, buffer_size)
+        self.batch_size = max(1, min(batch_size, self.buffer_size))
+        self.flush_interval = flush_interval
+        self.include_text = include_text
+        self.retention_days = retention_days
+        self._buffer: List[Tuple] = []
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        # One thread owns the write connection, so batches never interleave
+        self._writer: Optional[ThreadPoolExecutor] = None
+        self._db: Optional[sqlite3.Connection] = None
+        self.stats = {'recorded': 0, 'written': 0, 'dropped': 0, 'failed': 0, 'flushes': 0, 'pruned': 0}
+
+    async def start(self):
+        """Open the database and start the flush task (once per worker process)"""
+        if not self.enabled or self._task is not None:
+            return
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="analytics")
+        try:
+            await asyncio.get_running_loop().run_in_executor(self._writer, self._open)
+        except Exception as e:
+            logger.error(f"❌ Analytics store unavailable, interactions will not be recorded: {e}")
+            self.enabled = False
+            self._writer.shutdown(wait=False)
+            self._writer = None
+            return
+        self._wake = asyncio.Event()
+        self._stopping = False
+        self._task = asyncio.create_task(self._run(), name="analytics-flush")
+        logger.info(f"📊 Recording interactions to {self.db_path}")
+
+    async def stop(self):
+        """Stop the flush task and write the records still buffered"""
+        if self._task is None:
+            return
+        # Let a batch being written finish (and be counted) instead of cancelling it
+        self._stopping = True
+        self._wake.set()
+        await self._task
+        self._task = None
+        await self.flush()
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._writer, self._close)
+        self._writer.shutdown(wait=True)
+        self._writer = None
+        logger.info(f"📊 Analytics flushed ({self.stats['written']} written, {self.stats['dropped']} dropped)")
+
+    def record(
+        self,
+        status: str,
+        user_id: Optional[str] = None,
+        text: str = "",
+        intent: Optional[str] = None,
+        confidence: Optional[float] = None,
+        language: Optional[str] = None,
+        latency: Optional[float] = None,
+        audio_file: Optional[str] = None
+    ):
+        """
+        Buffer one interaction (never blocks)
+
+        Args:
+            status: 'ok', 'error' or 'busy'
+            user_id: User identifier
+            text: User command text (stored only with include_text)
+            intent: Detected intent
+            confidence: Intent confidence score
+            language: Speech language
+            latency: Processing time in seconds
+            audio_file: Audio file name; its content hash is stored
+
+        Example:
+            >>> analytics.record('ok', 'user123', 'سلام', 'greeting', 0.95, 'ur', 0.012, 'speech_ab12.mp3')
+        """
+        if not self.enabled:
+            return
+        if len(self._buffer) >= self.buffer_size:
+            self.stats['dropped'] += 1
+            ANALYTICS_RECORDS_TOTAL.inc("dropped")
+            return
+
+        self._buffer.append((
+            time.time(),
+            user_id,
+            text if self.include_text else None,
+            intent,
+            confidence,
+            language,
+            status,
+            round(latency * 1000, 3) if latency is not None else None,
+            audio_hash(audio_file)
+        ))
+        self.stats['recorded'] += 1
+        if len(self._buffer) >= self.batch_size and self._wake is not None:
+            self._wake.set()
+
+    async def flush(self) -> int:
+        """
+        Write the buffered records as one batch
+
+        Returns:
+            Number of records written
+        """
+        if not self._buffer or self._writer is None:
+            return 0
+        batch, self._buffer = self._buffer, []
+        try:
+            await asyncio.get_running_loop().run_in_executor(self._writer, self._write, batch)
+        except Exception as e:
+            # Dropped rather than retried, so a failing disk cannot grow memory
+            self.stats['failed'] += len(batch)
+            ANALYTICS_RECORDS_TOTAL.inc("failed", amount=len(batch))
+            logger.error(f"❌ Failed to write {len(batch)} analytics records: {e}")
+            return 0
+        self.stats['written'] += len(batch)
+        self.stats['flushes'] += 1
+        ANALYTICS_RECORDS_TOTAL.inc("written", amount=len(batch))
+        return len(batch)
+
+    async def prune(self) -> int:
+        """
+        Delete the records older than the retention period
+
+        Returns:
+            Number of records deleted
+        """
+        if self.retention_days <= 0 or self._writer is None:
+            return 0
+        cutoff = time.time() - self.retention_days * 86400
+        try:
+            deleted = await asyncio.get_running_loop().run_in_executor(self._writer, self._delete_before, cutoff)
+        except Exception as e:
+            logger.error(f"❌ Failed to prune analytics records: {e}")
+            return 0
+        self.stats['pruned'] += deleted
+        if deleted:
+            logger.info(f"📊 Pruned {deleted} analytics records older than {self.retention_days:g} days")
+        return deleted
+
+    async def _run(self):
+        """Flush whenever a batch fills up or the interval passes, prune every PRUNE_INTERVAL_SECONDS"""
+        next_prune = 0.0
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self.flush()
+            if self.retention_days > 0 and time.monotonic() >= next_prune:
+                await self.prune()
+                next_prune = time.monotonic() + PRUNE_INTERVAL_SECONDS
+
+    def _connect(self) -> sqlite3.Connection:
+        db = sqlite3.connect(self.db_path, timeout=30, isolation_level=None, check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        return db
+
+    def _open(self):
+        """Create the database on the writer thread"""
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = self._connect()
+        self._db.executescript(_SCHEMA)
+
+    def _write(self, batch: List[Tuple]):
+        """Append one batch in a single transaction (writer thread)"""
+        with self._db:
+            self._db.execute("BEGIN")
+            self._db.executemany(_INSERT, batch)
+
+    def _delete_before(self, cutoff: float) -> int:
+        """Delete records older than cutoff in one transaction (writer thread)"""
+        with self._db:
+            self._db.execute("BEGIN")
+            return self._db.execute(_PRUNE, (cutoff,)).rowcount
+
+    def _close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    async def intent_counts(self, since: float, until: float, window: float) -> Dict:
+        """
+        Count interactions per intent in fixed time windows
+
+        Runs on its own read connection; in WAL mode it neither waits for
+        nor delays the writer. Records still buffered (at most one flush
+        interval old) are not included.
+
+        Args:
+            since: Start of the range (Unix time, inclusive)
+            until: End of the range (Unix time, exclusive)
+            window: Window length in seconds; windows are aligned to
+                multiples of it since the Unix epoch (3600 = clock hours)
+
+        Returns:
+            Dictionary with the non-empty windows (start, counts, total),
+            totals per intent over the whole range, and the grand total
+
+        Raises:
+            ValueError: If the range is empty or needs more than
+                ANALYTICS_MAX_BUCKETS windows
+        """
+        if until <= since or window <= 0:
+            raise ValueError("until must be after since and window must be positive")
+        if (until - since) / window > ANALYTICS_MAX_BUCKETS:
+            raise ValueError(f"At most {ANALYTICS_MAX_BUCKETS} windows per query")
+
+        rows = await asyncio.to_thread(self._query, since, until, window) if self.db_path.exists() else []
+
+        windows: Dict[int, Dict[str, int]] = {}
+        totals: Dict[str, int] = {}
+        for bucket, intent, count in rows:
+            intent = intent or 'unknown'
+            counts = windows.setdefault(bucket, {})
+            counts[intent] = counts.get(intent, 0) + count
+            totals[intent] = totals.get(intent, 0) + count
+
+        return {
+            'since': datetime.fromtimestamp(since).isoformat(),
+            'until': datetime.fromtimestamp(until).isoformat(),
+            'window_seconds': window,
+            'windows': [
+                {
+                    'start': datetime.fromtimestamp(bucket * window).isoformat(),
+                    'counts': counts,
+                    'total': sum(counts.values())
+                }
+                for bucket, counts in sorted(windows.items())
+            ],
+            'totals': dict(sorted(totals.items(), key=lambda item: -item[1])),
+            'total': sum(totals.values())
+        }
+
+    def _query(self, since: float, until: float, window: float) -> List[Tuple]:
+        db = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True, timeout=30)
+        try:
+            return db.execute(_INTENT_COUNTS, (window, since, until)).fetchall()
+        finally:
+            db.close()
+
+    def get_stats(self) -> Dict:
+        """
+        Get analytics counters
+
+        Returns:
+            Dictionary with enabled flag, buffered records and lifetime counters
+        """
+        return {
+            'enabled': self.enabled,
+            'include_text': self.include_text,
+            'retention_days': self.retention_days,
+            'buffered': len(self._buffer),
+            'buffer_size': self.buffer_size,
+            **self.stats
+        }
@@ -2,15 +2,35 @@
 Command Service - Main service that orchestrates intent detection and response generation
 This is the core service that brings everything together
 """
-from typing import Dict, Optional
+import asyncio
+import hashlib
+import json
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
 from pathlib import Path
 import sys
 sys.path.append(str(Path(__file__).resolve().parent.parent))
 from services.intent_detector import IntentDetector
 from services.response_generator import ResponseGenerator
 from services.speech_service import SpeechService
+from services.tts_scheduler import TTSScheduler, TTSPriority, TTSQueueFullError
+from services.tts_worker import TTSWorkerPool
+from services.prefetch import ResponsePrefetcher
+from services.session_store import SessionStore
+from services.analytics import InteractionAnalytics
+from config import TTS_WORKER_PROCESSES, PREFETCH_ENABLED, CACHE_INTENT_TTL_SECONDS
 from utils.logger import setup_logger
 from utils.helpers import detect_language
+from utils.request_log import RequestLog
+from utils.cache_backend import create_cache_backend
+from utils.json_response import dumps
+from utils.metrics import (
+    REGISTRY,
+    STAGE_LATENCY,
+    REQUEST_LATENCY,
+    INTENTS_TOTAL,
+    UNKNOWN_INTENTS_TOTAL
+)
 
 logger = setup_logger(__name__)
 
@@ -21,25 +41,108 @@ class CommandService:
     Orchestrates intent detection, response generation, and speech synthesis
     """
     
-    def __init__(self):
-        """Initialize command service with all sub-services"""
+    def __init__(
+        self,
+        intent_detector: Optional[IntentDetector] = None,
+        response_generator: Optional[ResponseGenerator] = None,
+        speech_service: Optional[SpeechService] = None
+    ):
+        """
+        Initialize command service with all sub-services
+        
+        Args:
+            intent_detector: Already built IntentDetector (built here if None)
+            response_generator: Already built ResponseGenerator (built here if None)
+            speech_service: Already built SpeechService (built here if None)
+        """
         logger.info("🚀 Initializing CommandService...")
         
         try:
-            self.intent_detector = IntentDetector()
-            self.response_generator = ResponseGenerator()
-            self.speech_service = SpeechService()
+            self.intent_detector = intent_detector or IntentDetector()
+            self.response_generator = response_generator or ResponseGenerator()
+            self.speech_service = speech_service or SpeechService()
+            
+            # Optional out-of-process synthesis (TTS_WORKER_PROCESSES > 0)
+            worker_pool = TTSWorkerPool(TTS_WORKER_PROCESSES) if TTS_WORKER_PROCESSES > 0 else None
+            
+            # Intent results, and with a shared backend (CACHE_BACKEND_URL) also
+            # synthesized segments, are reused across requests, processes and nodes
+            self.cache = create_cache_backend()
+            self._background = set()
+            self.tts_scheduler = TTSScheduler(
+                self.speech_service,
+                worker_pool=worker_pool,
+                shared_cache=self.cache if self.cache.shared else None
+            )
+            
+            self.prefetcher = ResponsePrefetcher(
+                self.tts_scheduler,
+                self.response_generator,
+                language_for=self._speech_language
+            ) if PREFETCH_ENABLED else None
+            
+            # Recent turns per WebSocket conversation, bounded in count, bytes and idle time
+            self.sessions = SessionStore()
+            
+            # One structured JSONL record per request (sampled)
+            self.request_log = RequestLog()
+            
+            # Every interaction, appended to SQLite in batches off the request path
+            self.analytics = InteractionAnalytics()
             
             logger.info("✅ CommandService initialized successfully with all sub-services")
         except Exception as e:
             logger.error(f"❌ Failed to initialize CommandService: {e}")
             raise
     
+    @classmethod
+    async def create(
+        cls,
+        intent_detector: Optional[IntentDetector] = None,
+        response_generator: Optional[ResponseGenerator] = None
+    ) -> 'CommandService':
+        """
+        Build the command service with its sub-services loaded concurrently
+        
+        IntentDetector, ResponseGenerator and SpeechService each read their
+        data (JSON files, the audio directory) independently, so they are
+        built in parallel threads instead of one after another. Components
+        passed in (loaded before the server forked, see serve.py) are used
+        as they are.
+        
+        Args:
+            intent_detector: Already loaded intent detector, if any
+            response_generator: Already loaded response generator, if any
+        
+        Returns:
+            Initialized CommandService
+        
+        Example:
+            >>> service = await CommandService.create()
+        """
+        started = time.perf_counter()
+        
+        async def build(component, factory):
+            return component if component is not None else await asyncio.to_thread(factory)
+        
+        intent_detector, response_generator, speech_service = await asyncio.gather(
+            build(intent_detector, IntentDetector),
+            build(response_generator, ResponseGenerator),
+            asyncio.to_thread(SpeechService)
+        )
+        logger.debug("Sub-services loaded in %.1f ms", (time.perf_counter() - started) * 1000)
+        return cls(intent_detector, response_generator, speech_service)
+    
     async def process_command(
         self, 
         text: str, 
         user_id: Optional[str] = None,
-        language_hint: str = "auto"
+        language_hint: str = "auto",
+        session_id: Optional[str] = None,
+        on_response: Optional[Callable[[Dict], Awaitable[None]]] = None,
+        on_segments: Optional[Callable[[List[asyncio.Future]], None]] = None,
+        detected: Optional[Tuple[str, float, Dict]] = None,
+        response_text: Optional[str] = None
     ) -> Dict:
         """
         Process user command end-to-end
@@ -48,12 +151,24 @@ class CommandService:
         1. Detects intent from user text
         2. Generates appropriate response
         3. Converts response to speech
-        4. Returns complete result
+        4. Records stage latencies and returns complete result
         
         Args:
             text: User command text (Urdu/English/mixed)
             user_id: Optional user identifier for logging/tracking
             language_hint: Language hint ('ur', 'en', or 'auto')
+            session_id: Conversation whose history the response sees and
+                that the turn is added to (None = no history, as for
+                one-off HTTP requests)
+            on_response: Awaited with the response text, intent, confidence
+                and language as soon as they are known, before synthesis
+                (lets a connected client show the reply while audio is made)
+            on_segments: Called with the per-sentence audio futures as soon
+                as they are queued (lets a client stream segments in order)
+            detected: Intent result already computed for this text (e.g. by an
+                IncrementalMatcher over interim transcripts)
+            response_text: Response already generated for the detected intent
+                (a speculation confirmed by the final transcript)
         
         Returns:
             Dictionary containing:
@@ -63,6 +178,11 @@ class CommandService:
             - confidence: Confidence score
             - language: Detected language
             - entities: Extracted entities
+            - cache: Audio cache outcome ('hit', 'miss', 'error', 'none')
+            - timings: Stage durations in seconds
+        
+        Raises:
+            TTSQueueFullError: If the TTS queue is saturated
         
         Example:
             >>> service = CommandService()
@@ -70,67 +190,227 @@ class CommandService:
             >>> print(result['response_text'])
             'السلام علیکم! کیا حال ہے؟'
         """
+        # Per-request details go to the structured request log; these
+        # human-readable lines are DEBUG and formatted only when enabled
+        intent = None
+        started = time.perf_counter()
         try:
-            logger.info(f"⚡ Processing command: '{text}' (user: {user_id or 'anonymous'})")
+            logger.debug("⚡ Processing command: '%s' (user: %s)", text, user_id or 'anonymous')
             
             # Step 1: Detect intent
-            intent, confidence, entities = self.intent_detector.detect_intent(text)
+            if detected is None:
+                detected = await self._detect_intent(text)
+            intent, confidence, entities = detected
+            intent_done = time.perf_counter()
             
-            logger.info(f"🧠 Intent: {intent} (confidence: {confidence:.2f})")
+            logger.debug("🧠 Intent: %s (confidence: %.2f)", intent, confidence)
             
             # Step 2: Generate response
-            response_text = self.response_generator.generate_response(
-                intent=intent,
-                confidence=confidence,
-                entities=entities
-            )
+            if response_text is None:
+                response_text = self.response_generator.generate_response(
+                    intent=intent,
+                    confidence=confidence,
+                    entities=entities,
+                    context=self.response_context(user_id, session_id)
+                )
+            response_done = time.perf_counter()
             
-            logger.info(f"💬 Response: {response_text[:50]}...")
+            logger.debug("💬 Response: %.50s...", response_text)
             
             # Step 3: Detect language for speech synthesis
-            if language_hint == "auto":
-                detected_lang = detect_language(response_text)
-                # Convert 'mixed' to 'ur' for speech (gTTS handles Urdu best)
-                speech_lang = 'ur' if detected_lang in ['ur', 'mixed'] else 'en'
-            else:
-                speech_lang = language_hint if language_hint in ['ur', 'en'] else 'ur'
+            speech_lang = self._speech_language(response_text, language_hint)
+            language_done = time.perf_counter()
             
-            # Step 4: Convert to speech
+            if on_response is not None:
+                await on_response({
+                    'response_text': response_text,
+                    'intent': intent,
+                    'confidence': round(confidence, 2),
+                    'language': speech_lang
+                })
+            
+            # Step 4: Convert to speech (queued behind the TTS scheduler)
             audio_filename = None
+            cache_outcome = 'none'
             try:
-                audio_filename = self.speech_service.text_to_speech(
+                await self.tts_scheduler.prepare(response_text, speech_lang)
+                futures = self.tts_scheduler.enqueue(
                     text=response_text,
-                    lang=speech_lang
+                    lang=speech_lang,
+                    priority=TTSPriority.INTERACTIVE
                 )
-                logger.info(f"🎤 Audio generated: {audio_filename}")
+                cache_outcome = 'hit' if all(f.done() for f in futures) else 'miss'
+                if on_segments is not None:
+                    on_segments(futures)
+                audio_filename = await self.tts_scheduler.collect(futures)
+                logger.debug("🎤 Audio generated: %s", audio_filename)
+            except TTSQueueFullError:
+                raise
             except Exception as e:
                 logger.error(f"❌ Speech generation failed: {e}")
+                cache_outcome = 'error'
                 # Continue without audio - not critical
+            tts_done = time.perf_counter()
+            
+            # Step 4b: Speculatively synthesize the likely next responses
+            if self.prefetcher is not None:
+                self.prefetcher.record_served(response_text, speech_lang)
+                self.prefetcher.after_response(user_id, intent)
             
-            # Step 5: Prepare result
+            # Step 5: Record the turn and stage latencies
+            self.sessions.record(session_id, text, response_text, intent)
+            timings = {
+                'intent': intent_done - started,
+                'response': response_done - intent_done,
+                'language': language_done - response_done,
+                'tts': tts_done - language_done,
+                'total': time.perf_counter() - started
+            }
+            self._record_metrics(intent, cache_outcome, timings)
+            self.request_log.record(
+                status='ok',
+                user_id=user_id,
+                text=text,
+                intent=intent,
+                confidence=confidence,
+                language=speech_lang,
+                cache=cache_outcome,
+                timings=timings,
+                audio_file=audio_filename,
+                response_text=response_text
+            )
+            self.analytics.record(
+                status='ok',
+                user_id=user_id,
+                text=text,
+                intent=intent,
+                confidence=confidence,
+                language=speech_lang,
+                latency=timings['total'],
+                audio_file=audio_filename
+            )
+            
+            # Step 6: Prepare result
             result = {
                 'response_text': response_text,
                 'audio_file': audio_filename,
                 'intent': intent,
                 'confidence': round(confidence, 2),
                 'language': speech_lang,
-                'entities': entities
+                'entities': entities,
+                'cache': cache_outcome,
+                'timings': timings
             }
             
-            logger.info(f"✅ Command processed successfully: {intent}")
+            logger.debug("✅ Command processed successfully: %s", intent)
             
             return result
             
+        except TTSQueueFullError:
+            # Backpressure must reach the API layer (503), not become an error reply
+            self.request_log.record(status='busy', user_id=user_id, text=text, intent=intent)
+            self.analytics.record(
+                status='busy', user_id=user_id, text=text, intent=intent,
+                latency=time.perf_counter() - started
+            )
+            raise
         except Exception as e:
             logger.error(f"❌ Command processing failed: {e}", exc_info=True)
+            self.request_log.record(status='error', user_id=user_id, text=text, intent=intent)
+            self.analytics.record(
+                status='error', user_id=user_id, text=text, intent=intent,
+                latency=time.perf_counter() - started
+            )
             
             # Return error response
-            return self._get_error_result()
+            return await self._get_error_result()
+    
+    def response_context(self, user_id: Optional[str], session_id: Optional[str] = None) -> Dict:
+        """
+        Build the context passed to response handlers
+        
+        Args:
+            user_id: User identifier
+            session_id: Conversation identifier
+        
+        Returns:
+            Dictionary with 'user_id' and 'history' (the conversation's
+            recent SessionTurn objects, oldest first; empty without one)
+        """
+        return {'user_id': user_id, 'history': self.sessions.history(session_id)}
+    
+    async def _detect_intent(self, text: str) -> Tuple[str, float, Dict]:
+        """
+        Detect intent, reusing the cached result for the same text
+        
+        Results are keyed on the pattern fingerprint, so they are shared by
+        nodes with the same patterns and never outlive a pattern change.
+        
+        Args:
+            text: User command text
+        
+        Returns:
+            Tuple of (intent, confidence, entities)
+        """
+        digest = hashlib.sha1(text.encode('utf-8')).hexdigest()
+        key = f"intent:{self.intent_detector.fingerprint}:{digest}"
+        cached = await self.cache.get(key)
+        if cached is not None:
+            intent, confidence, entities = json.loads(cached)
+            return intent, confidence, entities
+        
+        result = self.intent_detector.detect_intent(text)
+        value = dumps(list(result))
+        if self.cache.shared:
+            # Do not make the caller wait for the write round trip
+            task = asyncio.create_task(self.cache.set(key, value, CACHE_INTENT_TTL_SECONDS))
+            self._background.add(task)
+            task.add_done_callback(self._background.discard)
+        else:
+            await self.cache.set(key, value, CACHE_INTENT_TTL_SECONDS)
+        return result
     
-    def _get_error_result(self) -> Dict:
+    def _record_metrics(self, intent: str, cache_outcome: str, timings: Dict[str, float]):
+        """
+        Record per-stage latency histograms and intent counters
+        
+        Args:
+            intent: Detected intent
+            cache_outcome: 'hit', 'miss', 'error' or 'none'
+            timings: Stage durations in seconds
+        """
+        for stage in ('intent', 'response', 'language', 'tts'):
+            STAGE_LATENCY.observe(timings[stage], stage, intent, cache_outcome)
+        REQUEST_LATENCY.observe(timings['total'], intent, cache_outcome)
+        INTENTS_TOTAL.inc(intent)
+        if intent == 'unknown':
+            UNKNOWN_INTENTS_TOTAL.inc()
+    
+    def _speech_language(self, response_text: str, language_hint: str = "auto") -> str:
+        """
+        Choose the speech synthesis language for a response
+        
+        Args:
+            response_text: Generated response text
+            language_hint: Language hint ('ur', 'en', or 'auto')
+        
+        Returns:
+            'ur' or 'en'
+        """
+        if language_hint == "auto":
+            detected_lang = detect_language(response_text)
+            # Convert 'mixed' to 'ur' for speech (gTTS handles Urdu best)
+            return 'ur' if detected_lang in ['ur', 'mixed'] else 'en'
+        return language_hint if language_hint in ['ur', 'en'] else 'ur'
+    
+    async def _get_error_result(self) -> Dict:
         """
         Get error result when command processing fails
         
+        The error audio goes through the TTS scheduler like any reply, so it
+        is served from the cache when present and otherwise waits its turn
+        instead of blocking the event loop on gTTS.
+        
         Returns:
             Error result dictionary
         """
@@ -139,12 +419,15 @@ class CommandService:
         # Try to generate error audio
         audio_filename = None
         try:
-            audio_filename = self.speech_service.text_to_speech(
+            await self.tts_scheduler.prepare(error_response, 'ur')
+            futures = self.tts_scheduler.enqueue(
                 text=error_response,
-                lang='ur'
+                lang='ur',
+                priority=TTSPriority.INTERACTIVE
             )
-        except:
-            logger.warning("⚠️ Could not generate error audio")
+            audio_filename = await self.tts_scheduler.collect(futures)
+        except Exception as e:
+            logger.warning(f"⚠️ Could not generate error audio: {e}")
         
         return {
             'response_text': error_response,
@@ -152,7 +435,9 @@ class CommandService:
             'intent': 'error',
             'confidence': 0.0,
             'language': 'ur',
-            'entities': {}
+            'entities': {},
+            'cache': 'none',
+            'timings': {}
         }
     
     def get_available_commands(self) -> Dict:
@@ -188,6 +473,28 @@ class CommandService:
                 'status': 'error'
             }
     
+    def memory_structures(self) -> Dict[str, object]:
+        """
+        Get the long-lived in-process structures worth sizing
+        
+        Returns:
+            Dictionary of structure name -> object, for deep size accounting
+        """
+        structures = {
+            'intent_patterns': self.intent_detector.patterns,
+            'response_catalog': self.response_generator.responses,
+            'jokes': self.response_generator.jokes,
+            'session.joke_cursors': self.response_generator._joke_cursors,
+            'tts.inflight_jobs': self.tts_scheduler._inflight,
+            'session.history': self.sessions._sessions,
+            'metrics_registry': REGISTRY,
+        }
+        if self.prefetcher is not None:
+            structures['prefetch.transitions'] = self.prefetcher.transitions.counts
+            structures['session.last_intent'] = self.prefetcher.transitions._last_intent
+            structures['prefetch.ledger'] = self.prefetcher._ledger
+        return structures
+    
     def get_service_status(self) -> Dict:
         """
         Get status of all sub-services
@@ -201,6 +508,11 @@ class CommandService:
                 'intent_detector': 'healthy' if self.intent_detector else 'unavailable',
                 'response_generator': 'healthy' if self.response_generator else 'unavailable',
                 'speech_service': 'healthy' if self.speech_service else 'unavailable',
+                'tts_backend': self.speech_service.backend,
+                'tts_queue_depth': self.tts_scheduler.depth,
+                'prefetch': self.prefetcher.get_stats() if self.prefetcher else 'disabled',
+                'request_log': self.request_log.get_stats(),
+                'analytics': self.analytics.get_stats(),
                 'total_intents': len(self.intent_detector.get_all_intents()),
                 'status': 'operational'
             }
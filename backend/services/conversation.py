@@ -0,0 +1,403 @@
+"""
+Conversation Gateway - Persistent WebSocket conversations
+Answers many turns over one connection: reply text first, then the audio
+
+Protocol (one JSON text message per utterance):
+    client  {"text": "سلام", "user_id": "u1", "language": "auto",
+             "audio": "binary" | "url", "id": "turn-1"}
+    server  {"type": "response", "id", "intent", "confidence",
+             "response_text", "language"}           as soon as the reply is known
+    then, with audio "binary" (default):
+            {"type": "audio_start", "id", "segments", "format": "mp3"}
+            one binary frame per sentence, in order (frames concatenate to MP3)
+            {"type": "audio_end", "id", "audio_file"}
+    or, with audio "url":
+            {"type": "audio", "id", "audio_file", "url"}
+    errors  {"type": "error", "id", "status", "detail"[, "retry_after"]}
+            (the connection stays open; a 503 after a response means the
+            reply has no audio because the TTS queue is saturated)
+    {"type": "ping"} is answered with {"type": "pong"}.
+    {"type": "history"[, "limit": n]} is answered with
+            {"type": "history", "id", "turns": [{"user_input",
+             "assistant_response", "intent", "timestamp"}, ...]}
+    the turns of this conversation, oldest first. History belongs to the
+    connection (services/session_store.py): response handlers see it, and
+    it is forgotten when the connection closes.
+    Utterances are rate limited per user and per IP like POST
+    /process-command; one over the limit gets a 429 error with
+    retry_after (seconds).
+
+Streaming recognition: while the user speaks, the client may send the
+interim transcripts of the utterance it is about to send,
+    client  {"type": "interim", "text": "موسم کی", "id": "turn-1"}
+    server  {"type": "hypothesis", "id", "intent", "confidence", "speculating"}
+            (only when the leading intent changes or a speculation starts)
+and then the final transcript as a normal message with the same id. Once
+the leading intent is stable its response is generated and synthesized
+speculatively (services/speculation.py); the final message reuses that
+work when it confirms the intent, so the reply and audio come sooner.
+An utterance is charged to the rate limit once, by its first interim
+transcript (its final message then costs nothing more); interims of an
+utterance over the limit get the 429 error and start no speculation.
+
+Turns on one connection are answered in order. An idle connection holds
+no task of its own besides the one waiting for its next message; a single
+sweeper closes connections that stay silent for WS_IDLE_TIMEOUT_SECONDS.
+"""
+import asyncio
+import json
+import math
+import time
+from typing import Dict, List, Optional, Tuple
+from pathlib import Path
+import sys
+
+from fastapi import WebSocket, WebSocketDisconnect
+from pydantic import ValidationError
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from config import API_PREFIX, SESSION_MAX_USER_ID_LENGTH, WS_MAX_CONNECTIONS, WS_IDLE_TIMEOUT_SECONDS
+from models.schemas import CommandRequest
+from services.speculation import SpeculativeUtterance
+from services.tts_scheduler import TTSQueueFullError
+from utils.rate_limit import RateLimiter, retry_after
+from utils.json_response import dumps
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+AUDIO_MODES = ('binary', 'url')
+MAX_INTERIM_LENGTH = 500  # Same limit as CommandRequest.text
+# Close codes (RFC 6455): going away / try again later
+CLOSE_IDLE = 1001
+CLOSE_OVERLOADED = 1013
+
+
+class ConversationGateway:
+    """Serves WebSocket conversations and closes idle ones"""
+
+    def __init__(
+        self,
+        max_connections: int = WS_MAX_CONNECTIONS,
+        idle_timeout: float = WS_IDLE_TIMEOUT_SECONDS,
+        rate_limiter: Optional[RateLimiter] = None
+    ):
+        """
+        Initialize gateway
+
+        Args:
+            max_connections: Open conversations allowed in this process
+            idle_timeout: Seconds of silence before a conversation is closed (0 = never)
+            rate_limiter: Limiter each utterance is admitted by (None = unlimited)
+        """
+        self.max_connections = max_connections
+        self.idle_timeout = idle_timeout
+        self.rate_limiter = rate_limiter
+        # Open connection -> last activity (inf while a turn is being answered)
+        self._last_seen: Dict[WebSocket, float] = {}
+        # Connection -> (turn id, utterance) while interim transcripts arrive
+        self._utterances: Dict[WebSocket, Tuple[object, SpeculativeUtterance]] = {}
+        self._sweeper: Optional[asyncio.Task] = None
+        self.stats = {
+            'opened': 0,
+            'refused': 0,
+            'idle_closed': 0,
+            'turns': 0,
+            'interims': 0,
+            'errors': 0,
+            'audio_frames': 0,
+            'audio_bytes': 0
+        }
+
+    async def start(self):
+        """Start the idle connection sweeper"""
+        if self.idle_timeout > 0 and self._sweeper is None:
+            self._sweeper = asyncio.create_task(self._sweep(), name="ws-idle-sweeper")
+
+    async def stop(self):
+        """Stop the sweeper (the server closes the connections themselves)"""
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            await asyncio.gather(self._sweeper, return_exceptions=True)
+            self._sweeper = None
+
+    async def serve(self, websocket: WebSocket, command_service):
+        """
+        Run one conversation until the client disconnects
+
+        Args:
+            websocket: Connection to accept
+            command_service: Initialized CommandService answering the turns
+        """
+        if len(self._last_seen) >= self.max_connections:
+            self.stats['refused'] += 1
+            logger.warning(f"⚠️ Refusing conversation, {len(self._last_seen)} already open")
+            await websocket.close(code=CLOSE_OVERLOADED)
+            return
+
+        await websocket.accept()
+        self.stats['opened'] += 1
+        # The connection stays in this process, so its history does too
+        session_id = f"ws-{self.stats['opened']}"
+        self._last_seen[websocket] = time.monotonic()
+        try:
+            while True:
+                message = await websocket.receive()
+                if message['type'] == 'websocket.disconnect':
+                    break
+                self._last_seen[websocket] = math.inf
+                await self._answer(websocket, command_service, session_id, message)
+                self._last_seen[websocket] = time.monotonic()
+        except WebSocketDisconnect:
+            pass
+        finally:
+            self._last_seen.pop(websocket, None)
+            pending = self._utterances.pop(websocket, None)
+            if pending is not None:
+                pending[1].discard()
+            command_service.sessions.end(session_id)
+
+    async def _answer(self, websocket: WebSocket, command_service, session_id: str, message: Dict):
+        """Parse one client message and answer it"""
+        try:
+            data = json.loads(message.get('text') or message.get('bytes') or '')
+            if not isinstance(data, dict):
+                raise ValueError("message must be a JSON object")
+        except ValueError:
+            await self._error(websocket, None, 400, "Messages must be JSON objects")
+            return
+
+        turn_id = data.get('id')
+        if data.get('type') == 'ping':
+            await self._send(websocket, {'type': 'pong', 'id': turn_id})
+            return
+        if data.get('type') == 'interim':
+            await self._interim(websocket, command_service, session_id, data, turn_id)
+            return
+        if data.get('type') == 'history':
+            limit = data.get('limit')
+            if limit is not None and (type(limit) is not int or limit < 1):
+                await self._error(websocket, turn_id, 400, "limit must be a positive integer")
+                return
+            turns = command_service.sessions.history(session_id, limit)
+            await self._send(websocket, {
+                'type': 'history',
+                'id': turn_id,
+                'turns': [turn.to_item().model_dump(mode='json') for turn in turns]
+            })
+            return
+
+        audio_mode = data.get('audio', 'binary')
+        if audio_mode not in AUDIO_MODES:
+            await self._error(websocket, turn_id, 400, f"audio must be one of: {', '.join(AUDIO_MODES)}")
+            return
+        try:
+            request = CommandRequest.model_validate(data)
+        except ValidationError as e:
+            await self._error(websocket, turn_id, 400, e.errors()[0]['msg'])
+            return
+
+        # An utterance speculated on was charged by its first interim transcript
+        pending = self._utterances.get(websocket)
+        if (pending is None or pending[0] != turn_id) and not await self._admit(websocket, turn_id, request.user_id):
+            return
+
+        self.stats['turns'] += 1
+        await self._turn(websocket, command_service, session_id, request, turn_id, audio_mode)
+
+    async def _interim(self, websocket: WebSocket, command_service, session_id: str, data: Dict, turn_id):
+        """Match an interim transcript and speculate once its intent is stable"""
+        text = data.get('text')
+        if not isinstance(text, str) or len(text) > MAX_INTERIM_LENGTH:
+            await self._error(websocket, turn_id, 400, "Interim text must be a string of at most 500 characters")
+            return
+        self.stats['interims'] += 1
+
+        pending = self._utterances.get(websocket)
+        if pending is None or pending[0] != turn_id:
+            # First interim of a new utterance; one left unfinished is abandoned
+            if pending is not None:
+                self._utterances.pop(websocket)
+                pending[1].discard()
+            user_id = data.get('user_id')
+            if not isinstance(user_id, str) or len(user_id) > SESSION_MAX_USER_ID_LENGTH:
+                user_id = None
+            # Speculation queues real work, so a new utterance costs a request
+            if not await self._admit(websocket, turn_id, user_id):
+                return
+            utterance = SpeculativeUtterance(
+                command_service,
+                user_id=user_id,
+                language_hint=data.get('language') or 'auto',
+                session_id=session_id
+            )
+            pending = self._utterances[websocket] = (turn_id, utterance)
+
+        hypothesis = pending[1].update(text)
+        if hypothesis is not None:
+            await self._send(websocket, {'type': 'hypothesis', 'id': turn_id, **hypothesis})
+
+    async def _admit(self, websocket: WebSocket, turn_id, user_id: Optional[str]) -> bool:
+        """
+        Charge an utterance to the user's and the client IP's rate limit
+
+        Returns:
+            True if admitted; otherwise a 429 error has been sent
+        """
+        if self.rate_limiter is None:
+            return True
+        client = websocket.client
+        wait = self.rate_limiter.acquire(websocket.scope['path'], client.host if client else 'unknown', user_id)
+        if wait > 0:
+            await self._error(
+                websocket, turn_id, 429, "Too many requests, please slow down",
+                retry_after=retry_after(wait)
+            )
+            return False
+        return True
+
+    async def _turn(
+        self,
+        websocket: WebSocket,
+        command_service,
+        session_id: str,
+        request: CommandRequest,
+        turn_id,
+        audio_mode: str
+    ):
+        """Answer one utterance: reply text first, then its audio"""
+        responded = False
+        stream: Optional[asyncio.Task] = None
+
+        async def on_response(reply: Dict):
+            nonlocal responded
+            responded = True
+            await self._send(websocket, {'type': 'response', 'id': turn_id, **reply})
+
+        def on_segments(futures: List[asyncio.Future]):
+            nonlocal stream
+            if audio_mode == 'binary':
+                stream = asyncio.create_task(self._stream(websocket, command_service, futures, turn_id))
+
+        # Settle the speculation built from this utterance's interim transcripts
+        detected = response_text = None
+        pending = self._utterances.pop(websocket, None)
+        if pending is not None:
+            if pending[0] == turn_id:
+                detected, response_text = pending[1].finish(request.text)
+            else:
+                pending[1].discard()
+
+        try:
+            result = await command_service.process_command(
+                text=request.text,
+                user_id=request.user_id,
+                language_hint=request.language,
+                session_id=session_id,
+                on_response=on_response,
+                on_segments=on_segments,
+                detected=detected,
+                response_text=response_text
+            )
+        except TTSQueueFullError as e:
+            await self._error(
+                websocket, turn_id, 503, "Speech service is busy, please retry shortly",
+                retry_after=e.retry_after
+            )
+            return
+
+        if not responded:
+            # Processing failed before a reply was ready: send the apology instead
+            await self._send(websocket, {
+                'type': 'response',
+                'id': turn_id,
+                'response_text': result['response_text'],
+                'intent': result['intent'],
+                'confidence': result['confidence'],
+                'language': result['language']
+            })
+
+        audio_file = result['audio_file']
+        if stream is not None and await stream:
+            await self._send(websocket, {'type': 'audio_end', 'id': turn_id, 'audio_file': audio_file})
+        elif audio_file is None:
+            await self._error(websocket, turn_id, 500, "Speech generation failed")
+        else:
+            # Also the fallback when binary streaming failed part way
+            await self._send(websocket, {
+                'type': 'audio',
+                'id': turn_id,
+                'audio_file': audio_file,
+                'url': f"{API_PREFIX}/audio/{audio_file}"
+            })
+
+    async def _stream(self, websocket: WebSocket, command_service, futures: List[asyncio.Future], turn_id) -> bool:
+        """
+        Send each sentence's audio as a binary frame as soon as it is ready
+
+        Returns:
+            True if every segment was sent
+        """
+        if not await self._send(websocket, {
+            'type': 'audio_start', 'id': turn_id, 'segments': len(futures), 'format': 'mp3'
+        }):
+            return False
+        try:
+            async for audio in command_service.tts_scheduler.iter_audio(futures):
+                await websocket.send_bytes(audio)
+                self.stats['audio_frames'] += 1
+                self.stats['audio_bytes'] += len(audio)
+        except (WebSocketDisconnect, RuntimeError, OSError):
+            return False
+        except Exception as e:
+            logger.error(f"❌ Streaming conversation audio failed: {e}")
+            return False
+        return True
+
+    async def _send(self, websocket: WebSocket, payload: Dict) -> bool:
+        """
+        Send a JSON message, ignoring a client that has gone away
+
+        Returns:
+            True if the message was sent
+        """
+        try:
+            await websocket.send_text(dumps(payload).decode('utf-8'))
+            return True
+        except (WebSocketDisconnect, RuntimeError, OSError):
+            return False
+
+    async def _error(self, websocket: WebSocket, turn_id, status: int, detail: str, retry_after: Optional[int] = None):
+        """Report a failed turn without closing the conversation"""
+        self.stats['errors'] += 1
+        payload = {'type': 'error', 'id': turn_id, 'status': status, 'detail': detail}
+        if retry_after is not None:
+            payload['retry_after'] = retry_after
+        await self._send(websocket, payload)
+
+    async def _sweep(self):
+        """Close conversations that have been silent for longer than the idle timeout"""
+        interval = min(max(self.idle_timeout / 4, 1.0), 30.0)
+        while True:
+            await asyncio.sleep(interval)
+            cutoff = time.monotonic() - self.idle_timeout
+            idle = [websocket for websocket, seen in self._last_seen.items() if seen < cutoff]
+            if not idle:
+                continue
+            for websocket in idle:
+                del self._last_seen[websocket]
+            self.stats['idle_closed'] += len(idle)
+            logger.info(f"💤 Closing {len(idle)} idle conversation(s)")
+            await asyncio.gather(
+                *(websocket.close(code=CLOSE_IDLE) for websocket in idle),
+                return_exceptions=True
+            )
+
+    def get_stats(self) -> Dict:
+        """
+        Get conversation counters
+
+        Returns:
+            Dictionary with open connections and lifetime counters
+        """
+        return {'open': len(self._last_seen), **self.stats}
@@ -2,6 +2,9 @@
 Intent Detector Service - Classify user intents using pattern matching
 Uses regex-based NLP for accurate intent detection in Urdu/English
 """
+import hashlib
+import json
+import os
 import re
 from typing import Dict, List, Tuple
 from pathlib import Path
@@ -23,8 +26,49 @@ class IntentDetector:
     def __init__(self):
         """Initialize intent detector with patterns from JSON"""
         self.patterns = self._load_patterns()
+        self.compile_patterns()
+        # Bumped whenever patterns change; cached payloads built from them compare against it
+        self.version = 0
         logger.info(f"✅ IntentDetector initialized with {len(self.patterns)} intent patterns")
     
+    def compile_patterns(self):
+        """
+        Precompile the keyword regexes of every intent
+        
+        Done once at load time (in the parent process when running under
+        serve.py, so forked workers share the compiled patterns) instead of
+        going through the re module's bounded cache on every request.
+        Call again after replacing self.patterns.
+        
+        Also sets self.fingerprint, a hash of the patterns that is the same
+        on every node loading the same patterns (cached detection results
+        are keyed on it).
+        """
+        canonical = json.dumps(self.patterns, sort_keys=True, ensure_ascii=False)
+        self.fingerprint = hashlib.sha1(canonical.encode('utf-8')).hexdigest()[:12]
+        self._compiled = {
+            intent_name: [
+                (keyword, re.compile(rf'\b{re.escape(keyword.lower())}\b', re.IGNORECASE))
+                for keyword in pattern_data.get('keywords', [])
+            ]
+            for intent_name, pattern_data in self.patterns.items()
+        }
+        # Matches wherever any keyword of the intent does (word boundaries
+        # aside): lets an incremental update skip intents absent from the edit
+        self._any_keyword = {
+            intent_name: re.compile(
+                '|'.join(re.escape(keyword.lower()) for keyword in pattern_data['keywords']),
+                re.IGNORECASE
+            )
+            for intent_name, pattern_data in self.patterns.items()
+            if pattern_data.get('keywords')
+        }
+        # How far before an edit an incremental match can start
+        self._longest_keyword = max(
+            (len(keyword) for compiled in self._compiled.values() for keyword, _ in compiled),
+            default=0
+        )
+    
     def _load_patterns(self) -> Dict:
         """
         Load intent patterns from JSON file
@@ -93,51 +137,13 @@ class IntentDetector:
             
             logger.debug(f"🔍 Detecting intent for: {cleaned_text}")
             
-            # Check each intent pattern
-            best_intent = 'unknown'
-            best_confidence = 0.0
-            best_matches = 0
-            
-            for intent_name, pattern_data in self.patterns.items():
-                keywords = pattern_data.get('keywords', [])
-                base_confidence = pattern_data.get('confidence', 0.5)
-                
-                if not keywords:
-                    continue
-                
-                # Count matching keywords
-                matches = 0
-                matched_keywords = []
-                
-                for keyword in keywords:
-                    keyword_lower = keyword.lower()
-                    # Use word boundary regex for better matching
-                    # This prevents partial matches (e.g., 'hi' in 'this')
-                    pattern = rf'\b{re.escape(keyword_lower)}\b'
-                    
-                    if re.search(pattern, cleaned_text, re.IGNORECASE):
-                        matches += 1
-                        matched_keywords.append(keyword)
-                
-                # Calculate confidence based on matches
-                if matches > 0:
-                    # More matches = higher confidence
-                    # Formula: base_confidence * (matches / sqrt(total_keywords))
-                    # This rewards multiple matches without penalizing intents with many keywords
-                    match_ratio = min(1.0, matches / max(1, len(keywords) ** 0.5))
-                    match_confidence = base_confidence * (0.5 + 0.5 * match_ratio)
-                    
-                    # Update best match if this is better
-                    if match_confidence > best_confidence:
-                        best_intent = intent_name
-                        best_confidence = match_confidence
-                        best_matches = matches
-                    # If confidence is same, prefer more matches
-                    elif match_confidence == best_confidence and matches > best_matches:
-                        best_intent = intent_name
-                        best_matches = matches
-                    
-                    logger.debug(f"  Intent '{intent_name}': {matches} matches, confidence: {match_confidence:.2f}")
+            # Count matching keywords per intent
+            # Word boundary regexes prevent partial matches (e.g., 'hi' in 'this')
+            match_counts = {
+                intent_name: sum(1 for _, regex in compiled if regex.search(cleaned_text))
+                for intent_name, compiled in self._compiled.items()
+            }
+            best_intent, best_confidence = self._score(match_counts)
             
             # Extract entities from text
             entities = self._extract_entities(cleaned_text, best_intent)
@@ -150,6 +156,62 @@ class IntentDetector:
             logger.error(f"❌ Intent detection failed: {e}", exc_info=True)
             return ('unknown', 0.0, {})
     
+    def _score(self, match_counts: Dict[str, int]) -> Tuple[str, float]:
+        """
+        Pick the best intent from per-intent keyword match counts
+        
+        Args:
+            match_counts: Intent name -> number of its keywords found in the text
+        
+        Returns:
+            Tuple of (intent_name, confidence_score); ('unknown', 0.0) without matches
+        """
+        best_intent = 'unknown'
+        best_confidence = 0.0
+        best_matches = 0
+        
+        for intent_name, pattern_data in self.patterns.items():
+            matches = match_counts.get(intent_name, 0)
+            if matches == 0:
+                continue
+            keywords = pattern_data.get('keywords', [])
+            base_confidence = pattern_data.get('confidence', 0.5)
+            
+            # More matches = higher confidence
+            # Formula: base_confidence * (matches / sqrt(total_keywords))
+            # This rewards multiple matches without penalizing intents with many keywords
+            match_ratio = min(1.0, matches / max(1, len(keywords) ** 0.5))
+            match_confidence = base_confidence * (0.5 + 0.5 * match_ratio)
+            
+            # Update best match if this is better
+            if match_confidence > best_confidence:
+                best_intent = intent_name
+                best_confidence = match_confidence
+                best_matches = matches
+            # If confidence is same, prefer more matches
+            elif match_confidence == best_confidence and matches > best_matches:
+                best_intent = intent_name
+                best_matches = matches
+            
+            logger.debug(f"  Intent '{intent_name}': {matches} matches, confidence: {match_confidence:.2f}")
+        
+        return best_intent, best_confidence
+    
+    def incremental_matcher(self) -> 'IncrementalMatcher':
+        """
+        Start matching a transcript that arrives in interim versions
+        
+        Returns:
+            IncrementalMatcher bound to this detector's patterns
+        
+        Example:
+            >>> matcher = detector.incremental_matcher()
+            >>> matcher.update("موسم")
+            >>> matcher.update("موسم کیسا ہے")
+            ('weather', 0.9)
+        """
+        return IncrementalMatcher(self)
+    
     def _extract_entities(self, text: str, intent: str) -> Dict:
         """
         Extract entities from text based on intent
@@ -261,6 +323,8 @@ class IntentDetector:
             'keywords': keywords,
             'confidence': confidence
         }
+        self.compile_patterns()
+        self.version += 1
         logger.info(f"✅ Added new pattern for intent: {intent}")
     
     def remove_pattern(self, intent: str) -> bool:
@@ -275,6 +339,8 @@ class IntentDetector:
         """
         if intent in self.patterns:
             del self.patterns[intent]
+            self.compile_patterns()
+            self.version += 1
             logger.info(f"✅ Removed pattern for intent: {intent}")
             return True
         else:
@@ -282,6 +348,76 @@ class IntentDetector:
             return False
 
 
+class IncrementalMatcher:
+    """
+    Keyword match state for one utterance whose transcript is revised as
+    the user speaks (interim speech recognition results)
+    
+    Each update only searches the part of the text that changed: keyword
+    matches that end before the first changed character are kept, and the
+    other keywords are searched from just before it. The result is always
+    the same as detect_intent() on the whole text.
+    """
+    
+    __slots__ = ('detector', 'version', 'text', 'matches')
+    
+    def __init__(self, detector: IntentDetector):
+        self.detector = detector
+        self.version = detector.version
+        self.text = ''
+        # intent -> {keyword index: end offset of its first match}
+        self.matches: Dict[str, Dict[int, int]] = {}
+    
+    def update(self, text: str) -> Tuple[str, float]:
+        """
+        Match a new version of the transcript
+        
+        Args:
+            text: Latest transcript of the utterance (interim or final)
+        
+        Returns:
+            Tuple of (intent_name, confidence_score) for the whole text
+        """
+        detector = self.detector
+        cleaned = clean_text(text).lower()
+        if self.version != detector.version:
+            # Patterns changed since the last update: start over
+            self.version = detector.version
+            self.text = ''
+            self.matches = {}
+        
+        # A match stays valid if it ends before the first changed character
+        # (the character after it, checked by the word boundary, is unchanged)
+        common = len(os.path.commonprefix((self.text, cleaned)))
+        start = max(0, common - detector._longest_keyword)
+        for intent_name, compiled in detector._compiled.items():
+            found = self.matches.setdefault(intent_name, {})
+            for index in [index for index, end in found.items() if end >= common]:
+                del found[index]
+            if len(found) == len(compiled) or not detector._any_keyword[intent_name].search(cleaned, start):
+                continue
+            for index, (_, regex) in enumerate(compiled):
+                if index not in found:
+                    match = regex.search(cleaned, start)
+                    if match:
+                        found[index] = match.end()
+        self.text = cleaned
+        
+        return detector._score({intent_name: len(found) for intent_name, found in self.matches.items()})
+    
+    def result(self) -> Tuple[str, float, Dict]:
+        """
+        Intent, confidence and entities of the latest transcript
+        
+        Returns:
+            Same tuple as IntentDetector.detect_intent()
+        """
+        intent, confidence = self.detector._score(
+            {intent_name: len(found) for intent_name, found in self.matches.items()}
+        )
+        return intent, confidence, self.detector._extract_entities(self.text, intent)
+
+
 # Test the detector
 if __name__ == "__main__":
     print("🧪 Testing IntentDetector...\n")
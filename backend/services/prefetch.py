@@ -0,0 +1,209 @@
+"""
+Prefetch Service - Speculative synthesis of likely follow-up responses
+Learns intent transitions from traffic and warms the audio cache ahead of time
+"""
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+from pathlib import Path
+import sys
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from config import (
+    PREFETCH_TOP_INTENTS,
+    PREFETCH_MIN_PROBABILITY,
+    PREFETCH_MAX_CANDIDATES,
+    PREFETCH_LEDGER_SIZE,
+    PREFETCH_MAX_TRACKED_USERS
+)
+from services.tts_scheduler import TTSPriority, TTSQueueFullError
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Prior transition counts so prediction works before any traffic is seen
+DEFAULT_TRANSITIONS = {
+    'greeting': {'how_are_you': 2, 'help': 2},
+    'how_are_you': {'help': 1, 'joke': 1},
+    'joke': {'joke': 2, 'thanks': 2},
+    'help': {'weather': 1, 'time': 1, 'joke': 1},
+    'thanks': {'farewell': 2},
+}
+
+
+class IntentTransitionTable:
+    """
+    First-order table of which intent tends to follow which
+
+    Counts are learned per user turn: the previous intent of the same user
+    and the intent of the new turn.
+    """
+
+    def __init__(self, max_users: int = PREFETCH_MAX_TRACKED_USERS):
+        """
+        Initialize transition table
+
+        Args:
+            max_users: Number of users whose last intent is remembered
+        """
+        self.max_users = max_users
+        self.counts: Dict[str, Dict[str, int]] = {
+            prev: dict(nexts) for prev, nexts in DEFAULT_TRANSITIONS.items()
+        }
+        self._last_intent: OrderedDict = OrderedDict()
+
+    def observe(self, user_id: Optional[str], intent: str):
+        """
+        Record a user turn
+
+        Args:
+            user_id: User identifier (anonymous turns are not learned from)
+            intent: Intent of the turn
+        """
+        if not user_id:
+            return
+
+        previous = self._last_intent.get(user_id)
+        if previous is not None:
+            nexts = self.counts.setdefault(previous, {})
+            nexts[intent] = nexts.get(intent, 0) + 1
+
+        self._last_intent[user_id] = intent
+        self._last_intent.move_to_end(user_id)
+        if len(self._last_intent) > self.max_users:
+            self._last_intent.popitem(last=False)
+
+    def predict(self, intent: str, top_k: int = PREFETCH_TOP_INTENTS,
+                min_probability: float = PREFETCH_MIN_PROBABILITY) -> List[Tuple[str, float]]:
+        """
+        Get the most probable next intents
+
+        Args:
+            intent: Current intent
+            top_k: Maximum number of predictions
+            min_probability: Drop predictions below this probability
+
+        Returns:
+            List of (intent, probability), most likely first
+
+        Example:
+            >>> table.predict('greeting')
+            [('how_are_you', 0.5), ('help', 0.5)]
+        """
+        nexts = self.counts.get(intent)
+        if not nexts:
+            return []
+
+        total = sum(nexts.values())
+        ranked = sorted(nexts.items(), key=lambda item: item[1], reverse=True)
+        return [
+            (name, count / total)
+            for name, count in ranked[:top_k]
+            if count / total >= min_probability
+        ]
+
+
+class ResponsePrefetcher:
+    """
+    Enqueue low-priority synthesis of the responses a user is likely to ask for next
+
+    Keeps a bounded ledger of what was prefetched so hit and waste ratios
+    can be reported: a hit is a prefetched response that was later served,
+    waste is one that fell out of the ledger without being served.
+    """
+
+    def __init__(
+        self,
+        scheduler,
+        response_generator,
+        language_for: Callable[[str], str],
+        ledger_size: int = PREFETCH_LEDGER_SIZE
+    ):
+        """
+        Initialize prefetcher
+
+        Args:
+            scheduler: TTSScheduler that runs the synthesis
+            response_generator: ResponseGenerator used to list candidates
+            language_for: Maps a response text to its speech language
+            ledger_size: Number of outstanding prefetched responses tracked
+        """
+        self.scheduler = scheduler
+        self.response_generator = response_generator
+        self.language_for = language_for
+        self.ledger_size = ledger_size
+        self.transitions = IntentTransitionTable()
+
+        self._ledger: OrderedDict = OrderedDict()
+        self._prefetched = 0
+        self._hits = 0
+        self._wasted = 0
+        self._already_cached = 0
+        self._skipped = 0
+
+    def record_served(self, text: str, lang: str):
+        """
+        Note that a response was served, counting a hit if it was prefetched
+
+        Args:
+            text: Response text
+            lang: Speech language
+        """
+        if self._ledger.pop((lang, text), None) is not None:
+            self._hits += 1
+
+    def after_response(self, user_id: Optional[str], intent: str):
+        """
+        Learn from a turn and enqueue synthesis of likely next responses
+
+        Args:
+            user_id: User identifier
+            intent: Intent that was just served
+        """
+        self.transitions.observe(user_id, intent)
+
+        for next_intent, _ in self.transitions.predict(intent):
+            candidates = self.response_generator.get_candidate_responses(next_intent, user_id)
+            for text in candidates[:PREFETCH_MAX_CANDIDATES]:
+                self._prefetch(text)
+
+    def _prefetch(self, text: str):
+        """Queue one response at prefetch priority without waiting for it"""
+        lang = self.language_for(text)
+        key = (lang, text)
+        if key in self._ledger:
+            return
+
+        try:
+            futures = self.scheduler.enqueue(text, lang, TTSPriority.PREFETCH)
+        except TTSQueueFullError:
+            # Background work never competes with live users for queue space
+            self._skipped += 1
+            return
+
+        if all(future.done() for future in futures):
+            self._already_cached += 1
+            return
+
+        self._prefetched += 1
+        self._ledger[key] = True
+        if len(self._ledger) > self.ledger_size:
+            self._ledger.popitem(last=False)
+            self._wasted += 1
+
+    def get_stats(self) -> Dict:
+        """
+        Get prefetch effectiveness metrics
+
+        Returns:
+            Dictionary with counts and hit/waste ratios
+        """
+        prefetched = self._prefetched
+        return {
+            'prefetched': prefetched,
+            'hits': self._hits,
+            'wasted': self._wasted,
+            'outstanding': len(self._ledger),
+            'already_cached': self._already_cached,
+            'skipped_queue_full': self._skipped,
+            'hit_ratio': round(self._hits / prefetched, 3) if prefetched else 0.0,
+            'waste_ratio': round(self._wasted / prefetched, 3) if prefetched else 0.0
+        }
@@ -0,0 +1,260 @@
+"""
+Readiness - Startup checks, audio cache warm-up and TTS health
+Decides when the instance may receive traffic and whether it is degraded
+
+The instance is ready once its data files are loaded, the audio index is
+built and the warm-up set (the response templates of WARMUP_INTENTS) has
+been synthesized at WARMUP priority. After that it is degraded while
+recent TTS calls are slower than TTS_LATENCY_BUDGET_MS or mostly failing.
+When no synthesis happens for TTS_PROBE_INTERVAL_SECONDS, a probe sentence
+is synthesized outside the cache so the signal stays current.
+"""
+import asyncio
+import statistics
+import time
+from typing import Dict, List, Optional
+from pathlib import Path
+import sys
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from config import (
+    MAX_AUDIO_FILES,
+    WARMUP_ENABLED,
+    WARMUP_INTENTS,
+    WARMUP_TIMEOUT_SECONDS,
+    TTS_LATENCY_BUDGET_MS,
+    TTS_PROBE_INTERVAL_SECONDS
+)
+from services.tts_scheduler import TTSPriority, TTSQueueFullError
+from utils.helpers import split_sentences
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+
+class ServiceReadiness:
+    """Tracks startup checks, runs the cache warm-up and the TTS health probe"""
+
+    CHECKS = ('data_loaded', 'audio_index', 'warmup')
+
+    def __init__(
+        self,
+        warmup_intents: List[str] = WARMUP_INTENTS,
+        warmup_timeout: float = WARMUP_TIMEOUT_SECONDS,
+        latency_budget_ms: float = TTS_LATENCY_BUDGET_MS,
+        probe_interval: float = TTS_PROBE_INTERVAL_SECONDS
+    ):
+        """
+        Initialize readiness tracker
+
+        Args:
+            warmup_intents: Intents whose templates are synthesized before ready
+                (empty, or WARMUP_ENABLED=false, skips the warm-up)
+            warmup_timeout: Seconds after which the warm-up stops waiting
+            latency_budget_ms: Median TTS time above which the service is degraded
+            probe_interval: Idle seconds before a TTS probe runs (0 disables probes)
+        """
+        self.warmup_intents = warmup_intents if WARMUP_ENABLED else []
+        self.warmup_timeout = warmup_timeout
+        self.latency_budget_ms = latency_budget_ms
+        self.probe_interval = probe_interval
+
+        self.checks = {name: False for name in self.CHECKS}
+        self.warmup = {'texts': 0, 'files': 0, 'synthesized': 0, 'failed': 0, 'timed_out': False, 'seconds': None}
+        self._service = None
+        self._task: Optional[asyncio.Task] = None
+        self._probes = 0
+
+    @property
+    def ready(self) -> bool:
+        """True once every startup check has passed"""
+        return all(self.checks.values())
+
+    def mark(self, check: str):
+        """Mark a startup check as passed"""
+        if not self.checks[check]:
+            self.checks[check] = True
+            logger.info(f"✔️ Readiness check passed: {check}")
+            if self.ready:
+                logger.info("🟢 Instance is ready for traffic")
+
+    async def start(self, command_service):
+        """
+        Record the checks satisfied by an initialized CommandService and
+        start the warm-up and probe task
+
+        Args:
+            command_service: Fully constructed CommandService
+        """
+        self._service = command_service
+        # The constructors load the JSON data files and scan the audio store
+        self.mark('data_loaded')
+        self.mark('audio_index')
+        self._task = asyncio.create_task(self._run(), name="readiness")
+
+    async def stop(self):
+        """Cancel the warm-up / probe task"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        """Warm the cache, report ready, then keep probing TTS while idle"""
+        try:
+            await self._warm_up()
+        except Exception as e:
+            logger.error(f"❌ Cache warm-up failed: {e}")
+        self.mark('warmup')
+
+        if self.probe_interval <= 0:
+            return
+        while True:
+            await asyncio.sleep(self.probe_interval)
+            await self._probe_if_idle()
+
+    def _warmup_texts(self) -> List[str]:
+        """Response templates of the warm-up intents, without duplicates"""
+        texts = []
+        for intent in self.warmup_intents:
+            texts.extend(self._service.response_generator.get_candidate_responses(intent))
+        return list(dict.fromkeys(texts))
+
+    @staticmethod
+    def _warmup_files(texts: List[str]) -> int:
+        """Audio files the warm-up writes: each distinct sentence, plus a joined file per multi-sentence text"""
+        segments = set()
+        joined = 0
+        for text in texts:
+            sentences = split_sentences(text) or [text.strip()]
+            segments.update(sentences)
+            joined += len(sentences) > 1
+        return len(segments) + joined
+
+    async def _warm_up(self):
+        """Synthesize the warm-up set at WARMUP priority, bounded by the timeout"""
+        texts = self._warmup_texts()
+        self.warmup['texts'] = len(texts)
+        if not texts:
+            return
+        self.warmup['files'] = self._warmup_files(texts)
+        if self.warmup['files'] > MAX_AUDIO_FILES // 2:
+            # Live replies would evict the warm-up set almost at once
+            logger.warning(
+                f"⚠️ Warm-up writes {self.warmup['files']} audio files, more than half of "
+                f"MAX_AUDIO_FILES ({MAX_AUDIO_FILES}); raise MAX_AUDIO_FILES to keep it cached"
+            )
+
+        scheduler = self._service.tts_scheduler
+        # Keep about one text per worker in flight so warm-up never fills the queue
+        slots = asyncio.Semaphore(scheduler.num_workers)
+        started = time.monotonic()
+        logger.info(f"🔥 Warming audio cache with {len(texts)} responses")
+
+        async def warm(text: str):
+            async with slots:
+                lang = self._service._speech_language(text)
+                while True:
+                    try:
+                        await scheduler.submit(text, lang, TTSPriority.WARMUP)
+                        self.warmup['synthesized'] += 1
+                        return
+                    except TTSQueueFullError as e:
+                        # Live traffic has the queue; back off instead of competing
+                        await asyncio.sleep(e.retry_after)
+                    except Exception as e:
+                        self.warmup['failed'] += 1
+                        logger.warning(f"⚠️ Warm-up synthesis failed: {e}")
+                        return
+
+        tasks = [asyncio.create_task(warm(text)) for text in texts]
+        try:
+            _, pending = await asyncio.wait(tasks, timeout=self.warmup_timeout)
+        finally:
+            # Queued jobs keep running in the scheduler; only the waiting stops
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        if pending:
+            self.warmup['timed_out'] = True
+            logger.warning(
+                f"⚠️ Cache warm-up timed out after {self.warmup_timeout:.0f}s "
+                f"({self.warmup['synthesized']}/{len(texts)} synthesized)"
+            )
+        self.warmup['seconds'] = round(time.monotonic() - started, 2)
+        logger.info(
+            f"🔥 Cache warm-up finished in {self.warmup['seconds']}s: "
+            f"{self.warmup['synthesized']} synthesized, {self.warmup['failed']} failed"
+        )
+
+    async def _probe_if_idle(self):
+        """Run a TTS probe unless real synthesis happened within the probe interval"""
+        scheduler = self._service.tts_scheduler
+        recent = scheduler.recent_synthesis
+        if recent and time.monotonic() - recent[-1][0] < self.probe_interval:
+            return
+
+        started = time.monotonic()
+        try:
+            seconds = await asyncio.to_thread(self._service.speech_service.probe)
+            ok = True
+        except Exception as e:
+            seconds, ok = time.monotonic() - started, False
+            logger.warning(f"⚠️ TTS probe failed: {e}")
+        self._probes += 1
+        scheduler.record_synthesis(seconds, ok)
+
+    def _tts_health(self) -> Dict:
+        """Judge recent synthesis timings against the latency budget"""
+        if self._service is None:
+            return {'samples': 0, 'degraded': False, 'reasons': []}
+
+        samples = list(self._service.tts_scheduler.recent_synthesis)
+        durations = [seconds for _, seconds, ok in samples if ok]
+        failures = sum(1 for _, _, ok in samples if not ok)
+        median_ms = round(statistics.median(durations) * 1000, 1) if durations else None
+
+        reasons = []
+        if median_ms is not None and median_ms > self.latency_budget_ms:
+            reasons.append(f"median TTS latency {median_ms:.0f} ms over budget {self.latency_budget_ms:.0f} ms")
+        if samples and failures * 2 >= len(samples):
+            reasons.append(f"{failures} of the last {len(samples)} TTS calls failed")
+
+        return {
+            'samples': len(samples),
+            'failures': failures,
+            'median_ms': median_ms,
+            'budget_ms': self.latency_budget_ms,
+            'probes': self._probes,
+            'degraded': bool(reasons),
+            'reasons': reasons
+        }
+
+    def status(self) -> Dict:
+        """
+        Get readiness status
+
+        Returns:
+            Dictionary with 'status' ('not_ready', 'ready' or 'degraded'),
+            the startup checks, warm-up progress and TTS health
+
+        Example:
+            >>> readiness.status()['status']
+            'ready'
+        """
+        tts = self._tts_health()
+        if not self.ready:
+            state = 'not_ready'
+        elif tts['degraded']:
+            state = 'degraded'
+        else:
+            state = 'ready'
+        return {
+            'status': state,
+            'checks': dict(self.checks),
+            'warmup': dict(self.warmup),
+            'tts': tts
+        }
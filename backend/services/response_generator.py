@@ -3,11 +3,12 @@ Response Generator Service - Generate appropriate responses based on intent
 Creates natural Urdu responses with context awareness
 """
 import random
+from collections import OrderedDict
 from typing import Dict, Optional, List
 from pathlib import Path
 import sys
 sys.path.append(str(Path(__file__).resolve().parent.parent))
-from config import RESPONSES_FILE, JOKES_FILE
+from config import RESPONSES_FILE, JOKES_FILE, PREFETCH_MAX_TRACKED_USERS
 from utils.logger import setup_logger
 from utils.helpers import (
     load_json_file, 
@@ -24,10 +25,24 @@ class ResponseGenerator:
     Uses templates from JSON files with dynamic content insertion
     """
     
+    # Intents whose responses come straight from a template category
+    STATIC_RESPONSE_CATEGORIES = {
+        'greeting': 'greeting',
+        'farewell': 'farewell',
+        'thanks': 'thanks',
+        'how_are_you': 'how_are_you',
+        'weather': 'weather_mock',
+        'prayer': 'prayer_mock',
+        'news': 'news_mock',
+        'help': 'help',
+        'unknown': 'unknown'
+    }
+    
     def __init__(self):
         """Initialize response generator with templates"""
         self.responses = self._load_responses()
         self.jokes = self._load_jokes()
+        self._joke_cursors: OrderedDict = OrderedDict()
         logger.info(f"✅ ResponseGenerator initialized with {len(self.responses)} response categories")
     
     def _load_responses(self) -> Dict:
@@ -82,7 +97,8 @@ class ResponseGenerator:
         self, 
         intent: str, 
         confidence: float, 
-        entities: Optional[Dict] = None
+        entities: Optional[Dict] = None,
+        context: Optional[Dict] = None
     ) -> str:
         """
         Generate appropriate response based on intent
@@ -91,6 +107,8 @@ class ResponseGenerator:
             intent: Detected intent name
             confidence: Confidence score (0.0 to 1.0)
             entities: Extracted entities (optional)
+            context: Request context: 'user_id' and 'history', the
+                conversation's recent turns oldest first (optional)
         
         Returns:
             Response text in Urdu
@@ -126,7 +144,7 @@ class ResponseGenerator:
             handler = handlers.get(intent, self._handle_unknown)
             
             # Generate response
-            response = handler(entities)
+            response = handler(entities, context or {})
             
             logger.info(f"✅ Response generated for {intent}: {response[:50]}...")
             
@@ -136,29 +154,29 @@ class ResponseGenerator:
             logger.error(f"❌ Response generation failed: {e}", exc_info=True)
             return self._get_error_response()
     
-    def _handle_greeting(self, entities: Dict) -> str:
+    def _handle_greeting(self, entities: Dict, context: Dict) -> str:
         """Handle greeting intent"""
         responses = self.responses.get('greeting', ["السلام علیکم!"])
         return random.choice(responses)
     
-    def _handle_farewell(self, entities: Dict) -> str:
+    def _handle_farewell(self, entities: Dict, context: Dict) -> str:
         """Handle farewell intent"""
         responses = self.responses.get('farewell', ["اللہ حافظ!"])
         return random.choice(responses)
     
-    def _handle_thanks(self, entities: Dict) -> str:
+    def _handle_thanks(self, entities: Dict, context: Dict) -> str:
         """Handle thanks intent"""
         responses = self.responses.get('thanks', ["کوئی بات نہیں!"])
         return random.choice(responses)
     
-    def _handle_how_are_you(self, entities: Dict) -> str:
+    def _handle_how_are_you(self, entities: Dict, context: Dict) -> str:
         """Handle 'how are you' intent"""
         responses = self.responses.get('how_are_you', [
             "میں بالکل ٹھیک ہوں، شکریہ! آپ کیسے ہیں؟"
         ])
         return random.choice(responses)
     
-    def _handle_weather(self, entities: Dict) -> str:
+    def _handle_weather(self, entities: Dict, context: Dict) -> str:
         """
         Handle weather query (mock data)
         Includes city name if provided in entities
@@ -184,7 +202,7 @@ class ResponseGenerator:
         
         return response
     
-    def _handle_time(self, entities: Dict) -> str:
+    def _handle_time(self, entities: Dict, context: Dict) -> str:
         """
         Handle time query
         Returns current time in Urdu format
@@ -196,7 +214,7 @@ class ResponseGenerator:
             logger.error(f"❌ Failed to get time: {e}")
             return "معاف کیجیے، وقت معلوم نہیں ہو سکا۔"
     
-    def _handle_date(self, entities: Dict) -> str:
+    def _handle_date(self, entities: Dict, context: Dict) -> str:
         """
         Handle date query
         Returns current date in Urdu format
@@ -208,7 +226,7 @@ class ResponseGenerator:
             logger.error(f"❌ Failed to get date: {e}")
             return "معاف کیجیے، تاریخ معلوم نہیں ہو سکی۔"
     
-    def _handle_prayer(self, entities: Dict) -> str:
+    def _handle_prayer(self, entities: Dict, context: Dict) -> str:
         """
         Handle prayer time query (mock data)
         Can include specific prayer name if provided
@@ -229,7 +247,7 @@ class ResponseGenerator:
         
         return random.choice(responses)
     
-    def _handle_joke(self, entities: Dict) -> str:
+    def _handle_joke(self, entities: Dict, context: Dict) -> str:
         """
         Handle joke request
         Returns random Urdu joke
@@ -239,21 +257,91 @@ class ResponseGenerator:
         if not jokes_list:
             return "معاف کیجیے، کوئی لطیفہ یاد نہیں آ رہا!"
         
-        # Get random joke
-        joke = random.choice(jokes_list)
+        # Known users get jokes in rotation so they don't hear repeats
+        user_id = context.get('user_id')
+        if user_id:
+            joke = jokes_list[self._joke_index(user_id, advance=True)]
+        else:
+            joke = random.choice(jokes_list)
         
-        # Extract text from joke object or use directly if string
+        return self._joke_text(joke)
+    
+    def _joke_text(self, joke) -> str:
+        """Extract text from joke object or use directly if string"""
         if isinstance(joke, dict):
             return joke.get('text', "کوئی لطیفہ نہیں ملا!")
         else:
             return str(joke)
     
-    def _handle_news(self, entities: Dict) -> str:
+    def _joke_index(self, user_id: str, advance: bool) -> int:
+        """
+        Get the index of the next unplayed joke for a user
+        
+        New users start at a random position; the cursor then walks the
+        list in order. Only the most recent users are remembered.
+        
+        Args:
+            user_id: User identifier
+            advance: Move the cursor past the returned joke
+        
+        Returns:
+            Index into the jokes list
+        """
+        total = len(self.jokes.get('jokes', []))
+        cursor = self._joke_cursors.get(user_id)
+        if cursor is None or cursor >= total:
+            cursor = random.randrange(total)
+        
+        self._joke_cursors[user_id] = (cursor + 1) % total if advance else cursor
+        self._joke_cursors.move_to_end(user_id)
+        while len(self._joke_cursors) > PREFETCH_MAX_TRACKED_USERS:
+            self._joke_cursors.popitem(last=False)
+        
+        return cursor
+    
+    def peek_next_joke(self, user_id: Optional[str]) -> Optional[str]:
+        """
+        Get the joke a user will hear next without consuming it
+        
+        Args:
+            user_id: User identifier
+        
+        Returns:
+            Joke text, or None for anonymous users or when there are no jokes
+        """
+        jokes_list = self.jokes.get('jokes', [])
+        if not user_id or not jokes_list:
+            return None
+        return self._joke_text(jokes_list[self._joke_index(user_id, advance=False)])
+    
+    def get_candidate_responses(self, intent: str, user_id: Optional[str] = None) -> List[str]:
+        """
+        Get the responses an intent may produce, for speculative synthesis
+        
+        Responses that depend on the clock (time, date) are not listed.
+        
+        Args:
+            intent: Intent name
+            user_id: User identifier, used to find the next joke
+        
+        Returns:
+            List of response texts
+        """
+        if intent == 'joke':
+            joke = self.peek_next_joke(user_id)
+            return [joke] if joke else []
+        
+        category = self.STATIC_RESPONSE_CATEGORIES.get(intent)
+        if category is None:
+            return []
+        return list(self.responses.get(category, []))
+    
+    def _handle_news(self, entities: Dict, context: Dict) -> str:
         """Handle news request (mock data)"""
         responses = self.responses.get('news_mock', ["آج کوئی خاص خبر نہیں ہے۔"])
         return random.choice(responses)
     
-    def _handle_help(self, entities: Dict) -> str:
+    def _handle_help(self, entities: Dict, context: Dict) -> str:
         """
         Handle help request
         Provides information about available commands
@@ -263,7 +351,7 @@ class ResponseGenerator:
         ])
         return random.choice(responses)
     
-    def _handle_unknown(self, entities: Dict) -> str:
+    def _handle_unknown(self, entities: Dict, context: Dict) -> str:
         """Handle unknown intent"""
         responses = self.responses.get('unknown', ["معاف کیجیے، میں سمجھ نہیں پایا۔"])
         return random.choice(responses)
@@ -0,0 +1,231 @@
+"""
+Session Store - Recent turns of each open conversation, held in memory
+Bounded by conversations, by bytes and by idle time, however many arrive
+
+History belongs to a conversation, not to a user id. A WebSocket
+connection is one conversation, and under serve.py it stays on one worker
+for its whole life, so all of its turns are stored and read in the same
+process; the gateway ends its session when the connection closes. HTTP
+clients name their own conversation with a session_id (stored as
+"http:<id>"); the store is per process, so with several workers their
+history is only complete if a session's requests reach one worker.
+
+Each conversation gets a ring buffer of the last SESSION_MAX_TURNS turns.
+Conversations are kept in least-recently-used order; one idle for longer
+than SESSION_IDLE_TTL_SECONDS is forgotten, and the least recently used
+are evicted whenever the store would hold more than
+SESSION_MAX_CONVERSATIONS of them or SESSION_MAX_BYTES bytes. The byte
+count covers the strings, the turn and session objects and the index
+entry of each conversation.
+"""
+import sys
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, List, Optional
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from config import (
+    SESSION_MAX_TURNS,
+    SESSION_MAX_CONVERSATIONS,
+    SESSION_MAX_BYTES,
+    SESSION_IDLE_TTL_SECONDS
+)
+from models.schemas import ConversationHistoryItem
+from utils.logger import setup_logger
+from utils.metrics import REGISTRY
+
+logger = setup_logger(__name__)
+
+
+class SessionTurn:
+    """One stored turn (see ConversationHistoryItem for the public shape)"""
+
+    __slots__ = ('user_input', 'assistant_response', 'intent', 'timestamp')
+
+    def __init__(self, user_input: str, assistant_response: str, intent: str, timestamp: float):
+        self.user_input = user_input
+        self.assistant_response = assistant_response
+        self.intent = intent
+        self.timestamp = timestamp
+
+    def to_item(self) -> ConversationHistoryItem:
+        """Convert to the API model"""
+        return ConversationHistoryItem(
+            user_input=self.user_input,
+            assistant_response=self.assistant_response,
+            intent=self.intent,
+            timestamp=datetime.fromtimestamp(self.timestamp)
+        )
+
+
+class _Session:
+    """Ring buffer of a conversation's most recent turns"""
+
+    __slots__ = ('turns', 'head', 'last_seen', 'bytes')
+
+    def __init__(self, now: float, size: int):
+        # Grows to the turn limit, then the oldest turn is overwritten at head
+        self.turns: List[SessionTurn] = []
+        self.head = 0
+        self.last_seen = now
+        self.bytes = size
+
+    def ordered(self) -> List[SessionTurn]:
+        """Turns from oldest to newest"""
+        return self.turns[self.head:] + self.turns[:self.head]
+
+
+# Object sizes charged against SESSION_MAX_BYTES (strings are measured per turn)
+_TURN_BYTES = sys.getsizeof(SessionTurn('', '', '', 0.0)) + sys.getsizeof(0.0)
+_SESSION_BYTES = sys.getsizeof(_Session(0.0, 0)) + sys.getsizeof([])
+_INDEX_ENTRY_BYTES = 200  # OrderedDict hash slot, entry and link node per session (measured)
+_POINTER_BYTES = 8  # One ring buffer slot
+
+
+def _turn_bytes(user_input: str, assistant_response: str) -> int:
+    # The intent name is shared with the pattern table
+    return _TURN_BYTES + _POINTER_BYTES + sys.getsizeof(user_input) + sys.getsizeof(assistant_response)
+
+
+class SessionStore:
+    """Per-conversation history with LRU, idle and memory bounds"""
+
+    def __init__(
+        self,
+        max_turns: int = SESSION_MAX_TURNS,
+        max_sessions: int = SESSION_MAX_CONVERSATIONS,
+        max_bytes: int = SESSION_MAX_BYTES,
+        idle_ttl: float = SESSION_IDLE_TTL_SECONDS
+    ):
+        """
+        Initialize session store
+
+        Args:
+            max_turns: Turns kept per conversation
+            max_sessions: Conversations kept at most
+            max_bytes: Memory the sessions may use at most
+            idle_ttl: Seconds after the last turn before a conversation is forgotten (0 = never)
+        """
+        self.max_turns = max(1, max_turns)
+        self.max_sessions = max(1, max_sessions)
+        self.max_bytes = max_bytes
+        self.idle_ttl = idle_ttl
+        self._sessions: OrderedDict = OrderedDict()
+        self._bytes = 0
+        self.stats = {'turns': 0, 'ended': 0, 'evicted': 0, 'expired': 0}
+
+        REGISTRY.gauge(
+            "assistant_sessions",
+            "Conversations with history in memory",
+            callback=lambda: len(self._sessions)
+        )
+
+    def record(self, session_id: Optional[str], user_input: str, assistant_response: str, intent: str):
+        """
+        Append a turn to a conversation's history
+
+        Args:
+            session_id: Conversation identifier (None stores nothing)
+            user_input: What the user said
+            assistant_response: What the assistant answered
+            intent: Detected intent
+        """
+        if not session_id:
+            return
+
+        now = time.time()
+        self._expire(now)
+        added = _turn_bytes(user_input, assistant_response)
+        turn = SessionTurn(user_input, assistant_response, intent, now)
+
+        session = self._sessions.get(session_id)
+        if session is None:
+            size = _SESSION_BYTES + _INDEX_ENTRY_BYTES + sys.getsizeof(session_id)
+            session = self._sessions[session_id] = _Session(now, size)
+            self._bytes += size
+        else:
+            self._sessions.move_to_end(session_id)
+            session.last_seen = now
+
+        if len(session.turns) < self.max_turns:
+            session.turns.append(turn)
+        else:
+            oldest = session.turns[session.head]
+            added -= _turn_bytes(oldest.user_input, oldest.assistant_response)
+            session.turns[session.head] = turn
+            session.head = (session.head + 1) % self.max_turns
+        session.bytes += added
+        self._bytes += added
+        self.stats['turns'] += 1
+
+        # Evict least recently used conversations; the one just written goes last
+        while len(self._sessions) > self.max_sessions or (self._bytes > self.max_bytes and len(self._sessions) > 1):
+            self._drop_oldest('evicted')
+
+    def history(self, session_id: Optional[str], limit: Optional[int] = None) -> List[SessionTurn]:
+        """
+        Get a conversation's recent turns, oldest first
+
+        Reading does not refresh the conversation's position in the LRU order.
+
+        Args:
+            session_id: Conversation identifier
+            limit: Return only the most recent this many turns
+
+        Returns:
+            List of SessionTurn (empty for unknown, ended or expired conversations)
+
+        Example:
+            >>> store.record("ws-1", "سلام", "السلام علیکم!", "greeting")
+            >>> [turn.intent for turn in store.history("ws-1")]
+            ['greeting']
+        """
+        session = self._sessions.get(session_id) if session_id else None
+        if session is None or self._is_expired(session, time.time()):
+            return []
+        turns = session.ordered()
+        return turns[-limit:] if limit else turns
+
+    def end(self, session_id: str):
+        """
+        Forget a conversation whose connection has closed
+
+        Args:
+            session_id: Conversation identifier
+        """
+        session = self._sessions.pop(session_id, None)
+        if session is not None:
+            self._bytes -= session.bytes
+            self.stats['ended'] += 1
+
+    def _is_expired(self, session: _Session, now: float) -> bool:
+        return self.idle_ttl > 0 and now - session.last_seen > self.idle_ttl
+
+    def _expire(self, now: float):
+        """Forget idle conversations (the oldest are first in LRU order)"""
+        while self._sessions and self._is_expired(next(iter(self._sessions.values())), now):
+            self._drop_oldest('expired')
+
+    def _drop_oldest(self, reason: str):
+        _, session = self._sessions.popitem(last=False)
+        self._bytes -= session.bytes
+        self.stats[reason] += 1
+
+    def get_stats(self) -> Dict:
+        """
+        Get store size and counters
+
+        Returns:
+            Dictionary with conversations, bytes, limits and lifetime counters
+        """
+        self._expire(time.time())
+        return {
+            'conversations': len(self._sessions),
+            'bytes': self._bytes,
+            'max_conversations': self.max_sessions,
+            'max_bytes': self.max_bytes,
+            'max_turns': self.max_turns,
+            'idle_ttl_seconds': self.idle_ttl,
+            **self.stats
+        }
@@ -0,0 +1,176 @@
+"""
+Speculative responses from interim speech-recognition transcripts
+Starts response generation and TTS while the user is still speaking
+
+Browsers revise the transcript of an utterance several times before the
+final result. Each interim version goes through an IncrementalMatcher.
+Once the same intent has led for SPECULATION_STABLE_UPDATES versions with
+a steady confidence of at least SPECULATION_MIN_CONFIDENCE, its response
+is generated and queued for synthesis at prefetch priority.
+
+When the final transcript arrives the speculation is reused if it has the
+same intent and entities (the final request then shares, and upgrades,
+the queued synthesis jobs). Otherwise it is discarded and its jobs that
+have not started are withdrawn from the TTS queue.
+"""
+import asyncio
+from typing import Dict, List, Optional, Tuple
+from pathlib import Path
+import sys
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from config import (
+    SPECULATION_ENABLED,
+    SPECULATION_STABLE_UPDATES,
+    SPECULATION_CONFIDENCE_DELTA,
+    SPECULATION_MIN_CONFIDENCE,
+    SPECULATION_MAX_PER_UTTERANCE
+)
+from services.tts_scheduler import TTSPriority, TTSQueueFullError
+from utils.logger import setup_logger
+from utils.metrics import SPECULATIONS_TOTAL
+
+logger = setup_logger(__name__)
+
+
+class _Speculation:
+    """A response generated and queued ahead of the final transcript"""
+
+    __slots__ = ('intent', 'entities', 'response_text', 'lang', 'futures')
+
+    def __init__(self, intent: str, entities: Dict, response_text: str, lang: str, futures: List[asyncio.Future]):
+        self.intent = intent
+        self.entities = entities
+        self.response_text = response_text
+        self.lang = lang
+        # What enqueue() returned; releasing them withdraws the jobs
+        self.futures = futures
+
+
+class SpeculativeUtterance:
+    """Interim transcripts of one utterance and the speculation built on them"""
+
+    __slots__ = (
+        'service', 'user_id', 'session_id', 'language_hint', 'matcher',
+        'leader', 'confidence', 'stable_updates', 'speculation', 'speculations'
+    )
+
+    def __init__(
+        self,
+        command_service,
+        user_id: Optional[str] = None,
+        language_hint: str = "auto",
+        session_id: Optional[str] = None
+    ):
+        """
+        Initialize utterance
+
+        Args:
+            command_service: CommandService whose detector, generator and
+                TTS scheduler do the work
+            user_id: User the response is generated for
+            language_hint: Language hint ('ur', 'en', or 'auto')
+            session_id: Conversation whose history the response sees
+        """
+        self.service = command_service
+        self.user_id = user_id
+        self.session_id = session_id
+        self.language_hint = language_hint
+        self.matcher = command_service.intent_detector.incremental_matcher()
+        self.leader = 'unknown'
+        self.confidence = 0.0
+        self.stable_updates = 0
+        self.speculation: Optional[_Speculation] = None
+        self.speculations = 0
+
+    def update(self, text: str) -> Optional[Dict]:
+        """
+        Take the next interim transcript
+
+        Args:
+            text: Latest interim transcript of the utterance
+
+        Returns:
+            The current hypothesis (intent, confidence, speculating) when the
+            leading intent changed or a speculation started, else None
+        """
+        intent, confidence = self.matcher.update(text)
+        changed = intent != self.leader
+        if changed or abs(confidence - self.confidence) > SPECULATION_CONFIDENCE_DELTA:
+            self.stable_updates = 1
+        else:
+            self.stable_updates += 1
+        self.leader = intent
+        self.confidence = confidence
+
+        if self.speculation is not None and self.speculation.intent != intent:
+            self.discard()
+
+        started = False
+        if (
+            SPECULATION_ENABLED
+            and self.speculation is None
+            and intent != 'unknown'
+            and confidence >= SPECULATION_MIN_CONFIDENCE
+            and self.stable_updates >= SPECULATION_STABLE_UPDATES
+            and self.speculations < SPECULATION_MAX_PER_UTTERANCE
+        ):
+            started = self._speculate()
+
+        if not (changed or started):
+            return None
+        return {
+            'intent': intent,
+            'confidence': round(confidence, 2),
+            'speculating': self.speculation is not None
+        }
+
+    def _speculate(self) -> bool:
+        """Generate the leading intent's response and queue its synthesis"""
+        self.speculations += 1
+        intent, confidence, entities = self.matcher.result()
+        response_text = self.service.response_generator.generate_response(
+            intent=intent,
+            confidence=confidence,
+            entities=entities,
+            context=self.service.response_context(self.user_id, self.session_id)
+        )
+        lang = self.service._speech_language(response_text, self.language_hint)
+        try:
+            futures = self.service.tts_scheduler.enqueue(response_text, lang, priority=TTSPriority.PREFETCH)
+        except TTSQueueFullError:
+            # Live requests come first; the final transcript takes the normal path
+            logger.debug("TTS queue too full to speculate on %s", intent)
+            return False
+        self.speculation = _Speculation(intent, entities, response_text, lang, futures)
+        SPECULATIONS_TOTAL.inc("started")
+        logger.debug("🔮 Speculating on %s (confidence: %.2f)", intent, confidence)
+        return True
+
+    def finish(self, text: str) -> Tuple[Tuple[str, float, Dict], Optional[str]]:
+        """
+        Take the final transcript and settle the speculation
+
+        Args:
+            text: Final transcript of the utterance
+
+        Returns:
+            Tuple of (detection result, reusable response text or None); the
+            detection result is the same as IntentDetector.detect_intent(text)
+        """
+        self.matcher.update(text)
+        detected = self.matcher.result()
+        speculation = self.speculation
+        if speculation is not None and (speculation.intent, speculation.entities) == (detected[0], detected[2]):
+            self.speculation = None
+            SPECULATIONS_TOTAL.inc("reused")
+            return detected, speculation.response_text
+        self.discard()
+        return detected, None
+
+    def discard(self):
+        """Drop the speculation and withdraw its synthesis jobs that have not started"""
+        if self.speculation is None:
+            return
+        self.service.tts_scheduler.release(self.speculation.futures)
+        self.speculation = None
+        SPECULATIONS_TOTAL.inc("discarded")
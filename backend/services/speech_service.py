@@ -1,20 +1,177 @@
 """
 Speech Service - Text-to-Speech using Google TTS
 Converts Urdu/English text to audio files
+
+gTTS (and the requests stack under it) is imported on first synthesis or by
+preload_backend(), not when this module is imported.
 """
-from gtts import gTTS
 import os
-from datetime import datetime
+import hashlib
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Optional
+from typing import Dict, List, Optional
 import sys
 sys.path.append(str(Path(__file__).resolve().parent.parent))
-from config import AUDIO_OUTPUT_DIR, AUDIO_FORMAT, DEFAULT_LANGUAGE
+from config import (
+    AUDIO_OUTPUT_DIR,
+    AUDIO_FORMAT,
+    AUDIO_INDEX_FILE,
+    MAX_AUDIO_FILES,
+    DEFAULT_LANGUAGE,
+    TTS_WORKERS,
+    TTS_BACKEND,
+    TTS_OFFLINE_LATENCY_MS
+)
 from utils.logger import setup_logger
-from utils.helpers import cleanup_old_files
+from utils.helpers import split_sentences
+from utils.audio_index import AudioIndex, synthesis_lock
 
 logger = setup_logger(__name__)
 
+# One silent MPEG-1 Layer III frame (32 kbps, 44.1 kHz, mono, ~26 ms)
+_SILENT_MP3_FRAME = b'\xff\xfb\x10\xc0' + bytes(100)
+# Offline audio length per character, roughly normal speaking rate
+_OFFLINE_FRAMES_PER_CHAR = 3
+
+
+def segment_filename(text: str, lang: str) -> str:
+    """
+    Get the content-addressed file name for a sentence
+    
+    Args:
+        text: Sentence text
+        lang: Language code
+    
+    Returns:
+        File name derived from a hash of language and text
+        (and of the backend when it is not gTTS, so caches never mix)
+    """
+    key = f"{lang}:{text}" if TTS_BACKEND == "gtts" else f"{TTS_BACKEND}:{lang}:{text}"
+    digest = hashlib.sha1(key.encode('utf-8')).hexdigest()[:20]
+    return f"seg_{lang}_{digest}.{AUDIO_FORMAT}"
+
+
+def preload_backend():
+    """Import the TTS backend's dependencies ahead of the first synthesis"""
+    if TTS_BACKEND == "gtts":
+        try:
+            import gtts  # noqa: F401
+        except ImportError as e:
+            logger.error(f"❌ gTTS is not available: {e}")
+
+
+def _temp_path(filepath: Path) -> Path:
+    """Unique sibling path used to write a file before renaming it into place"""
+    return filepath.with_name(f"{filepath.name}.{os.getpid()}.{threading.get_ident()}.part")
+
+
+def write_segment(output_dir: Path, text: str, lang: str) -> str:
+    """
+    Synthesize one sentence into the audio store unless it is already there
+    
+    Module-level so it can also run inside TTS worker processes.
+    
+    Args:
+        output_dir: Audio store directory
+        text: Sentence text
+        lang: Language code ('ur' or 'en')
+    
+    Returns:
+        Name of the segment audio file
+    """
+    filename = segment_filename(text, lang)
+    filepath = Path(output_dir) / filename
+    
+    if filepath.exists():
+        logger.debug(f"♻️ Segment cache hit: {filename}")
+        return filename
+    
+    # Other workers needing the same sentence wait here and reuse this file
+    with synthesis_lock(output_dir, filename):
+        if filepath.exists():
+            logger.debug(f"♻️ Segment synthesized by another worker: {filename}")
+            return filename
+        
+        # Write to a temporary file first so readers never see a partial MP3
+        tmp_path = _temp_path(filepath)
+        try:
+            if TTS_BACKEND == "offline":
+                _write_offline(tmp_path, text)
+            else:
+                from gtts import gTTS
+                
+                # Create speech using gTTS
+                # slow=False means normal speed (natural)
+                tts = gTTS(text=text, lang=lang, slow=False)
+                tts.save(str(tmp_path))
+            os.replace(tmp_path, filepath)
+        except Exception:
+            tmp_path.unlink(missing_ok=True)
+            raise
+    
+    logger.debug(f"🎙️ Segment synthesized: {filename}")
+    return filename
+
+
+def _write_offline(filepath: Path, text: str):
+    """
+    Write deterministic silent audio instead of calling gTTS
+    
+    Used for load tests and offline development: no network, the same
+    bytes for the same text, and an optional fixed synthesis delay
+    (TTS_OFFLINE_LATENCY_MS) to stand in for upstream latency.
+    """
+    if TTS_OFFLINE_LATENCY_MS > 0:
+        time.sleep(TTS_OFFLINE_LATENCY_MS / 1000)
+    frames = max(10, len(text) * _OFFLINE_FRAMES_PER_CHAR)
+    with open(filepath, 'wb') as out:
+        out.write(_SILENT_MP3_FRAME * frames)
+
+
+def write_joined(output_dir: Path, filenames: List[str]) -> str:
+    """
+    Concatenate segment MP3 files in order into one response file
+    
+    MP3 is a sequence of self-contained frames, so byte concatenation
+    produces a playable file.
+    
+    Args:
+        output_dir: Audio store directory
+        filenames: Segment file names in playback order
+    
+    Returns:
+        Name of the joined file (the segment itself if there is only one)
+    """
+    if len(filenames) == 1:
+        return filenames[0]
+    
+    output_dir = Path(output_dir)
+    digest = hashlib.sha1("|".join(filenames).encode('utf-8')).hexdigest()[:20]
+    filename = f"speech_{digest}.{AUDIO_FORMAT}"
+    filepath = output_dir / filename
+    
+    if filepath.exists():
+        return filename
+    
+    with synthesis_lock(output_dir, filename):
+        if filepath.exists():
+            return filename
+        
+        tmp_path = _temp_path(filepath)
+        try:
+            with open(tmp_path, 'wb') as out:
+                for name in filenames:
+                    out.write((output_dir / name).read_bytes())
+            os.replace(tmp_path, filepath)
+        except Exception:
+            tmp_path.unlink(missing_ok=True)
+            raise
+    
+    return filename
+
 
 class SpeechService:
     """
@@ -26,12 +183,20 @@ class SpeechService:
         """Initialize speech service"""
         self.output_dir = AUDIO_OUTPUT_DIR
         self.output_dir.mkdir(exist_ok=True)
+        self.backend = TTS_BACKEND
+        # File count, size and eviction order of the audio store, shared by all workers
+        self.audio_index = AudioIndex(self.output_dir, f".{AUDIO_FORMAT}", db_path=AUDIO_INDEX_FILE)
         logger.info(f"✅ SpeechService initialized. Output directory: {self.output_dir}")
+        if self.backend != "gtts":
+            logger.warning(f"⚠️ Using '{self.backend}' TTS backend - responses contain silent audio")
     
     def text_to_speech(self, text: str, lang: str = None) -> str:
         """
         Convert text to speech and save as MP3 file
         
+        Long text is split at sentence boundaries; the sentences are
+        synthesized concurrently, each cached on its own, and joined in order.
+        
         Args:
             text: Text to convert (Urdu or English)
             lang: Language code ('ur' for Urdu, 'en' for English)
@@ -47,32 +212,23 @@ class SpeechService:
             >>> service = SpeechService()
             >>> filename = service.text_to_speech("السلام علیکم", "ur")
             >>> print(filename)
-            'speech_20251025_143022_123456.mp3'
+            'seg_ur_3f2a9c0d1e4b5a6c7d8e.mp3'
         """
         try:
-            # Use default language if not specified
-            if lang is None:
-                lang = DEFAULT_LANGUAGE
-            
-            # Validate language
-            if lang not in ['ur', 'en']:
-                logger.warning(f"Invalid language '{lang}', using 'ur'")
-                lang = 'ur'
-            
-            # Generate unique filename with timestamp
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
-            filename = f"speech_{timestamp}.{AUDIO_FORMAT}"
-            filepath = self.output_dir / filename
+            lang = self.resolve_language(lang)
+            segments = split_sentences(text) or [text.strip()]
             
-            logger.info(f"🎤 Generating speech: lang={lang}, text_length={len(text)}")
+            logger.info(f"🎤 Generating speech: lang={lang}, text_length={len(text)}, segments={len(segments)}")
             logger.debug(f"Text preview: {text[:50]}...")
             
-            # Create speech using gTTS
-            # slow=False means normal speed (natural)
-            tts = gTTS(text=text, lang=lang, slow=False)
+            if len(segments) == 1:
+                filenames = [self.synthesize_segment(segments[0], lang)]
+            else:
+                workers = min(len(segments), TTS_WORKERS)
+                with ThreadPoolExecutor(max_workers=workers) as pool:
+                    filenames = list(pool.map(lambda seg: self.synthesize_segment(seg, lang), segments))
             
-            # Save to file
-            tts.save(str(filepath))
+            filename = self.join_segments(filenames)
             
             logger.info(f"✅ Speech generated successfully: {filename}")
             
@@ -85,21 +241,174 @@ class SpeechService:
             logger.error(f"❌ Speech generation failed: {str(e)}")
             raise Exception(f"Failed to generate speech: {str(e)}")
     
-    def cleanup_old_files(self, max_files: int = 100):
+    def resolve_language(self, lang: Optional[str]) -> str:
+        """
+        Normalize a requested language code to one gTTS supports
+        
+        Args:
+            lang: Requested language code or None
+        
+        Returns:
+            'ur' or 'en'
+        """
+        # Use default language if not specified
+        if lang is None:
+            lang = DEFAULT_LANGUAGE
+        
+        # Validate language
+        if lang not in ['ur', 'en']:
+            logger.warning(f"Invalid language '{lang}', using 'ur'")
+            lang = 'ur'
+        
+        return lang
+    
+    def segment_filename(self, text: str, lang: str) -> str:
+        """
+        Get the content-addressed file name for a sentence
+        
+        Args:
+            text: Sentence text
+            lang: Language code
+        
+        Returns:
+            File name derived from a hash of language and text
+        """
+        return segment_filename(text, lang)
+    
+    def has_segment(self, text: str, lang: str) -> bool:
+        """Check whether a sentence is already synthesized on disk"""
+        return (self.output_dir / segment_filename(text, lang)).exists()
+    
+    def synthesize_segment(self, text: str, lang: str) -> str:
+        """
+        Synthesize a single sentence, reusing the cached file if present
+        
+        Args:
+            text: Sentence text
+            lang: Language code ('ur' or 'en')
+        
+        Returns:
+            Name of the segment audio file
+        """
+        filename = write_segment(self.output_dir, text, lang)
+        self.audio_index.record(filename)
+        return filename
+    
+    def join_segments(self, filenames: List[str]) -> str:
+        """
+        Concatenate segment MP3 files in order into one response file
+        
+        Args:
+            filenames: Segment file names in playback order
+        
+        Returns:
+            Name of the joined file (the segment itself if there is only one)
+        """
+        filename = write_joined(self.output_dir, filenames)
+        self.audio_index.record(filename)
+        return filename
+    
+    def probe(self, text: str = "آواز کی جانچ") -> float:
+        """
+        Synthesize a sentence outside the audio store and time it
+        
+        Used as a TTS health probe: the result is never cached, so every
+        probe really reaches the backend.
+        
+        Args:
+            text: Probe sentence (Urdu)
+        
+        Returns:
+            Seconds the synthesis took
+        
+        Raises:
+            Exception: If synthesis fails
+        """
+        with tempfile.TemporaryDirectory() as tmp:
+            started = time.perf_counter()
+            write_segment(Path(tmp), text, 'ur')
+            return time.perf_counter() - started
+    
+    def keep_segments(self, filenames: List[str]) -> List[str]:
+        """
+        Record the use of stored segments about to be served
+        
+        The audio index never evicts a file used within the grace period,
+        so a segment recorded here stays on disk while it is being served.
+        
+        Args:
+            filenames: Segment file names
+        
+        Returns:
+            File names that are not on disk (never written or already evicted)
+        """
+        missing = []
+        for filename in filenames:
+            self.audio_index.record(filename)
+            # Checked after recording: an eviction that got there first has deleted it
+            if not (self.output_dir / filename).exists():
+                missing.append(filename)
+        return missing
+    
+    def store_segments(self, segments: Dict[str, bytes]):
+        """
+        Write segment audio fetched from another node into the store
+        
+        Args:
+            segments: Segment file name -> MP3 bytes
+        """
+        for filename, data in segments.items():
+            filepath = self.output_dir / filename
+            if not filepath.exists():
+                tmp_path = _temp_path(filepath)
+                try:
+                    tmp_path.write_bytes(data)
+                    os.replace(tmp_path, filepath)
+                except OSError as e:
+                    tmp_path.unlink(missing_ok=True)
+                    logger.error(f"❌ Failed to store shared segment {filename}: {e}")
+                    continue
+            self.audio_index.record(filename)
+    
+    def read_audio(self, filename: str) -> bytes:
+        """
+        Read an audio file from the store and record the use
+        
+        Args:
+            filename: Audio file name
+        
+        Returns:
+            MP3 bytes
+        """
+        data = self.get_audio_path(filename).read_bytes()
+        self.audio_index.record(filename)
+        return data
+    
+    def record_files(self, filenames: List[str]):
+        """
+        Record audio files written elsewhere (e.g. by TTS worker processes)
+        or served from the cache, then apply the file limit
+        
+        Args:
+            filenames: Audio file names, most recently used last
+        """
+        for filename in filenames:
+            self.audio_index.record(filename)
+        self.cleanup_old_files()
+    
+    def cleanup_old_files(self, max_files: int = MAX_AUDIO_FILES):
         """
         Delete old audio files if count exceeds max_files
-        Keeps the most recent files based on creation time
+        Keeps the most recently written or served files, using the audio
+        index instead of listing the directory
         
         Args:
             max_files: Maximum number of audio files to keep
         """
         try:
-            cleanup_old_files(
-                directory=self.output_dir,
-                max_files=max_files,
-                extension=f".{AUDIO_FORMAT}"
-            )
-            logger.debug(f"🧹 Cleanup completed. Max files: {max_files}")
+            deleted = self.audio_index.evict(max_files)
+            if deleted:
+                logger.debug(f"🧹 Cleanup removed {len(deleted)} files. Max files: {max_files}")
         except Exception as e:
             logger.error(f"❌ Cleanup failed: {str(e)}")
     
@@ -114,8 +423,8 @@ class SpeechService:
             Full path to audio file
         
         Example:
-            >>> service.get_audio_path("speech_123.mp3")
-            Path('f:/urdu-voice-assistant/backend/audio_outputs/speech_123.mp3')
+            >>> service.get_audio_path("seg_ur_123.mp3")
+            Path('f:/urdu-voice-assistant/backend/audio_outputs/seg_ur_123.mp3')
         """
         return self.output_dir / filename
     
@@ -130,7 +439,7 @@ class SpeechService:
             True if file exists, False otherwise
         
         Example:
-            >>> service.file_exists("speech_123.mp3")
+            >>> service.file_exists("seg_ur_123.mp3")
             True
         """
         filepath = self.get_audio_path(filename)
@@ -150,8 +459,8 @@ class SpeechService:
             URL string for audio file
         
         Example:
-            >>> service.get_audio_url("speech_123.mp3")
-            '/api/v1/audio/speech_123.mp3'
+            >>> service.get_audio_url("seg_ur_123.mp3")
+            '/api/v1/audio/seg_ur_123.mp3'
         """
         return f"{base_url}/{filename}"
 
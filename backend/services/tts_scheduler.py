@@ -0,0 +1,572 @@
+"""
+TTS Scheduler - Priority-aware job queue in front of the speech service
+Orders synthesis work by priority, caps upstream calls and applies backpressure
+Each sentence is a separate job so long responses synthesize in parallel
+"""
+import asyncio
+import math
+import time
+from collections import deque
+from enum import IntEnum
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from pathlib import Path
+import sys
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from config import (
+    TTS_WORKERS,
+    TTS_QUEUE_MAX_DEPTH,
+    TTS_RATE_LIMIT_PER_SEC,
+    TTS_RATE_LIMIT_BURST,
+    TTS_RETRY_AFTER_SECONDS,
+    TTS_PROBE_WINDOW,
+    CACHE_AUDIO_TTL_SECONDS,
+    CACHE_AUDIO_MAX_BYTES
+)
+from utils.logger import setup_logger
+from utils.helpers import split_sentences
+from utils.metrics import REGISTRY, TTS_CACHE_TOTAL, TTS_FAILURES_TOTAL, TTS_QUEUE_WAIT
+
+logger = setup_logger(__name__)
+
+
+def audio_cache_key(filename: str) -> str:
+    """Shared cache key of a segment audio file (file names are content hashes)"""
+    return f"audio:{filename}"
+
+
+class TTSPriority(IntEnum):
+    """Priority classes for synthesis jobs (lower value runs first)"""
+    INTERACTIVE = 0  # A live user is waiting for this audio
+    PREFETCH = 1     # Speculative synthesis of likely next responses
+    WARMUP = 2       # Cache warm-up at startup
+
+
+class TTSQueueFullError(Exception):
+    """Raised when the TTS queue is saturated and cannot accept more jobs"""
+
+    def __init__(self, depth: int, retry_after: int):
+        self.depth = depth
+        self.retry_after = retry_after
+        super().__init__(f"TTS queue is full ({depth} pending jobs)")
+
+
+class TokenBucket:
+    """
+    Token bucket limiting how often we call the upstream TTS provider
+
+    Tokens refill continuously at `rate` per second up to `capacity`.
+    """
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = max(rate, 0.001)
+        self.capacity = max(capacity, 1)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        """Add tokens earned since the last update"""
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self):
+        """Wait until a token is available and consume it"""
+        while True:
+            self._refill(time.monotonic())
+            if self.tokens >= 1.0:
+                self.tokens -= 1.0
+                return
+            await asyncio.sleep((1.0 - self.tokens) / self.rate)
+
+    def refund(self):
+        """Return a token that was acquired but not used"""
+        self.tokens = min(self.capacity, self.tokens + 1.0)
+
+
+class _TTSJob:
+    """A single queued sentence synthesis request"""
+
+    __slots__ = ('text', 'lang', 'priority', 'future', 'enqueued_at', 'started', 'holders', 'seq')
+
+    def __init__(self, text: str, lang: str, priority: TTSPriority, future: asyncio.Future):
+        self.text = text
+        self.lang = lang
+        self.priority = priority
+        self.future = future
+        self.enqueued_at = time.monotonic()
+        self.started = False
+        # enqueue() calls sharing this job; release() withdraws it at zero
+        self.holders = 1
+        # Sequence number of the job's live queue entry (None when not queued);
+        # entries left behind by an upgrade or withdrawal no longer match it
+        self.seq: Optional[int] = None
+
+
+class TTSScheduler:
+    """
+    Priority queue of synthesis jobs served by a fixed pool of async workers
+
+    Interactive jobs always run before prefetch and warm-up jobs. Background
+    jobs may only fill half of the queue so live users keep some headroom.
+    """
+
+    def __init__(
+        self,
+        speech_service,
+        workers: int = TTS_WORKERS,
+        max_depth: int = TTS_QUEUE_MAX_DEPTH,
+        rate_per_sec: float = TTS_RATE_LIMIT_PER_SEC,
+        burst: int = TTS_RATE_LIMIT_BURST,
+        worker_pool=None,
+        shared_cache=None
+    ):
+        """
+        Initialize scheduler
+
+        Args:
+            speech_service: SpeechService used to perform the synthesis
+            workers: Number of concurrent synthesis workers
+            max_depth: Maximum number of pending jobs
+            rate_per_sec: Upstream TTS calls allowed per second
+            burst: Maximum burst of upstream calls
+            worker_pool: Optional TTSWorkerPool; when set, synthesis runs in
+                worker processes instead of threads of this process
+            shared_cache: Optional CacheBackend shared with other nodes;
+                segments found there are copied into the local store instead
+                of being synthesized, and new segments are published to it
+        """
+        self.speech_service = speech_service
+        self.worker_pool = worker_pool
+        self.shared_cache = shared_cache
+        self._publishing = set()
+        self.num_workers = max(1, workers)
+        self.max_depth = max(1, max_depth)
+        self.bucket = TokenBucket(rate_per_sec, burst)
+
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._workers = []
+        self._seq = 0
+        self._inflight: Dict[Tuple[str, str], _TTSJob] = {}
+        # Future handed out by enqueue() -> its unfinished job, for release()
+        self._jobs: Dict[asyncio.Future, _TTSJob] = {}
+
+        # Metrics
+        self._depth = {p: 0 for p in TTSPriority}
+        self._started = {p: 0 for p in TTSPriority}
+        self._completed = {p: 0 for p in TTSPriority}
+        self._rejected = {p: 0 for p in TTSPriority}
+        self._failed = 0
+        self._cache_hits = 0
+        self._deduplicated = 0
+        self._withdrawn = 0
+        self._fetched_shared = 0
+        self._published_shared = 0
+        self._wait_total = {p: 0.0 for p in TTSPriority}
+        self._wait_max = {p: 0.0 for p in TTSPriority}
+
+        # (finished at, seconds, succeeded) of recent upstream synthesis calls and probes
+        self.recent_synthesis: deque = deque(maxlen=TTS_PROBE_WINDOW)
+
+        REGISTRY.gauge(
+            "assistant_tts_queue_depth",
+            "Sentence jobs waiting in the TTS queue",
+            callback=lambda: self.depth
+        )
+
+        logger.info(
+            f"✅ TTSScheduler initialized: workers={self.num_workers}, "
+            f"max_depth={self.max_depth}, rate={rate_per_sec}/s"
+        )
+
+    @property
+    def depth(self) -> int:
+        """Total number of pending jobs"""
+        return sum(self._depth.values())
+
+    def _ensure_started(self):
+        """Create the queue and worker tasks on the running event loop"""
+        if self._workers:
+            return
+        self._queue = asyncio.PriorityQueue()
+        self._workers = [
+            asyncio.create_task(self._worker(i), name=f"tts-worker-{i}")
+            for i in range(self.num_workers)
+        ]
+        logger.info(f"🚦 TTS scheduler started with {self.num_workers} workers")
+
+    async def start(self):
+        """Start worker tasks on the running event loop"""
+        self._ensure_started()
+
+    async def stop(self):
+        """Stop workers and fail any jobs still waiting in the queue"""
+        for task in [*self._workers, *self._publishing]:
+            task.cancel()
+        await asyncio.gather(*self._workers, *self._publishing, return_exceptions=True)
+        self._workers = []
+
+        if self._queue is not None:
+            while not self._queue.empty():
+                priority, seq, job = self._queue.get_nowait()
+                if seq == job.seq:
+                    self._depth[TTSPriority(priority)] -= 1
+                    job.seq = None
+        for job in list(self._inflight.values()):
+            if not job.future.done():
+                job.future.set_exception(RuntimeError("TTS scheduler stopped"))
+        self._inflight.clear()
+        self._jobs.clear()
+
+        if self.worker_pool is not None:
+            await asyncio.to_thread(self.worker_pool.shutdown)
+        logger.info("🛑 TTS scheduler stopped")
+
+    def _capacity_for(self, priority: TTSPriority) -> int:
+        """Queue depth a job of this priority is allowed to fill"""
+        if priority == TTSPriority.INTERACTIVE:
+            return self.max_depth
+        return max(1, self.max_depth // 2)
+
+    def retry_after(self) -> int:
+        """Seconds a rejected client should wait before retrying"""
+        drain_time = math.ceil(self.depth / self.bucket.rate)
+        return max(TTS_RETRY_AFTER_SECONDS, drain_time)
+
+    def enqueue(
+        self,
+        text: str,
+        lang: str,
+        priority: TTSPriority = TTSPriority.INTERACTIVE
+    ) -> List[asyncio.Future]:
+        """
+        Split text into sentences and queue the ones not cached yet
+
+        Sentences already on disk resolve immediately (call prepare() first
+        so they are not evicted before they are read), and sentences that are
+        already queued or being synthesized share the existing job. A shared
+        job is bumped to the higher priority if it has not started yet.
+
+        Args:
+            text: Text to synthesize
+            lang: Language code ('ur' or 'en')
+            priority: Job priority class
+
+        Returns:
+            Futures resolving to segment file names, in playback order
+
+        Raises:
+            TTSQueueFullError: If the queue is saturated for this priority
+        """
+        self._ensure_started()
+        lang = self.speech_service.resolve_language(lang)
+        loop = asyncio.get_running_loop()
+
+        futures = []
+        new_jobs = {}
+        upgrades = []
+        shared = []
+        for segment in split_sentences(text) or [text.strip()]:
+            key = (lang, segment)
+            job = self._inflight.get(key) or new_jobs.get(key)
+            if job is not None:
+                self._deduplicated += 1
+                TTS_CACHE_TOTAL.inc("shared")
+                shared.append(job)
+                if priority < job.priority and not job.started:
+                    upgrades.append(job)
+                futures.append(job.future)
+            elif self.speech_service.has_segment(segment, lang):
+                self._cache_hits += 1
+                TTS_CACHE_TOTAL.inc("hit")
+                future = loop.create_future()
+                future.set_result(self.speech_service.segment_filename(segment, lang))
+                futures.append(future)
+            else:
+                job = _TTSJob(segment, lang, priority, loop.create_future())
+                new_jobs[key] = job
+                TTS_CACHE_TOTAL.inc("miss")
+                futures.append(job.future)
+
+        # Upgrades only move pending jobs between classes; new jobs must all fit
+        if new_jobs and self.depth + len(new_jobs) > self._capacity_for(priority):
+            self._rejected[priority] += 1
+            logger.warning(
+                f"⚠️ TTS queue saturated ({self.depth} pending, {len(new_jobs)} new), "
+                f"rejecting {priority.name} job"
+            )
+            raise TTSQueueFullError(self.depth, self.retry_after())
+
+        for job in shared:
+            job.holders += 1
+        for job in upgrades:
+            # The old entry stays in the queue but no longer counts
+            self._depth[job.priority] -= 1
+            job.priority = priority
+            self._put(job)
+        for key, job in new_jobs.items():
+            self._inflight[key] = job
+            self._jobs[job.future] = job
+            job.future.add_done_callback(lambda _, key=key, job=job: self._job_done(key, job))
+            self._put(job)
+
+        return futures
+
+    def release(self, futures: List[asyncio.Future]) -> int:
+        """
+        Give up on audio queued by an earlier enqueue()
+
+        For speculative work that turned out not to be needed. Each future
+        returns the hold its enqueue() took on the sentence job; a job
+        nobody holds any more is withdrawn if it has not started. Jobs other
+        requests still wait for, and jobs already running, go on. Futures
+        of cached sentences hold nothing and are ignored.
+
+        Args:
+            futures: Futures returned by enqueue(), each released once
+
+        Returns:
+            Number of sentence jobs withdrawn
+        """
+        withdrawn = 0
+        for future in futures:
+            job = self._jobs.get(future)
+            if job is None:
+                continue
+            job.holders -= 1
+            if job.holders <= 0 and not job.started and not job.future.done():
+                # The worker skips the queue entry of a withdrawn job
+                self._depth[job.priority] -= 1
+                job.seq = None
+                job.future.cancel()
+                withdrawn += 1
+        self._withdrawn += withdrawn
+        return withdrawn
+
+    async def prepare(self, text: str, lang: str) -> int:
+        """
+        Get the stored sentences of a text ready to be served
+
+        Call before enqueue(). Sentences already on disk are recorded as
+        used in the audio index first, so another worker's eviction pass
+        cannot delete them between enqueue() finding them and collect()
+        reading them. Sentences missing here are then fetched with one bulk
+        read from the shared cache, if there is one, and enqueue() finds
+        them stored too.
+
+        Args:
+            text: Text about to be synthesized
+            lang: Language code ('ur' or 'en')
+
+        Returns:
+            Number of segments fetched from the shared cache
+        """
+        lang = self.speech_service.resolve_language(lang)
+        filenames = [
+            self.speech_service.segment_filename(segment, lang)
+            for segment in split_sentences(text) or [text.strip()]
+            if (lang, segment) not in self._inflight
+        ]
+        if not filenames:
+            return 0
+        # The index is shared with other workers; record it off the event loop
+        missing = await asyncio.to_thread(self.speech_service.keep_segments, filenames)
+        if self.shared_cache is None or not missing:
+            return 0
+
+        wanted = {audio_cache_key(filename): filename for filename in missing}
+        found = await self.shared_cache.get_many(list(wanted))
+        if found:
+            await asyncio.to_thread(
+                self.speech_service.store_segments,
+                {wanted[key]: data for key, data in found.items()}
+            )
+            self._fetched_shared += len(found)
+        return len(found)
+
+    def _publish(self, filename: str):
+        """Share a newly synthesized segment with other nodes in the background"""
+        task = asyncio.create_task(self._publish_segment(filename))
+        self._publishing.add(task)
+        task.add_done_callback(self._publishing.discard)
+
+    async def _publish_segment(self, filename: str):
+        try:
+            data = await asyncio.to_thread(self.speech_service.get_audio_path(filename).read_bytes)
+        except OSError:
+            return
+        if len(data) <= CACHE_AUDIO_MAX_BYTES:
+            await self.shared_cache.set(audio_cache_key(filename), data, CACHE_AUDIO_TTL_SECONDS)
+            self._published_shared += 1
+
+    async def submit(
+        self,
+        text: str,
+        lang: str,
+        priority: TTSPriority = TTSPriority.INTERACTIVE
+    ) -> str:
+        """
+        Queue text for synthesis and wait for the joined audio file
+
+        Args:
+            text: Text to synthesize
+            lang: Language code ('ur' or 'en')
+            priority: Job priority class
+
+        Returns:
+            Name of the generated audio file
+
+        Raises:
+            TTSQueueFullError: If the queue is saturated for this priority
+        """
+        await self.prepare(text, lang)
+        return await self.collect(self.enqueue(text, lang, priority))
+
+    async def collect(self, futures: List[asyncio.Future]) -> str:
+        """
+        Wait for queued segments and join them into one audio file
+
+        Args:
+            futures: Futures returned by enqueue()
+
+        Returns:
+            Name of the joined audio file
+        """
+        # Shield shared jobs so one cancelled caller does not cancel them for others
+        filenames = await asyncio.gather(*(asyncio.shield(f) for f in futures))
+
+        if self.worker_pool is not None:
+            filename = await self.worker_pool.join_segments(list(filenames))
+        else:
+            filename = await asyncio.to_thread(self.speech_service.join_segments, list(filenames))
+
+        # Segments and joined file may come from worker processes or the cache
+        await asyncio.to_thread(self.speech_service.record_files, [*filenames, filename])
+        return filename
+
+    async def iter_audio(self, futures: List[asyncio.Future]) -> AsyncIterator[bytes]:
+        """
+        Yield segment audio bytes in order as soon as each one is ready
+
+        Args:
+            futures: Futures returned by enqueue()
+
+        Yields:
+            MP3 bytes of each segment
+        """
+        for future in futures:
+            filename = await asyncio.shield(future)
+            # The index is shared with other workers; record it off the event loop
+            yield await asyncio.to_thread(self.speech_service.read_audio, filename)
+
+    def _put(self, job: _TTSJob):
+        """Add a queue entry for the job at its current priority"""
+        self._seq += 1
+        job.seq = self._seq
+        self._depth[job.priority] += 1
+        self._queue.put_nowait((int(job.priority), self._seq, job))
+
+    def _job_done(self, key: Tuple[str, str], job: _TTSJob):
+        """Forget a finished job and mark its exception as retrieved"""
+        if self._inflight.get(key) is job:
+            del self._inflight[key]
+        self._jobs.pop(job.future, None)
+        if not job.future.cancelled():
+            job.future.exception()
+
+    async def _worker(self, worker_id: int):
+        """Pull sentence jobs from the queue and synthesize them off the event loop"""
+        while True:
+            # Take the upstream token before picking a job, so the job chosen
+            # is the highest-priority one at the moment we may call upstream
+            await self.bucket.acquire()
+            priority, seq, job = await self._queue.get()
+            priority = TTSPriority(priority)
+            try:
+                # Stale entry left behind by a priority upgrade or a withdrawal
+                if seq != job.seq:
+                    self.bucket.refund()
+                    continue
+                self._depth[priority] -= 1
+                job.seq = None
+                job.started = True
+
+                wait = time.monotonic() - job.enqueued_at
+                self._started[priority] += 1
+                self._wait_total[priority] += wait
+                self._wait_max[priority] = max(self._wait_max[priority], wait)
+                TTS_QUEUE_WAIT.observe(wait, priority.name.lower())
+
+                synth_started = time.monotonic()
+                try:
+                    if self.worker_pool is not None:
+                        filename = await self.worker_pool.synthesize_segment(job.text, job.lang)
+                    else:
+                        filename = await asyncio.to_thread(
+                            self.speech_service.synthesize_segment, job.text, job.lang
+                        )
+                except Exception:
+                    self.record_synthesis(time.monotonic() - synth_started, False)
+                    raise
+                self.record_synthesis(time.monotonic() - synth_started, True)
+                self._completed[priority] += 1
+                if self.shared_cache is not None:
+                    self._publish(filename)
+                if not job.future.done():
+                    job.future.set_result(filename)
+            except asyncio.CancelledError:
+                if not job.future.done():
+                    job.future.cancel()
+                raise
+            except Exception as e:
+                self._failed += 1
+                TTS_FAILURES_TOTAL.inc()
+                if not job.future.done():
+                    job.future.set_exception(e)
+            finally:
+                self._queue.task_done()
+
+    def record_synthesis(self, seconds: float, ok: bool):
+        """
+        Record the duration of one upstream synthesis call (job or health probe)
+
+        Args:
+            seconds: Time the call took
+            ok: Whether it succeeded
+        """
+        self.recent_synthesis.append((time.monotonic(), seconds, ok))
+
+    def get_stats(self) -> Dict:
+        """
+        Get queue depth and wait-time metrics
+
+        Returns:
+            Dictionary with per-priority depth, throughput and wait times
+        """
+        priorities = {}
+        for p in TTSPriority:
+            started = self._started[p]
+            priorities[p.name.lower()] = {
+                'depth': self._depth[p],
+                'completed': self._completed[p],
+                'rejected': self._rejected[p],
+                'avg_wait_ms': round(self._wait_total[p] / started * 1000, 2) if started else 0.0,
+                'max_wait_ms': round(self._wait_max[p] * 1000, 2)
+            }
+
+        return {
+            'depth': self.depth,
+            'max_depth': self.max_depth,
+            'workers': self.num_workers,
+            'rate_limit_per_sec': self.bucket.rate,
+            'executor': self.worker_pool.get_stats() if self.worker_pool else {'mode': 'thread'},
+            'failed': self._failed,
+            'segments': {
+                'cache_hits': self._cache_hits,
+                'synthesized': sum(self._completed.values()),
+                'deduplicated': self._deduplicated,
+                'withdrawn': self._withdrawn,
+                'in_flight': len(self._inflight),
+                'fetched_shared': self._fetched_shared,
+                'published_shared': self._published_shared
+            },
+            'priorities': priorities
+        }
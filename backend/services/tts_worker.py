@@ -0,0 +1,124 @@
+"""
+TTS Worker Pool - Out-of-process speech synthesis
+Runs gTTS requests, MP3 writing and joining in separate worker processes
+so they do not compete with request handling for the API process GIL
+"""
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import List, Optional
+import sys
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from config import AUDIO_OUTPUT_DIR
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+
+def _init_worker():
+    """Import the synthesis code and TTS backend once per worker process"""
+    from services.speech_service import preload_backend
+    preload_backend()
+
+
+def _synthesize_job(output_dir: str, text: str, lang: str) -> str:
+    """Worker-side entry point: synthesize one sentence into the shared store"""
+    from services.speech_service import write_segment
+    return write_segment(Path(output_dir), text, lang)
+
+
+def _join_job(output_dir: str, filenames: List[str]) -> str:
+    """Worker-side entry point: join segment files into one response file"""
+    from services.speech_service import write_joined
+    return write_joined(Path(output_dir), filenames)
+
+
+class TTSWorkerPool:
+    """
+    Pool of TTS worker processes fed through a multiprocessing queue
+
+    Workers write straight into the shared audio store and only return the
+    file name, so the API process just awaits completion.
+    """
+
+    def __init__(self, processes: int, output_dir: Path = AUDIO_OUTPUT_DIR):
+        """
+        Initialize worker pool (processes are started on first use)
+
+        Args:
+            processes: Number of worker processes
+            output_dir: Shared audio store directory
+        """
+        self.processes = max(1, processes)
+        self.output_dir = str(output_dir)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._restarts = 0
+        logger.info(f"✅ TTSWorkerPool configured with {self.processes} processes")
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        """Create the process pool lazily"""
+        if self._executor is None:
+            # spawn: never fork the API process with its event loop and threads
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.processes,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker
+            )
+            logger.info(f"🏭 Started {self.processes} TTS worker processes")
+        return self._executor
+
+    async def _run(self, fn, *args):
+        """Run a job in the pool, replacing the pool if a worker died"""
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(self._get_executor(), fn, *args)
+        except BrokenProcessPool:
+            logger.error("❌ TTS worker process died, restarting pool")
+            self._restarts += 1
+            self.shutdown(wait=False)
+            raise
+
+    async def synthesize_segment(self, text: str, lang: str) -> str:
+        """
+        Synthesize one sentence in a worker process
+
+        Args:
+            text: Sentence text
+            lang: Language code ('ur' or 'en')
+
+        Returns:
+            Name of the segment audio file
+        """
+        return await self._run(_synthesize_job, self.output_dir, text, lang)
+
+    async def join_segments(self, filenames: List[str]) -> str:
+        """
+        Join segment files in a worker process
+
+        Args:
+            filenames: Segment file names in playback order
+
+        Returns:
+            Name of the joined file
+        """
+        if len(filenames) == 1:
+            return filenames[0]
+        return await self._run(_join_job, self.output_dir, filenames)
+
+    def shutdown(self, wait: bool = True):
+        """Stop all worker processes"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait, cancel_futures=True)
+            self._executor = None
+            logger.info("🛑 TTS worker processes stopped")
+
+    def get_stats(self) -> dict:
+        """Get worker pool status"""
+        return {
+            'mode': 'process',
+            'processes': self.processes,
+            'running': self._executor is not None,
+            'restarts': self._restarts
+        }
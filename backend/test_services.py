@@ -3,7 +3,10 @@ Test script for all backend services
 Run this to verify SEGMENT 2 implementation
 """
 import asyncio
+import random
 import sys
+import tempfile
+import time
 from pathlib import Path
 
 # Add parent directory to path
@@ -13,6 +16,15 @@ from services.speech_service import SpeechService
 from services.intent_detector import IntentDetector
 from services.response_generator import ResponseGenerator
 from services.command_service import CommandService
+from services.session_store import SessionStore
+from services.tts_scheduler import TTSScheduler, TTSPriority, TTSQueueFullError
+from utils.cache_backend import RedisCache, NearCache, InProcessCache
+from utils.rate_limit import RateLimiter, RateLimitMiddleware, ForwardedClientMiddleware
+from utils.resp_server import LocalRespServer
+from utils.metrics import MetricsRegistry
+from utils.worker_stats import WorkerMetricsExchange
+from utils.request_log import RequestLog
+from tools.analyze_requests import RequestLogAnalyzer
 from utils.logger import setup_logger
 
 logger = setup_logger(__name__)
@@ -82,6 +94,49 @@ def test_intent_detector():
         return False
 
 
+def test_incremental_matcher():
+    """Test that incremental matching of revised transcripts equals detect_intent"""
+    print("\n" + "="*60)
+    print("🧪 TESTING INCREMENTAL MATCHER")
+    print("="*60 + "\n")
+    
+    detector = IntentDetector()
+    keywords = sorted({keyword for data in detector.patterns.values() for keyword in data.get('keywords', [])})
+    words = keywords + ["کیا", "ہے", "آج", "please", "the", "xyz", "،", "؟", "!", "123"]
+    rng = random.Random(2024)
+    
+    def revise(text: str) -> str:
+        """One interim revision: grow, correct or cut the transcript"""
+        roll = rng.random()
+        if roll < 0.4 or not text:
+            word = rng.choice(words)
+            # Interim results often end part way through a word
+            if rng.random() < 0.3:
+                word = word[:rng.randint(1, len(word))]
+            return f"{text} {word}".strip()
+        if roll < 0.6:
+            cut = rng.randint(0, len(text))
+            return text[:cut] + rng.choice(words)
+        if roll < 0.8:
+            at = rng.randint(0, len(text))
+            return text[:at] + rng.choice(" abاکی") + text[at:]
+        return text[:rng.randint(0, len(text))]
+    
+    checked = 0
+    for _ in range(300):
+        matcher = detector.incremental_matcher()
+        text = ""
+        for _ in range(rng.randint(1, 12)):
+            text = revise(text)
+            expected = detector.detect_intent(text)
+            assert matcher.update(text) == expected[:2], (text, expected)
+            assert matcher.result() == expected, (text, matcher.result(), expected)
+            checked += 1
+    
+    print(f"✅ {checked} revisions matched detect_intent")
+    print("\n✅ Incremental matcher tests PASSED!\n")
+
+
 def test_response_generator():
     """Test ResponseGenerator"""
     print("\n" + "="*60)
@@ -138,6 +193,413 @@ async def test_command_service():
         return False
 
 
+class _RecordingSpeech:
+    """Speech service stand-in that records the order sentences are synthesized in"""
+    
+    def __init__(self):
+        self.synthesized = []
+    
+    def resolve_language(self, lang):
+        return lang
+    
+    def segment_filename(self, text, lang):
+        return f"{lang}_{text}.mp3"
+    
+    def has_segment(self, text, lang):
+        return False
+    
+    def synthesize_segment(self, text, lang):
+        self.synthesized.append(text)
+        return self.segment_filename(text, lang)
+    
+    def join_segments(self, filenames):
+        return "+".join(filenames)
+    
+    def record_files(self, filenames):
+        pass
+
+
+def test_tts_scheduler():
+    """Test TTS job priorities and backpressure"""
+    print("\n" + "="*60)
+    print("🧪 TESTING TTS SCHEDULER")
+    print("="*60 + "\n")
+    
+    async def run_priorities():
+        speech = _RecordingSpeech()
+        scheduler = TTSScheduler(speech, workers=1, max_depth=8, rate_per_sec=1000, burst=10)
+        try:
+            # Queued in one go, before the worker gets to run
+            background = scheduler.enqueue("warm.", "en", TTSPriority.WARMUP)
+            prefetch = scheduler.enqueue("next.", "en", TTSPriority.PREFETCH)
+            live = scheduler.enqueue("now.", "en", TTSPriority.INTERACTIVE)
+            await scheduler.collect(background + prefetch + live)
+        finally:
+            await scheduler.stop()
+        return speech.synthesized
+    
+    async def run_backpressure():
+        scheduler = TTSScheduler(_RecordingSpeech(), workers=1, max_depth=4, rate_per_sec=0.01, burst=1)
+        scheduler.bucket.tokens = 0  # Nothing drains while the test runs
+        results = {}
+        try:
+            scheduler.enqueue("one. two.", "en", TTSPriority.PREFETCH)
+            try:
+                # Background work may fill only half of the queue
+                scheduler.enqueue("three.", "en", TTSPriority.PREFETCH)
+            except TTSQueueFullError as e:
+                results['prefetch'] = e
+            # Upgrading queued jobs does not count them twice
+            scheduler.enqueue("one. two.", "en", TTSPriority.INTERACTIVE)
+            scheduler.enqueue("three.", "en", TTSPriority.INTERACTIVE)
+            try:
+                # Every sentence of a reply must fit, not just the first
+                scheduler.enqueue("four. five.", "en", TTSPriority.INTERACTIVE)
+            except TTSQueueFullError as e:
+                results['multi'] = (e, scheduler.depth)
+            scheduler.enqueue("four.", "en", TTSPriority.INTERACTIVE)
+            results['depth'] = scheduler.depth
+            try:
+                scheduler.enqueue("six.", "en", TTSPriority.INTERACTIVE)
+            except TTSQueueFullError as e:
+                results['interactive'] = e
+        finally:
+            await scheduler.stop()
+        return results
+    
+    # Test 1: interactive jobs run first
+    print("1. Testing priority order...")
+    order = asyncio.run(run_priorities())
+    print(f"   Synthesized: {order}")
+    assert order == ["now.", "next.", "warm."], order
+    
+    # Test 2: a full queue rejects with a retry hint
+    print("2. Testing full queue...")
+    results = asyncio.run(run_backpressure())
+    assert 'prefetch' in results, "prefetch job filled more than half the queue"
+    assert 'multi' in results and results['multi'][1] == 3, "multi-sentence reply overfilled the queue"
+    assert results['depth'] == 4, results['depth']
+    error = results.get('interactive')
+    assert error is not None, "full queue accepted a job"
+    assert error.depth == 4 and error.retry_after >= 1, (error.depth, error.retry_after)
+    print(f"   ✅ Rejected at depth {error.depth}, retry after {error.retry_after}s")
+    
+    print("\n✅ TTS scheduler tests PASSED!\n")
+
+
+def test_session_store():
+    """Test conversation history bounds: turns, LRU order, idle TTL and bytes"""
+    print("\n" + "="*60)
+    print("🧪 TESTING SESSION STORE")
+    print("="*60 + "\n")
+    
+    # Test 1: ring buffer of the latest turns
+    print("1. Testing turn limit...")
+    store = SessionStore(max_turns=3, max_sessions=10, max_bytes=10**6, idle_ttl=0)
+    for i in range(5):
+        store.record("ws-1", f"q{i}", f"a{i}", "greeting")
+    assert [turn.user_input for turn in store.history("ws-1")] == ["q2", "q3", "q4"]
+    assert [turn.user_input for turn in store.history("ws-1", limit=1)] == ["q4"]
+    assert store.history(None) == [] and store.history("unknown") == []
+    
+    # Test 2: least recently active conversation goes first
+    print("2. Testing LRU eviction...")
+    store = SessionStore(max_turns=2, max_sessions=2, max_bytes=10**6, idle_ttl=0)
+    store.record("ws-1", "q", "a", "greeting")
+    store.record("ws-2", "q", "a", "greeting")
+    store.record("ws-1", "q", "a", "greeting")  # ws-2 is now the oldest
+    store.record("ws-3", "q", "a", "greeting")
+    assert store.history("ws-2") == [], "least recently used conversation kept"
+    assert store.history("ws-1") and store.history("ws-3")
+    store.end("ws-1")
+    assert store.history("ws-1") == []
+    stats = store.get_stats()
+    assert stats['evicted'] == 1 and stats['ended'] == 1 and stats['conversations'] == 1, stats
+    
+    # Test 3: idle conversations expire
+    print("3. Testing idle TTL...")
+    store = SessionStore(max_turns=2, max_sessions=10, max_bytes=10**6, idle_ttl=0.05)
+    store.record("ws-1", "q", "a", "greeting")
+    time.sleep(0.1)
+    assert store.history("ws-1") == []
+    store.record("ws-2", "q", "a", "greeting")
+    stats = store.get_stats()
+    assert stats['expired'] == 1 and stats['conversations'] == 1, stats
+    
+    # Test 4: the byte cap holds however many conversations arrive
+    print("4. Testing byte cap...")
+    store = SessionStore(max_turns=5, max_sessions=10**6, max_bytes=64 * 1024, idle_ttl=0)
+    for i in range(5000):
+        store.record(f"ws-{i}", "آج موسم کیسا ہے؟" * 4, "آج موسم خوشگوار ہے" * 4, "weather")
+    stats = store.get_stats()
+    print(f"   Stats: {stats}")
+    assert stats['bytes'] <= 64 * 1024, stats
+    assert 0 < stats['conversations'] < 5000 and stats['evicted'] == 5000 - stats['conversations'], stats
+    assert store.history("ws-4999"), "newest conversation evicted"
+    
+    print("\n✅ Session store tests PASSED!\n")
+
+
+def test_rate_limiter():
+    """Test token buckets: burst, refill, and separate user and IP buckets"""
+    print("\n" + "="*60)
+    print("🧪 TESTING RATE LIMITER")
+    print("="*60 + "\n")
+    
+    # 600 per minute: one token every 0.1s after a burst of 3
+    limiter = RateLimiter(limits={'/limited': (600, 3)}, ip_factor=2)
+    
+    # Test 1: burst, then a wait
+    print("1. Testing burst...")
+    waits = [limiter.acquire('/limited', '192.0.2.1', 'alice') for _ in range(4)]
+    print(f"   Waits: {[round(w, 3) for w in waits]}")
+    assert waits[:3] == [0.0, 0.0, 0.0], waits
+    assert 0 < waits[3] <= 0.1, waits
+    assert limiter.acquire('/unlimited', '192.0.2.1', 'alice') == 0.0
+    
+    # Test 2: tokens come back over time
+    print("2. Testing refill...")
+    time.sleep(0.12)
+    assert limiter.acquire('/limited', '192.0.2.1', 'alice') == 0.0
+    assert limiter.acquire('/limited', '192.0.2.1', 'alice') > 0
+    
+    # Test 3: users behind one IP each have their own bucket...
+    print("3. Testing per-user and per-IP buckets...")
+    assert [limiter.acquire('/limited', '203.0.113.5', 'dave') for _ in range(3)] == [0.0] * 3
+    assert limiter.acquire('/limited', '203.0.113.5', 'dave') > 0
+    assert [limiter.acquire('/limited', '203.0.113.5', 'erin') for _ in range(3)] == [0.0] * 3
+    # ...until the IP's bucket (twice the user burst) runs dry for everyone
+    assert limiter.acquire('/limited', '203.0.113.5', 'frank') > 0
+    # The same user from another IP is still held to their own bucket
+    assert limiter.acquire('/limited', '198.51.100.7', 'dave') > 0
+    # while others on that IP are not affected
+    assert limiter.acquire('/limited', '198.51.100.7') == 0.0
+    stats = limiter.get_stats()
+    print(f"   ✅ Stats: {stats}")
+    assert stats['admitted'] == 11 and stats['limited'] == 5, stats
+    
+    print("\n✅ Rate limiter tests PASSED!\n")
+
+
+def test_rate_limit_behind_proxy():
+    """Test that clients behind one trusted proxy get separate rate limit buckets"""
+    print("\n" + "="*60)
+    print("🧪 TESTING RATE LIMIT BEHIND A PROXY")
+    print("="*60 + "\n")
+    
+    async def app(scope, receive, send):
+        await send({'type': 'http.response.start', 'status': 200, 'headers': []})
+        await send({'type': 'http.response.body', 'body': b''})
+    
+    async def request(stack, peer, forwarded):
+        scope = {
+            'type': 'http',
+            'method': 'GET',
+            'path': '/limited',
+            'headers': [(b'x-forwarded-for', forwarded.encode())],
+            'client': (peer, 40000)
+        }
+        sent = []
+        
+        async def receive():
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        
+        async def send(message):
+            sent.append(message)
+        
+        await stack(scope, receive, send)
+        return sent[0]['status']
+    
+    async def run(trusted, peer):
+        # One request per client and bucket
+        limiter = RateLimiter(limits={'/limited': (1, 1)}, ip_factor=1)
+        stack = ForwardedClientMiddleware(RateLimitMiddleware(app, limiter), trusted=trusted)
+        return [
+            await request(stack, peer, '198.51.100.1'),
+            await request(stack, peer, '198.51.100.2'),
+            await request(stack, peer, '198.51.100.1'),
+            # A client-written entry to the left of the proxy's is ignored
+            await request(stack, peer, '203.0.113.9, 198.51.100.2')
+        ]
+    
+    statuses = asyncio.run(run('10.0.0.1', '10.0.0.1'))
+    print(f"1. Trusted proxy 10.0.0.1: {statuses}")
+    assert statuses == [200, 200, 429, 429], statuses
+    
+    statuses = asyncio.run(run('*', '100.64.3.7'))
+    print(f"2. Any proxy ('*'): {statuses}")
+    assert statuses == [200, 200, 429, 429], statuses
+    
+    # An untrusted peer cannot choose its address with the header
+    statuses = asyncio.run(run('10.0.0.1', '192.0.2.50'))
+    print(f"3. Untrusted peer: {statuses}")
+    assert statuses == [200, 429, 429, 429], statuses
+    
+    print("\n✅ Rate limit proxy tests PASSED!\n")
+
+
+def test_cache_backends():
+    """Test RedisCache and NearCache against a local Redis protocol server"""
+    print("\n" + "="*60)
+    print("🧪 TESTING CACHE BACKENDS")
+    print("="*60 + "\n")
+    
+    async def run():
+        server = LocalRespServer()
+        port = await server.start()
+        remote = RedisCache(port=port, prefix="test:", timeout=1.0, retry_interval=60)
+        try:
+            # Test 1: get / get_many / set, with TTL expiry
+            print("1. Testing get, get_many and set...")
+            await remote.set("a", b"1")
+            await remote.set_many({"b": "ب".encode(), "short": b"x"}, ttl=0.05)
+            assert await remote.get("a") == b"1"
+            found = await remote.get_many(["a", "b", "short", "missing"])
+            assert found == {"a": b"1", "b": "ب".encode(), "short": b"x"}, found
+            assert await remote.get("missing") is None
+            await asyncio.sleep(0.1)
+            assert await remote.get("short") is None, "entry outlived its TTL"
+            assert await remote.get_many(["a", "b"]) == {"a": b"1"}
+            print(f"   ✅ Stats: {remote.get_stats()}\n")
+            
+            # Test 2: near-cache hits and invalidation
+            print("2. Testing near-cache...")
+            near = NearCache(remote, InProcessCache(), ttl=0.1)
+            await near.set("n", b"v1")
+            round_trips = remote.get_stats()['round_trips']
+            assert await near.get("n") == b"v1"
+            assert await near.get_many(["n"]) == {"n": b"v1"}
+            assert remote.get_stats()['round_trips'] == round_trips, "near hit went to the server"
+            
+            # Another node overwrites the entry: seen once the near copy expires
+            await remote.set("n", b"v2")
+            assert await near.get("n") == b"v1"
+            await asyncio.sleep(0.15)
+            assert await near.get("n") == b"v2"
+            
+            # delete removes both copies
+            await near.delete("n")
+            assert await near.get("n") is None
+            assert await remote.get("n") is None
+            print(f"   ✅ Near stats: {near.get_stats()['near']}\n")
+            
+            # Test 3: a stopped server is a miss, not an error
+            print("3. Testing stopped server...")
+            await near.set("kept", b"local")
+            await server.stop()
+            assert await remote.get("a") is None
+            assert await remote.get_many(["a", "b"]) == {}
+            await remote.set("a", b"2")
+            await remote.delete("a")
+            assert await near.get("kept") == b"local", "near copy lost during the outage"
+            stats = remote.get_stats()
+            assert stats['errors'] == 1 and stats['skipped'] >= 3 and not stats['available'], stats
+            print(f"   ✅ Stats: {stats}\n")
+        finally:
+            await remote.close()
+            await server.stop()
+    
+    asyncio.run(run())
+    print("✅ Cache backend tests PASSED!\n")
+
+
+def test_worker_metrics():
+    """Test that /metrics output covers every worker, each under its own label"""
+    print("\n" + "="*60)
+    print("🧪 TESTING WORKER METRICS")
+    print("="*60 + "\n")
+    
+    def worker_registry(commands: int) -> MetricsRegistry:
+        registry = MetricsRegistry()
+        counter = registry.counter("test_commands_total", "Commands", ("intent",))
+        latency = registry.histogram("test_latency_seconds", "Latency", buckets=(0.1,))
+        for _ in range(commands):
+            counter.inc("greeting")
+            latency.observe(0.05)
+        return registry
+    
+    exchange = WorkerMetricsExchange(tempfile.mkdtemp(prefix="uva-metrics-test-"), max_age=60)
+    try:
+        # Test 1: each worker answers with all workers' samples
+        print("1. Testing scrape through either worker...")
+        first, second = worker_registry(3), worker_registry(5)
+        exchange.publish(0, first.samples('worker="0"'))
+        exchange.publish(1, second.samples('worker="1"'))
+        for slot, registry in ((0, first), (1, second)):
+            text = registry.render(f'worker="{slot}"', exchange.collect(slot))
+            assert 'test_commands_total{intent="greeting",worker="0"} 3' in text, text
+            assert 'test_commands_total{intent="greeting",worker="1"} 5' in text, text
+            assert 'test_latency_seconds_bucket{worker="1",le="0.1"} 5' in text, text
+            assert text.count("# TYPE test_commands_total counter") == 1, text
+        print("   ✅ Both workers report 3 + 5 commands\n")
+        
+        # Test 2: samples of a worker that stopped publishing are left out
+        print("2. Testing stale samples...")
+        exchange.max_age = 0
+        time.sleep(0.01)
+        text = first.render('worker="0"', exchange.collect(0))
+        assert 'worker="1"' not in text and 'worker="0"} 3' in text, text
+        print("   ✅ Stale worker dropped\n")
+    finally:
+        exchange.close()
+    assert not exchange.directory.exists()
+    print("✅ Worker metrics tests PASSED!\n")
+
+
+def test_request_log_sampling():
+    """Test that the analyzer recovers the true request mix from a sampled log"""
+    print("\n" + "="*60)
+    print("🧪 TESTING REQUEST LOG SAMPLING")
+    print("="*60 + "\n")
+    
+    class _Capture:
+        """Stands in for the JSONL logger"""
+        def __init__(self):
+            self.entries = []
+        
+        def info(self, entry):
+            self.entries.append(entry)
+    
+    random.seed(7)
+    log = RequestLog(enabled=False, sample_rate=0.1)
+    log.enabled, log._logger = True, _Capture()
+    
+    # 900 sampled greetings, 100 always-logged unknowns and 10 errors
+    for _ in range(900):
+        log.record('ok', intent='greeting')
+    for _ in range(100):
+        log.record('ok', intent='unknown')
+    for _ in range(10):
+        log.record('error', intent='weather')
+    
+    entries = log._logger.entries
+    assert all('sample_rate' not in e for e in entries if e['intent'] != 'greeting'), "always-logged record weighted"
+    
+    analyzer = RequestLogAnalyzer()
+    for entry in entries:
+        analyzer.add(entry)
+    report = analyzer.report()
+    print(f"   Records: {report['records']}, estimated: {report['estimated_requests']}, mix: {report['intent_mix']}")
+    assert 900 <= report['estimated_requests'] <= 1120, report['estimated_requests']
+    assert 0.08 <= report['intent_mix']['unknown'] <= 0.11, report['intent_mix']
+    assert 0.008 <= report['intent_mix']['weather'] <= 0.011, report['intent_mix']
+    print("✅ Request log sampling tests PASSED!\n")
+
+
+def _passed(test) -> bool:
+    """
+    Run an assert-based test for the summary (pytest runs these directly)
+    
+    Called in a worker thread, as the tests start their own event loops.
+    """
+    try:
+        test()
+        return True
+    except AssertionError as e:
+        print(f"\n❌ {test.__name__} FAILED: {e}\n")
+        return False
+
+
 async def run_all_tests():
     """Run all tests"""
     print("\n" + "="*60)
@@ -147,8 +609,16 @@ async def run_all_tests():
     results = {
         'SpeechService': test_speech_service(),
         'IntentDetector': test_intent_detector(),
+        'IncrementalMatcher': await asyncio.to_thread(_passed, test_incremental_matcher),
         'ResponseGenerator': test_response_generator(),
-        'CommandService': await test_command_service()
+        'CommandService': await test_command_service(),
+        'TTSScheduler': await asyncio.to_thread(_passed, test_tts_scheduler),
+        'WorkerMetrics': await asyncio.to_thread(_passed, test_worker_metrics),
+        'RequestLogSampling': await asyncio.to_thread(_passed, test_request_log_sampling),
+        'SessionStore': await asyncio.to_thread(_passed, test_session_store),
+        'RateLimiter': await asyncio.to_thread(_passed, test_rate_limiter),
+        'RateLimitBehindProxy': await asyncio.to_thread(_passed, test_rate_limit_behind_proxy),
+        'CacheBackends': await asyncio.to_thread(_passed, test_cache_backends)
     }
     
     print("\n" + "="*60)
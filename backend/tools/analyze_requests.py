@@ -0,0 +1,261 @@
+"""
+Request log analyzer for Urdu Voice Assistant
+Streams JSONL request logs and prints latency percentiles and intent mix
+
+Files are read one line at a time and latencies go into fixed log-scale
+histograms (about 1% relative error), so memory use does not grow with the
+size of the input. Plain and gzip-compressed files are supported; "-"
+reads from stdin.
+
+Usage:
+    cd backend
+    python tools/analyze_requests.py logs/requests_*.jsonl
+    python tools/analyze_requests.py --intent greeting --json logs/requests_20251025.jsonl.gz
+"""
+
+import argparse
+import gzip
+import json
+import math
+import sys
+from collections import Counter
+from typing import Dict, Iterable, Iterator, List, Optional
+
+PERCENTILES = (50, 90, 95, 99)
+
+
+class LogHistogram:
+    """
+    Constant-memory latency histogram with logarithmic buckets
+
+    Bucket i covers [min_value * growth**i, min_value * growth**(i+1)),
+    so any reported percentile is within (growth - 1) of the true value.
+    """
+
+    def __init__(self, min_value: float = 0.01, max_value: float = 600000.0, growth: float = 1.01):
+        """
+        Initialize histogram
+
+        Args:
+            min_value: Smallest distinguishable value (ms)
+            max_value: Largest distinguishable value (ms)
+            growth: Ratio between consecutive bucket bounds
+        """
+        self.min_value = min_value
+        self.log_growth = math.log(growth)
+        self.buckets = [0] * (int(math.log(max_value / min_value) / self.log_growth) + 2)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, value: float):
+        """Record one value"""
+        if value <= self.min_value:
+            index = 0
+        else:
+            index = min(int(math.log(value / self.min_value) / self.log_growth) + 1, len(self.buckets) - 1)
+        self.buckets[index] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, pct: float) -> float:
+        """
+        Get an approximate percentile
+
+        Args:
+            pct: Percentile between 0 and 100
+
+        Returns:
+            Upper bound of the bucket holding the percentile (capped at the max seen)
+        """
+        if not self.count:
+            return 0.0
+        rank = max(1, math.ceil(self.count * pct / 100))
+        seen = 0
+        for index, bucket_count in enumerate(self.buckets):
+            seen += bucket_count
+            if seen >= rank:
+                upper = self.min_value * math.exp(self.log_growth * index)
+                return min(upper, self.max)
+        return self.max
+
+    def summary(self) -> Dict[str, float]:
+        """Get count, mean, percentiles and max"""
+        result = {'count': self.count, 'mean': round(self.total / self.count, 3) if self.count else 0.0}
+        for pct in PERCENTILES:
+            result[f'p{pct}'] = round(self.percentile(pct), 3)
+        result['max'] = round(self.max, 3)
+        return result
+
+
+class RequestLogAnalyzer:
+    """Aggregates request log records in a single pass"""
+
+    def __init__(self, intent: Optional[str] = None):
+        """
+        Initialize analyzer
+
+        Args:
+            intent: Only aggregate records with this intent
+        """
+        self.intent = intent
+        self.records = 0
+        self.malformed = 0
+        self.first_ts = None
+        self.last_ts = None
+        self.statuses = Counter()
+        self.intents = Counter()
+        self.cache = Counter()
+        self.languages = Counter()
+        self.stages: Dict[str, LogHistogram] = {}
+        self.intent_totals: Dict[str, LogHistogram] = {}
+        self.audio_bytes = 0
+        self.audio_records = 0
+        self.weighted = 0.0
+
+    def add(self, entry: Dict):
+        """Aggregate one parsed record"""
+        intent = entry.get('intent') or 'none'
+        if self.intent is not None and intent != self.intent:
+            return
+
+        # Sampled records stand for 1/sample_rate requests in the mix
+        sample_rate = entry.get('sample_rate') or 1.0
+        self.records += 1
+        self.weighted += 1 / sample_rate
+
+        ts = entry.get('ts')
+        if isinstance(ts, (int, float)):
+            self.first_ts = ts if self.first_ts is None else min(self.first_ts, ts)
+            self.last_ts = ts if self.last_ts is None else max(self.last_ts, ts)
+
+        self.statuses[entry.get('status', 'ok')] += 1
+        self.intents[intent] += 1 / sample_rate
+        self.cache[entry.get('cache', 'none')] += 1
+        if entry.get('lang'):
+            self.languages[entry['lang']] += 1
+
+        for stage, ms in (entry.get('ms') or {}).items():
+            if isinstance(ms, (int, float)):
+                histogram = self.stages.get(stage)
+                if histogram is None:
+                    histogram = self.stages[stage] = LogHistogram()
+                histogram.add(ms)
+
+        total = (entry.get('ms') or {}).get('total')
+        if isinstance(total, (int, float)):
+            histogram = self.intent_totals.get(intent)
+            if histogram is None:
+                histogram = self.intent_totals[intent] = LogHistogram()
+            histogram.add(total)
+
+        if entry.get('audio_bytes'):
+            self.audio_bytes += entry['audio_bytes']
+            self.audio_records += 1
+
+    def consume(self, lines: Iterable[str]):
+        """Parse and aggregate lines, counting the ones that are not valid records"""
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                self.malformed += 1
+                continue
+            if isinstance(entry, dict):
+                self.add(entry)
+            else:
+                self.malformed += 1
+
+    def report(self) -> Dict:
+        """
+        Build the analysis result
+
+        Returns:
+            Dictionary with record counts, time span, mixes and latency summaries
+        """
+        return {
+            'records': self.records,
+            'estimated_requests': round(self.weighted),
+            'malformed_lines': self.malformed,
+            'span_seconds': round(self.last_ts - self.first_ts, 3) if self.records and self.first_ts is not None else 0,
+            'status': dict(self.statuses.most_common()),
+            'intent_mix': {
+                intent: round(count / self.weighted, 4)
+                for intent, count in self.intents.most_common()
+            } if self.weighted else {},
+            'cache': dict(self.cache.most_common()),
+            'language': dict(self.languages.most_common()),
+            'latency_ms': {stage: hist.summary() for stage, hist in sorted(self.stages.items())},
+            'total_ms_by_intent': {
+                intent: hist.summary()
+                for intent, hist in sorted(self.intent_totals.items(), key=lambda item: -item[1].count)
+            },
+            'avg_audio_bytes': round(self.audio_bytes / self.audio_records) if self.audio_records else 0
+        }
+
+
+def iter_lines(paths: List[str]) -> Iterator[str]:
+    """Yield lines from plain or gzip files, or stdin for '-'"""
+    for path in paths:
+        if path == '-':
+            yield from sys.stdin
+            continue
+        opener = gzip.open if path.endswith('.gz') else open
+        with opener(path, 'rt', encoding='utf-8', errors='replace') as handle:
+            yield from handle
+
+
+def print_report(report: Dict):
+    """Print the analysis as aligned text tables"""
+    print(f"Records: {report['records']} (≈{report['estimated_requests']} requests), "
+          f"malformed lines: {report['malformed_lines']}, span: {report['span_seconds']}s")
+    print(f"Status: {report['status']}")
+    print(f"Cache: {report['cache']}")
+    print(f"Language: {report['language']}")
+    print(f"Avg audio size: {report['avg_audio_bytes']} bytes")
+
+    columns = ('count', 'mean') + tuple(f'p{pct}' for pct in PERCENTILES) + ('max',)
+    header = f"{'':22}" + "".join(f"{name:>11}" for name in columns)
+
+    print("\nLatency by stage (ms)")
+    print(header)
+    for stage, summary in report['latency_ms'].items():
+        print(f"{stage:22}" + "".join(f"{summary[name]:>11}" for name in columns))
+
+    print("\nIntent mix and total latency (ms)")
+    print(f"{'':22}{'share':>11}" + "".join(f"{name:>11}" for name in columns))
+    for intent, share in report['intent_mix'].items():
+        summary = report['total_ms_by_intent'].get(intent)
+        cells = "".join(f"{summary[name]:>11}" for name in columns) if summary else ""
+        print(f"{intent:22}{share * 100:>10.1f}%" + cells)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Summarize JSONL request logs")
+    parser.add_argument("paths", nargs='+', help="Log files (.jsonl or .jsonl.gz), '-' for stdin")
+    parser.add_argument("--intent", help="Only analyze records with this intent")
+    parser.add_argument("--json", action='store_true', help="Print the report as JSON")
+    args = parser.parse_args(argv)
+
+    analyzer = RequestLogAnalyzer(intent=args.intent)
+    try:
+        analyzer.consume(iter_lines(args.paths))
+    except OSError as e:
+        print(f"❌ Could not read log: {e}", file=sys.stderr)
+        return 1
+
+    report = analyzer.report()
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        print_report(report)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,575 @@
+"""
+Replay load tester for Urdu Voice Assistant
+Replays recorded utterances against a running server or the in-process ASGI app
+
+Utterances come from the "Processing command: '...'" lines of
+logs/assistant_*.log (written at DEBUG level), from request logs
+recorded with REQUEST_LOG_INCLUDE_TEXT=true (logs/requests_*.jsonl), or
+from any JSONL corpus with one object per line:
+
+    {"text": "السلام علیکم", "user_id": "u1", "endpoint": "process-command", "language": "auto"}
+
+("endpoint" is one of process-command, test-speech, stream-speech; only
+"text" is required.)
+
+Requests are sent with asyncio either closed-loop (--concurrency workers
+back to back) or open-loop (--rate arrivals per second, Poisson, capped at
+--concurrency in flight). In open-loop mode latency is measured from the
+scheduled arrival time, so time spent waiting for a free slot counts.
+
+In-process runs force the offline TTS backend (silent audio, no network)
+so results are reproducible; start a server under test with
+TTS_BACKEND=offline for the same reason.
+
+Usage:
+    cd backend
+    python tools/replay_load.py --in-process --corpus logs/requests_*.jsonl --requests 2000 --concurrency 32
+    python tools/replay_load.py --url http://localhost:8000 --corpus corpus.jsonl --rate 50 --duration 60
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import ssl
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlencode, urlsplit, quote
+
+from analyze_requests import LogHistogram, PERCENTILES
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+API_PREFIX = "/api/v1"
+
+ENDPOINTS = ('process-command', 'test-speech', 'stream-speech')
+
+# Command lines written by CommandService ("⚡ Processing command: '...' (user: ...)")
+_LOG_COMMAND = re.compile(r"Processing command: '(?P<text>.*)' \(user: (?P<user>[^)]*)\)\s*$")
+
+# Built-in utterances used when no corpus is given
+DEFAULT_UTTERANCES = [
+    "السلام علیکم",
+    "آپ کیسے ہیں؟",
+    "وقت کیا ہوا ہے؟",
+    "آج کون سی تاریخ ہے؟",
+    "موسم کیسا ہے؟",
+    "کوئی لطیفہ سناؤ",
+    "شکریہ",
+    "مدد",
+    "اللہ حافظ",
+]
+
+
+# ============================================================================
+# CORPUS
+# ============================================================================
+
+def load_corpus(paths: Iterable[str], endpoint: str = 'process-command') -> List[Dict]:
+    """
+    Load utterances from assistant logs and/or JSONL corpus files
+
+    Args:
+        paths: Log (.log) or corpus (.jsonl) files
+        endpoint: Endpoint for entries that do not name one
+
+    Returns:
+        List of entries with text, user_id, language and endpoint
+    """
+    corpus = []
+    for path in paths:
+        with open(path, 'r', encoding='utf-8', errors='replace') as handle:
+            if path.endswith('.jsonl'):
+                for line in handle:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        item = json.loads(line)
+                    except ValueError:
+                        continue
+                    if isinstance(item, dict) and item.get('text'):
+                        corpus.append({
+                            'text': item['text'],
+                            'user_id': item.get('user_id') or item.get('user'),
+                            'language': item.get('language', 'auto'),
+                            'endpoint': item.get('endpoint', endpoint)
+                        })
+            else:
+                for line in handle:
+                    match = _LOG_COMMAND.search(line)
+                    if match:
+                        user = match.group('user')
+                        corpus.append({
+                            'text': match.group('text'),
+                            'user_id': None if user == 'anonymous' else user,
+                            'language': 'auto',
+                            'endpoint': endpoint
+                        })
+    return corpus
+
+
+def build_request(entry: Dict) -> Tuple[str, str, str, bytes, str]:
+    """
+    Turn a corpus entry into an HTTP request
+
+    Returns:
+        (endpoint label, method, path, body, query string)
+    """
+    endpoint = entry['endpoint'] if entry['endpoint'] in ENDPOINTS else 'process-command'
+    if endpoint == 'process-command':
+        body = json.dumps({
+            'text': entry['text'],
+            'user_id': entry.get('user_id'),
+            'language': entry.get('language', 'auto')
+        }, ensure_ascii=False).encode('utf-8')
+        return endpoint, 'POST', f"{API_PREFIX}/process-command", body, ''
+
+    lang = entry.get('language') if entry.get('language') in ('ur', 'en') else 'ur'
+    query = urlencode({'text': entry['text'], 'lang': lang})
+    method = 'POST' if endpoint == 'test-speech' else 'GET'
+    return endpoint, method, f"{API_PREFIX}/{endpoint}", b'', query
+
+
+# ============================================================================
+# CLIENTS
+# ============================================================================
+
+class ASGIClient:
+    """Calls an ASGI app directly, including its lifespan startup and shutdown"""
+
+    def __init__(self, app):
+        self.app = app
+        self._lifespan_task = None
+        self._to_app: Optional[asyncio.Queue] = None
+        self._from_app: Optional[asyncio.Queue] = None
+
+    async def startup(self):
+        """Run the app's lifespan startup"""
+        self._to_app = asyncio.Queue()
+        self._from_app = asyncio.Queue()
+        scope = {'type': 'lifespan', 'asgi': {'version': '3.0'}, 'state': {}}
+        self._lifespan_task = asyncio.create_task(
+            self.app(scope, self._to_app.get, self._from_app.put)
+        )
+        await self._to_app.put({'type': 'lifespan.startup'})
+        message = await self._from_app.get()
+        if message['type'] != 'lifespan.startup.complete':
+            raise RuntimeError(f"App startup failed: {message.get('message')}")
+
+    async def shutdown(self):
+        """Run the app's lifespan shutdown"""
+        if self._lifespan_task is None:
+            return
+        await self._to_app.put({'type': 'lifespan.shutdown'})
+        await self._from_app.get()
+        await self._lifespan_task
+
+    async def request(self, method: str, path: str, query: str = '', body: bytes = b'') -> Tuple[int, bytes]:
+        """
+        Send one request through the app
+
+        Returns:
+            (status code, response body)
+        """
+        scope = {
+            'type': 'http',
+            'asgi': {'version': '3.0'},
+            'http_version': '1.1',
+            'method': method,
+            'scheme': 'http',
+            'path': path,
+            'raw_path': quote(path).encode('ascii'),
+            'query_string': query.encode('ascii'),
+            'root_path': '',
+            'headers': [
+                (b'host', b'loadtest'),
+                (b'content-type', b'application/json'),
+                (b'content-length', str(len(body)).encode('ascii')),
+            ],
+            'client': ('127.0.0.1', 0),
+            'server': ('loadtest', 80),
+        }
+        finished = asyncio.Event()
+        request_sent = False
+        status = 0
+        chunks = []
+
+        async def receive():
+            nonlocal request_sent
+            if not request_sent:
+                request_sent = True
+                return {'type': 'http.request', 'body': body, 'more_body': False}
+            # Streaming responses listen for disconnects until they finish
+            await finished.wait()
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            elif message['type'] == 'http.response.body':
+                chunks.append(message.get('body', b''))
+                if not message.get('more_body', False):
+                    finished.set()
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            finished.set()
+        return status, b''.join(chunks)
+
+
+class HTTPClient:
+    """
+    Minimal asyncio HTTP/1.1 client with keep-alive connection reuse
+
+    Kept dependency-free on purpose; it understands Content-Length, chunked
+    and read-until-close bodies, which covers FastAPI/uvicorn responses.
+    """
+
+    def __init__(self, base_url: str):
+        parts = urlsplit(base_url)
+        if parts.scheme not in ('http', 'https'):
+            raise ValueError(f"Unsupported URL scheme: {parts.scheme}")
+        self.host = parts.hostname or 'localhost'
+        self.port = parts.port or (443 if parts.scheme == 'https' else 80)
+        self.ssl = ssl.create_default_context() if parts.scheme == 'https' else None
+        self.base_path = parts.path.rstrip('/')
+        self._idle: List[Tuple[asyncio.StreamReader, asyncio.StreamWriter]] = []
+
+    async def startup(self):
+        pass
+
+    async def shutdown(self):
+        """Close idle keep-alive connections"""
+        while self._idle:
+            _, writer = self._idle.pop()
+            writer.close()
+
+    async def request(self, method: str, path: str, query: str = '', body: bytes = b'') -> Tuple[int, bytes]:
+        """
+        Send one request, reusing an idle connection when there is one
+
+        A reused connection the server already closed is retried once on a
+        fresh connection.
+
+        Returns:
+            (status code, response body)
+        """
+        target = quote(self.base_path + path) + (f"?{query}" if query else '')
+        head = (
+            f"{method} {target} HTTP/1.1\r\n"
+            f"Host: {self.host}:{self.port}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: keep-alive\r\n\r\n"
+        ).encode('ascii')
+
+        for attempt in range(2):
+            reused = bool(self._idle)
+            if reused:
+                reader, writer = self._idle.pop()
+            else:
+                reader, writer = await asyncio.open_connection(self.host, self.port, ssl=self.ssl)
+            try:
+                writer.write(head + body)
+                await writer.drain()
+                status, payload, keep_alive = await self._read_response(reader)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                writer.close()
+                if reused and attempt == 0:
+                    continue
+                raise
+            except BaseException:
+                writer.close()
+                raise
+            if keep_alive:
+                self._idle.append((reader, writer))
+            else:
+                writer.close()
+            return status, payload
+        raise ConnectionError("Connection closed by server")
+
+    @staticmethod
+    async def _read_response(reader: asyncio.StreamReader) -> Tuple[int, bytes, bool]:
+        """Read status line, headers and body"""
+        status_line = await reader.readuntil(b'\r\n')
+        status = int(status_line.split(b' ', 2)[1])
+
+        headers = {}
+        while True:
+            line = await reader.readuntil(b'\r\n')
+            if line == b'\r\n':
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        keep_alive = headers.get('connection', '').lower() != 'close'
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            chunks = []
+            while True:
+                size = int((await reader.readuntil(b'\r\n')).split(b';')[0], 16)
+                if size == 0:
+                    await reader.readuntil(b'\r\n')
+                    break
+                chunks.append(await reader.readexactly(size))
+                await reader.readexactly(2)
+            payload = b''.join(chunks)
+        elif 'content-length' in headers:
+            payload = await reader.readexactly(int(headers['content-length']))
+        else:
+            payload = await reader.read()
+            keep_alive = False
+        return status, payload, keep_alive
+
+
+# ============================================================================
+# LOAD GENERATION
+# ============================================================================
+
+class EndpointStats:
+    """Latency histogram and outcome counts for one endpoint"""
+
+    def __init__(self):
+        self.latency = LogHistogram()
+        self.outcomes = Counter()
+        self.errors = 0
+        self.bytes = 0
+
+    def add(self, latency_ms: float, outcome: str, size: int = 0):
+        self.latency.add(latency_ms)
+        self.outcomes[outcome] += 1
+        if not outcome.startswith('2'):
+            self.errors += 1
+        self.bytes += size
+
+
+class LoadRunner:
+    """Sends corpus requests through a client and collects per-endpoint stats"""
+
+    def __init__(self, client, corpus: List[Dict], concurrency: int, fetch_audio: bool = False):
+        """
+        Initialize runner
+
+        Args:
+            client: ASGIClient or HTTPClient
+            corpus: Entries from load_corpus()
+            concurrency: Maximum requests in flight
+            fetch_audio: Also download the audio file of each process-command response
+        """
+        self.client = client
+        self.corpus = corpus
+        self.concurrency = concurrency
+        self.fetch_audio = fetch_audio
+        self.stats: Dict[str, EndpointStats] = {}
+        self.elapsed = 0.0
+
+    def _stats_for(self, endpoint: str) -> EndpointStats:
+        stats = self.stats.get(endpoint)
+        if stats is None:
+            stats = self.stats[endpoint] = EndpointStats()
+        return stats
+
+    async def _send(self, entry: Dict, started: Optional[float] = None):
+        """Send one corpus entry (and optionally its audio fetch), recording the outcome"""
+        endpoint, method, path, body, query = build_request(entry)
+        if started is None:
+            started = time.perf_counter()
+        try:
+            status, payload = await self.client.request(method, path, query, body)
+            outcome = str(status)
+        except Exception as e:
+            status, payload, outcome = 0, b'', type(e).__name__
+        self._stats_for(endpoint).add((time.perf_counter() - started) * 1000, outcome, len(payload))
+
+        if self.fetch_audio and endpoint == 'process-command' and status == 200:
+            try:
+                audio_file = json.loads(payload).get('audio_file')
+            except ValueError:
+                audio_file = None
+            if audio_file:
+                fetch_started = time.perf_counter()
+                try:
+                    status, payload = await self.client.request('GET', f"{API_PREFIX}/audio/{audio_file}")
+                    outcome = str(status)
+                except Exception as e:
+                    payload, outcome = b'', type(e).__name__
+                self._stats_for('audio').add((time.perf_counter() - fetch_started) * 1000, outcome, len(payload))
+
+    async def run_closed(self, requests: int, duration: float):
+        """
+        Closed loop: `concurrency` workers send requests back to back
+
+        Args:
+            requests: Total requests (0 = no limit)
+            duration: Stop after this many seconds (0 = no limit)
+        """
+        counter = iter(range(requests) if requests else iter(int, 1))
+        deadline = time.perf_counter() + duration if duration else None
+
+        async def worker(offset: int):
+            for index in counter:
+                if deadline is not None and time.perf_counter() >= deadline:
+                    return
+                await self._send(self.corpus[(index + offset) % len(self.corpus)])
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(0) for _ in range(self.concurrency)))
+        self.elapsed = time.perf_counter() - started
+
+    async def run_open(self, requests: int, duration: float, rate: float, seed: int):
+        """
+        Open loop: Poisson arrivals at `rate` per second, at most `concurrency` in flight
+
+        Args:
+            requests: Total requests (0 = no limit)
+            duration: Stop scheduling after this many seconds (0 = no limit)
+            rate: Mean arrivals per second
+            seed: Random seed for inter-arrival times
+        """
+        rng = random.Random(seed)
+        slots = asyncio.Semaphore(self.concurrency)
+        tasks = []
+
+        async def arrival(entry: Dict, scheduled: float):
+            async with slots:
+                await self._send(entry, started=scheduled)
+
+        started = time.perf_counter()
+        next_at = started
+        index = 0
+        while (not requests or index < requests) and (not duration or next_at - started < duration):
+            delay = next_at - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(arrival(self.corpus[index % len(self.corpus)], next_at)))
+            index += 1
+            next_at += rng.expovariate(rate)
+
+        await asyncio.gather(*tasks)
+        self.elapsed = time.perf_counter() - started
+
+    def report(self) -> Dict:
+        """
+        Build per-endpoint results
+
+        Returns:
+            Dictionary with elapsed time and, per endpoint, throughput,
+            error rate, outcome counts and latency summary in ms
+        """
+        endpoints = {}
+        for endpoint, stats in sorted(self.stats.items()):
+            count = stats.latency.count
+            endpoints[endpoint] = {
+                'requests': count,
+                'throughput_rps': round(count / self.elapsed, 2) if self.elapsed else 0.0,
+                'error_rate': round(stats.errors / count, 4) if count else 0.0,
+                'outcomes': dict(stats.outcomes.most_common()),
+                'avg_bytes': round(stats.bytes / count) if count else 0,
+                'latency_ms': stats.latency.summary()
+            }
+        return {'elapsed_seconds': round(self.elapsed, 3), 'endpoints': endpoints}
+
+
+def print_report(report: Dict, backend: Optional[str]):
+    """Print results as an aligned table"""
+    print(f"Elapsed: {report['elapsed_seconds']}s, TTS backend: {backend or 'unknown'}")
+    columns = ('mean',) + tuple(f'p{pct}' for pct in PERCENTILES) + ('max',)
+    print(f"{'':18}{'requests':>10}{'rps':>10}{'errors':>9}" + "".join(f"{name:>10}" for name in columns))
+    for endpoint, result in report['endpoints'].items():
+        latency = result['latency_ms']
+        print(
+            f"{endpoint:18}{result['requests']:>10}{result['throughput_rps']:>10}"
+            f"{result['error_rate'] * 100:>8.1f}%" + "".join(f"{latency[name]:>10}" for name in columns)
+        )
+    for endpoint, result in report['endpoints'].items():
+        print(f"  {endpoint} outcomes: {result['outcomes']}")
+
+
+async def _server_backend(client) -> Optional[str]:
+    """Ask the target which TTS backend it uses"""
+    try:
+        status, payload = await client.request('GET', f"{API_PREFIX}/stats")
+        if status == 200:
+            return json.loads(payload).get('service_status', {}).get('tts_backend')
+    except Exception:
+        pass
+    return None
+
+
+async def run(args) -> Dict:
+    """Set up the client, run the load and return the report"""
+    corpus = load_corpus(args.corpus, args.endpoint) if args.corpus else [
+        {'text': text, 'user_id': None, 'language': 'auto', 'endpoint': args.endpoint}
+        for text in DEFAULT_UTTERANCES
+    ]
+    if not corpus:
+        raise SystemExit("❌ No utterances found in corpus")
+    if args.shuffle:
+        random.Random(args.seed).shuffle(corpus)
+
+    if args.in_process:
+        # Config is read at import time, so the backend must be chosen first
+        os.environ.setdefault("TTS_BACKEND", "offline")
+        sys.path.insert(0, str(BACKEND_DIR))
+        from main import app
+        client = ASGIClient(app)
+    else:
+        client = HTTPClient(args.url)
+
+    await client.startup()
+    try:
+        backend = await _server_backend(client)
+        if backend not in (None, 'offline'):
+            print(f"⚠️ Target uses the '{backend}' TTS backend; results depend on the network",
+                  file=sys.stderr)
+
+        runner = LoadRunner(client, corpus, args.concurrency, fetch_audio=args.fetch_audio)
+        if args.rate > 0:
+            await runner.run_open(args.requests, args.duration, args.rate, args.seed)
+        else:
+            await runner.run_closed(args.requests, args.duration)
+        report = runner.report()
+        report['tts_backend'] = backend
+        report['corpus_size'] = len(corpus)
+        return report
+    finally:
+        await client.shutdown()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Replay recorded utterances as load")
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--url", default="http://localhost:8000", help="Server base URL")
+    target.add_argument("--in-process", action='store_true', help="Drive the ASGI app in this process")
+    parser.add_argument("--corpus", nargs='*', default=[], help="assistant_*.log and/or .jsonl corpus files")
+    parser.add_argument("--endpoint", choices=ENDPOINTS, default='process-command',
+                        help="Endpoint for log lines and corpus entries without one")
+    parser.add_argument("--requests", type=int, default=1000, help="Total requests (0 = until --duration)")
+    parser.add_argument("--duration", type=float, default=0, help="Stop after N seconds (0 = until --requests)")
+    parser.add_argument("--concurrency", type=int, default=16, help="Maximum requests in flight")
+    parser.add_argument("--rate", type=float, default=0, help="Open-loop arrivals per second (0 = closed loop)")
+    parser.add_argument("--seed", type=int, default=1, help="Seed for shuffling and arrival times")
+    parser.add_argument("--shuffle", action='store_true', help="Shuffle the corpus before replaying")
+    parser.add_argument("--fetch-audio", action='store_true', help="Also download each response's audio file")
+    parser.add_argument("--json", action='store_true', help="Print the report as JSON")
+    args = parser.parse_args(argv)
+
+    if not args.requests and not args.duration:
+        parser.error("one of --requests or --duration must be non-zero")
+
+    report = asyncio.run(run(args))
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        print_report(report, report['tts_backend'])
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
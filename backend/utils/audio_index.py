@@ -0,0 +1,353 @@
+"""
+Audio store index for Urdu Voice Assistant
+Keeps the file count, total size and eviction order of the audio directory
+in a SQLite database shared by every worker process on the host
+
+The directory is scanned once at startup (and reconciled with the index).
+After that every file a worker writes or serves is recorded as it happens,
+so all workers see one least-recently-used order and the same cache.
+
+Cross-process coordination:
+- The database runs in WAL mode: readers never block the writer.
+- Synthesis of a file is serialized with synthesis_lock() (flock on one of
+  a fixed set of lock files), so when several workers need the same
+  sentence one synthesizes and the others wait and reuse the file.
+- Eviction has a single owner at a time (a non-blocking flock); other
+  workers skip their pass while one is running. Files used within the
+  grace period are never evicted, so a file is not deleted while it is
+  being served.
+
+On platforms without fcntl (Windows, where serve.py runs one process) the
+locks are no-ops.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+import sys
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from config import AUDIO_EVICTION_GRACE_SECONDS, SYNTHESIS_LOCK_TIMEOUT_SECONDS
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+LOCK_DIR_NAME = ".locks"
+# Unrelated files share a lock file only when their hashes collide
+LOCK_STRIPES = 256
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    name TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS files_by_use ON files (used);
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO counters (name, value)
+VALUES ('files', 0), ('total_bytes', 0), ('generated', 0), ('evicted', 0);
+"""
+
+
+def _lock_dir(directory: Path) -> Path:
+    lock_dir = Path(directory) / LOCK_DIR_NAME
+    lock_dir.mkdir(exist_ok=True)
+    return lock_dir
+
+
+@contextmanager
+def _flock(path: Path, blocking: bool = True, timeout: Optional[float] = None) -> Iterator[bool]:
+    """
+    Hold an exclusive flock on a file
+
+    Args:
+        path: Lock file (created if missing)
+        blocking: Wait for the lock instead of giving up at once
+        timeout: Seconds to wait when blocking (None waits forever)
+
+    Yields:
+        True if the lock is held, False if it could not be taken
+    """
+    if fcntl is None:
+        yield True
+        return
+
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        acquired = False
+        if blocking and timeout is None:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            acquired = True
+        else:
+            deadline = time.monotonic() + (timeout or 0)
+            while True:
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    acquired = True
+                    break
+                except BlockingIOError:
+                    if not blocking or time.monotonic() >= deadline:
+                        break
+                    time.sleep(0.02)
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+    finally:
+        os.close(fd)
+
+
+@contextmanager
+def synthesis_lock(directory: Path, filename: str, timeout: float = SYNTHESIS_LOCK_TIMEOUT_SECONDS) -> Iterator[bool]:
+    """
+    Serialize synthesis of one audio file across processes and threads
+
+    Check whether the file exists again once the lock is held: another
+    worker may have written it while this one waited.
+
+    Args:
+        directory: Audio store directory
+        filename: Audio file about to be written
+        timeout: Seconds to wait for another writer before going ahead anyway
+            (files are renamed into place, so a duplicate write is harmless)
+
+    Yields:
+        True if the lock is held, False if the wait timed out
+
+    Example:
+        >>> with synthesis_lock(AUDIO_OUTPUT_DIR, filename):
+        ...     if not (AUDIO_OUTPUT_DIR / filename).exists():
+        ...         synthesize(...)
+    """
+    stripe = zlib.crc32(filename.encode('utf-8')) % LOCK_STRIPES
+    path = _lock_dir(directory) / f"synth-{stripe:03d}.lock"
+    with _flock(path, blocking=True, timeout=timeout) as acquired:
+        if not acquired:
+            logger.warning(f"⚠️ Waited {timeout:.0f}s for another synthesis of {filename}; writing anyway")
+        yield acquired
+
+
+class AudioIndex:
+    """SQLite index of the audio files in one directory, shared across processes"""
+
+    def __init__(
+        self,
+        directory: Path,
+        extension: str = ".mp3",
+        db_path: Optional[Path] = None,
+        grace_seconds: float = AUDIO_EVICTION_GRACE_SECONDS
+    ):
+        """
+        Initialize index and reconcile it with the directory
+
+        Args:
+            directory: Audio store directory
+            extension: File extension to index
+            db_path: Index database (default: .audio_index.db in the directory)
+            grace_seconds: Files used within this many seconds are never evicted
+        """
+        self.directory = Path(directory)
+        self.extension = extension
+        self.db_path = Path(db_path) if db_path else self.directory / ".audio_index.db"
+        self.grace_seconds = grace_seconds
+        # One connection per thread, reopened in forked children
+        self._local = threading.local()
+
+        with self._lock('index'):
+            db = self._connect()
+            db.executescript(_SCHEMA)
+        self.rescan()
+
+    def _connect(self) -> sqlite3.Connection:
+        """This thread's connection to the index"""
+        db = getattr(self._local, 'db', None)
+        if db is None or self._local.pid != os.getpid():
+            db = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+            self._local.pid = os.getpid()
+        return db
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        """Write transaction that takes the database write lock up front"""
+        db = self._connect()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            yield db
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        db.execute("COMMIT")
+
+    def _lock(self, name: str, blocking: bool = True):
+        """Process-wide lock named after an index operation"""
+        return _flock(_lock_dir(self.directory) / f"{name}.lock", blocking=blocking)
+
+    @staticmethod
+    def _add_counters(db: sqlite3.Connection, **deltas: int):
+        for name, delta in deltas.items():
+            if delta:
+                db.execute("UPDATE counters SET value = value + ? WHERE name = ?", (delta, name))
+
+    def _counters(self) -> Dict[str, int]:
+        return dict(self._connect().execute("SELECT name, value FROM counters"))
+
+    def rescan(self):
+        """
+        Reconcile the index with the directory
+
+        Files missing from the index are added (ordered by modification
+        time), rows of deleted files are dropped and the totals recomputed.
+        Known files keep their recorded last use.
+        """
+        on_disk = {}
+        try:
+            with os.scandir(self.directory) as scan:
+                for entry in scan:
+                    if not entry.name.endswith(self.extension):
+                        continue
+                    try:
+                        stat = entry.stat()
+                    except OSError:
+                        continue
+                    on_disk[entry.name] = (stat.st_size, stat.st_mtime)
+        except FileNotFoundError:
+            pass
+
+        # Workers starting together would otherwise reconcile on top of each other
+        with self._lock('index'), self._transaction() as db:
+            indexed = {name for (name,) in db.execute("SELECT name FROM files")}
+            db.executemany(
+                "DELETE FROM files WHERE name = ?",
+                [(name,) for name in indexed - on_disk.keys()]
+            )
+            db.executemany(
+                "INSERT INTO files (name, size, used) VALUES (?, ?, ?)",
+                [(name, size, mtime) for name, (size, mtime) in on_disk.items() if name not in indexed]
+            )
+            files, total = db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM files").fetchone()
+            db.execute("UPDATE counters SET value = ? WHERE name = 'files'", (files,))
+            db.execute("UPDATE counters SET value = ? WHERE name = 'total_bytes'", (total,))
+        logger.info(f"🗂️ Audio index: {files} files, {total / (1024 * 1024):.2f} MB")
+
+    def record(self, filename: str) -> bool:
+        """
+        Record that a file was written or served
+
+        A file seen for the first time is counted as generated; a known
+        file only gets its last use updated.
+
+        Args:
+            filename: Audio file name inside the directory
+
+        Returns:
+            True if the file was new to the index
+        """
+        now = time.time()
+        db = self._connect()
+        if db.execute("UPDATE files SET used = ? WHERE name = ?", (now, filename)).rowcount:
+            return False
+
+        try:
+            size = (self.directory / filename).stat().st_size
+        except OSError:
+            return False
+
+        with self._transaction() as db:
+            inserted = db.execute(
+                "INSERT OR IGNORE INTO files (name, size, used) VALUES (?, ?, ?)",
+                (filename, size, now)
+            ).rowcount
+            if not inserted:
+                # Another worker recorded it in between
+                db.execute("UPDATE files SET used = ? WHERE name = ?", (now, filename))
+                return False
+            self._add_counters(db, files=1, total_bytes=size, generated=1)
+        return True
+
+    def evict(self, max_files: int) -> List[str]:
+        """
+        Delete least recently used files until at most max_files remain
+
+        Only one process evicts at a time; while another one is evicting
+        this call returns at once. Files used within the grace period are
+        kept even if that leaves more than max_files.
+
+        Args:
+            max_files: Maximum number of audio files to keep
+
+        Returns:
+            Names of the deleted files
+        """
+        if len(self) <= max_files:
+            return []
+
+        with self._lock('evict', blocking=False) as owner:
+            if not owner:
+                return []
+
+            with self._transaction() as db:
+                files = db.execute("SELECT value FROM counters WHERE name = 'files'").fetchone()[0]
+                excess = files - max_files
+                if excess <= 0:
+                    return []
+                victims = db.execute(
+                    "SELECT name, size FROM files WHERE used < ? ORDER BY used LIMIT ?",
+                    (time.time() - self.grace_seconds, excess)
+                ).fetchall()
+                db.executemany("DELETE FROM files WHERE name = ?", [(name,) for name, _ in victims])
+                self._add_counters(
+                    db,
+                    files=-len(victims),
+                    total_bytes=-sum(size for _, size in victims),
+                    evicted=len(victims)
+                )
+
+            for name, _ in victims:
+                try:
+                    (self.directory / name).unlink(missing_ok=True)
+                    logger.debug(f"Deleted old file: {name}")
+                except OSError as e:
+                    logger.error(f"Failed to delete file {name}: {e}")
+        return [name for name, _ in victims]
+
+    def __len__(self) -> int:
+        return self._connect().execute("SELECT value FROM counters WHERE name = 'files'").fetchone()[0]
+
+    @property
+    def total_bytes(self) -> int:
+        return self._connect().execute("SELECT value FROM counters WHERE name = 'total_bytes'").fetchone()[0]
+
+    def get_stats(self) -> Dict:
+        """
+        Get audio store counters (one indexed read, no directory scan)
+
+        Counts are shared by all workers; generated and evicted accumulate
+        over the lifetime of the index file.
+
+        Returns:
+            Dictionary with file count, total size, files generated and evicted
+        """
+        counters = self._counters()
+        return {
+            'files': counters['files'],
+            'total_bytes': counters['total_bytes'],
+            'generated': counters['generated'],
+            'evicted': counters['evicted']
+        }
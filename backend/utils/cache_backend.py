@@ -0,0 +1,487 @@
+"""
+Cache backends for Urdu Voice Assistant
+One async key-value interface over an in-process store or a Redis server
+
+CommandService caches intent detection results and synthesized audio
+segments through this interface. With the in-process backend every
+process has its own cache. With a Redis protocol server (CACHE_BACKEND_URL
+redis://...) every node shares one: a sentence synthesized on one node is
+fetched by the others instead of being synthesized again.
+
+Backends:
+- InProcessCache: LRU dict bounded by entries and bytes
+- RedisCache: small RESP client with a connection pool; bulk reads are
+  one MGET and bulk writes one pipelined round trip
+- NearCache: an InProcessCache with a short TTL in front of a remote
+  backend, so hot keys cost no round trip
+
+Keys are content-addressed (hashes of the text, pattern fingerprint or
+audio file name), so near-cache entries never go stale in a harmful way.
+Cache failures and timeouts are counted and treated as misses; they never
+fail a request. After a connection failure or timeout RedisCache stops
+calling the server for CACHE_RETRY_SECONDS, so an outage costs one timeout
+per interval rather than one per call.
+"""
+
+import asyncio
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+from urllib.parse import urlparse
+import sys
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from config import (
+    CACHE_BACKEND_URL,
+    CACHE_KEY_PREFIX,
+    CACHE_TIMEOUT_SECONDS,
+    CACHE_RETRY_SECONDS,
+    CACHE_POOL_SIZE,
+    CACHE_MEMORY_MAX_ENTRIES,
+    CACHE_MEMORY_MAX_BYTES,
+    CACHE_NEAR_TTL_SECONDS
+)
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Log cache server failures at most this often
+_ERROR_LOG_INTERVAL_SECONDS = 30
+
+
+class CacheBackend(ABC):
+    """Async byte-string key-value cache"""
+
+    # True when other processes and nodes see the same entries
+    shared = False
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[bytes]:
+        """Get a value, or None on a miss"""
+
+    @abstractmethod
+    async def get_many(self, keys: Sequence[str]) -> Dict[str, bytes]:
+        """Get several values at once; missing keys are left out"""
+
+    @abstractmethod
+    async def set(self, key: str, value: bytes, ttl: Optional[float] = None):
+        """Store a value, expiring after ttl seconds (None keeps it until evicted)"""
+
+    async def set_many(self, items: Dict[str, bytes], ttl: Optional[float] = None):
+        """Store several values with the same ttl"""
+        for key, value in items.items():
+            await self.set(key, value, ttl)
+
+    @abstractmethod
+    async def delete(self, key: str):
+        """Remove a value"""
+
+    async def close(self):
+        """Release connections"""
+
+    @abstractmethod
+    def get_stats(self) -> Dict:
+        """Get hit, miss and size counters"""
+
+
+class InProcessCache(CacheBackend):
+    """LRU cache in this process, bounded by entry count and total bytes"""
+
+    def __init__(self, max_entries: int = CACHE_MEMORY_MAX_ENTRIES, max_bytes: int = CACHE_MEMORY_MAX_BYTES):
+        """
+        Initialize in-process cache
+
+        Args:
+            max_entries: Maximum number of entries
+            max_bytes: Maximum total size of the values
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, Tuple[bytes, float]]" = OrderedDict()  # key -> (value, expires)
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evicted = 0
+
+    def get_local(self, key: str) -> Optional[bytes]:
+        """Synchronous get (the async methods only wrap this)"""
+        entry = self._entries.get(key)
+        if entry is None:
+            self._misses += 1
+            return None
+        value, expires = entry
+        if expires and expires < time.monotonic():
+            self.delete_local(key)
+            self._misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self._hits += 1
+        return value
+
+    def set_local(self, key: str, value: bytes, ttl: Optional[float] = None):
+        """Synchronous set"""
+        if len(value) > self.max_bytes:
+            return
+        self.delete_local(key)
+        self._entries[key] = (value, time.monotonic() + ttl if ttl else 0.0)
+        self._bytes += len(value)
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            _, (old, _) = self._entries.popitem(last=False)
+            self._bytes -= len(old)
+            self._evicted += 1
+
+    def delete_local(self, key: str):
+        """Synchronous delete"""
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= len(entry[0])
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return self.get_local(key)
+
+    async def get_many(self, keys: Sequence[str]) -> Dict[str, bytes]:
+        found = {}
+        for key in keys:
+            value = self.get_local(key)
+            if value is not None:
+                found[key] = value
+        return found
+
+    async def set(self, key: str, value: bytes, ttl: Optional[float] = None):
+        self.set_local(key, value, ttl)
+
+    async def delete(self, key: str):
+        self.delete_local(key)
+
+    def get_stats(self) -> Dict:
+        return {
+            'backend': 'memory',
+            'entries': len(self._entries),
+            'bytes': self._bytes,
+            'hits': self._hits,
+            'misses': self._misses,
+            'evicted': self._evicted
+        }
+
+
+class RespError(Exception):
+    """Error reply from the cache server"""
+
+
+def _encode(args: Sequence) -> bytes:
+    """Encode one command as a RESP array of bulk strings"""
+    parts = [b'*%d\r\n' % len(args)]
+    for arg in args:
+        if not isinstance(arg, bytes):
+            arg = str(arg).encode('utf-8')
+        parts.append(b'$%d\r\n%s\r\n' % (len(arg), arg))
+    return b''.join(parts)
+
+
+async def _read_reply(reader: asyncio.StreamReader):
+    """Read one RESP reply"""
+    line = await reader.readline()
+    if not line.endswith(b'\r\n'):
+        raise ConnectionError("Cache server closed the connection")
+    kind, payload = line[:1], line[1:-2]
+    if kind == b'+':
+        return payload
+    if kind == b'-':
+        raise RespError(payload.decode('utf-8', 'replace'))
+    if kind == b':':
+        return int(payload)
+    if kind == b'$':
+        length = int(payload)
+        if length < 0:
+            return None
+        return (await reader.readexactly(length + 2))[:-2]
+    if kind == b'*':
+        count = int(payload)
+        if count < 0:
+            return None
+        return [await _read_reply(reader) for _ in range(count)]
+    raise ConnectionError(f"Unexpected reply from cache server: {line[:20]!r}")
+
+
+class RedisCache(CacheBackend):
+    """Cache on a Redis protocol server, shared by every process and node using it"""
+
+    shared = True
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 6379,
+        db: int = 0,
+        password: Optional[str] = None,
+        prefix: str = CACHE_KEY_PREFIX,
+        pool_size: int = CACHE_POOL_SIZE,
+        timeout: float = CACHE_TIMEOUT_SECONDS,
+        retry_interval: float = CACHE_RETRY_SECONDS
+    ):
+        """
+        Initialize client (connections are opened on first use)
+
+        Args:
+            host: Server host
+            port: Server port
+            db: Database number
+            password: AUTH password, if the server requires one
+            prefix: Prepended to every key
+            pool_size: Maximum open connections
+            timeout: Seconds a call may take before it counts as a miss
+            retry_interval: Seconds calls are skipped after the server fails
+        """
+        self.host = host
+        self.port = port
+        self.db = db
+        self.password = password
+        self.prefix = prefix
+        self.pool_size = max(1, pool_size)
+        self.timeout = timeout
+        self.retry_interval = retry_interval
+        self._idle: List[Tuple[asyncio.StreamReader, asyncio.StreamWriter]] = []
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._hits = 0
+        self._misses = 0
+        self._errors = 0
+        self._round_trips = 0
+        self._skipped = 0
+        self._down_until = 0.0  # Calls are skipped until then (monotonic time)
+        self._last_error_log = 0.0
+
+    async def _open(self) -> Tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        setup = []
+        if self.password:
+            setup.append(('AUTH', self.password))
+        if self.db:
+            setup.append(('SELECT', self.db))
+        if setup:
+            try:
+                await self._round_trip(reader, writer, setup)
+            except BaseException:
+                writer.close()
+                raise
+        return reader, writer
+
+    async def _round_trip(self, reader, writer, commands: Sequence[Sequence]) -> List:
+        """Send all commands in one write, then read one reply per command"""
+        writer.write(b''.join(_encode(command) for command in commands))
+        await writer.drain()
+        self._round_trips += 1
+        replies = []
+        error = None
+        for _ in commands:
+            try:
+                replies.append(await _read_reply(reader))
+            except RespError as e:
+                # Keep reading so the connection stays in sync
+                error = error or e
+                replies.append(None)
+        if error is not None:
+            raise error
+        return replies
+
+    async def _execute(self, commands: Sequence[Sequence]) -> List:
+        """Run commands as one pipeline on a pooled connection"""
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.pool_size)
+        async with self._slots:
+            connection = self._idle.pop() if self._idle else None
+            try:
+                if connection is None:
+                    connection = await asyncio.wait_for(self._open(), self.timeout)
+                replies = await asyncio.wait_for(self._round_trip(*connection, commands), self.timeout)
+            except RespError:
+                # Every reply was read, so the connection is still in sync
+                if connection is not None:
+                    self._idle.append(connection)
+                raise
+            except BaseException:
+                # A reply may still be in flight: the connection cannot be reused
+                if connection is not None:
+                    connection[1].close()
+                raise
+            self._idle.append(connection)
+            return replies
+
+    async def _call(self, commands: Sequence[Sequence]) -> Optional[List]:
+        """_execute, with server failures logged and reported as None"""
+        if self._down_until:
+            if time.monotonic() < self._down_until:
+                self._skipped += 1
+                return None
+            self._down_until = 0.0
+        try:
+            return await self._execute(commands)
+        except RespError as e:
+            # The server answered, so it is up: only this call fails
+            self._errors += 1
+            self._log_error(e, "treating as miss")
+            return None
+        except (OSError, ConnectionError, asyncio.TimeoutError, asyncio.IncompleteReadError) as e:
+            self._errors += 1
+            self._down_until = time.monotonic() + self.retry_interval
+            self._log_error(e, f"treating as miss, retrying in {self.retry_interval:g}s")
+            return None
+
+    def _log_error(self, error: Exception, action: str):
+        """Warn about a failed call, at most once per _ERROR_LOG_INTERVAL_SECONDS"""
+        now = time.monotonic()
+        if now - self._last_error_log > _ERROR_LOG_INTERVAL_SECONDS:
+            self._last_error_log = now
+            logger.warning(f"⚠️ Cache server {self.host}:{self.port} unavailable ({type(error).__name__}: {error}); {action}")
+
+    async def get(self, key: str) -> Optional[bytes]:
+        replies = await self._call([('GET', self.prefix + key)])
+        value = replies[0] if replies else None
+        if value is None:
+            self._misses += 1
+        else:
+            self._hits += 1
+        return value
+
+    async def get_many(self, keys: Sequence[str]) -> Dict[str, bytes]:
+        if not keys:
+            return {}
+        replies = await self._call([('MGET', *(self.prefix + key for key in keys))])
+        values = replies[0] if replies else [None] * len(keys)
+        found = {key: value for key, value in zip(keys, values) if value is not None}
+        self._hits += len(found)
+        self._misses += len(keys) - len(found)
+        return found
+
+    def _set_command(self, key: str, value: bytes, ttl: Optional[float]) -> Tuple:
+        if ttl:
+            return ('SET', self.prefix + key, value, 'PX', int(ttl * 1000))
+        return ('SET', self.prefix + key, value)
+
+    async def set(self, key: str, value: bytes, ttl: Optional[float] = None):
+        await self._call([self._set_command(key, value, ttl)])
+
+    async def set_many(self, items: Dict[str, bytes], ttl: Optional[float] = None):
+        if items:
+            await self._call([self._set_command(key, value, ttl) for key, value in items.items()])
+
+    async def delete(self, key: str):
+        await self._call([('DEL', self.prefix + key)])
+
+    async def close(self):
+        while self._idle:
+            _, writer = self._idle.pop()
+            writer.close()
+
+    def get_stats(self) -> Dict:
+        return {
+            'backend': 'redis',
+            'server': f"{self.host}:{self.port}/{self.db}",
+            'hits': self._hits,
+            'misses': self._misses,
+            'errors': self._errors,
+            'round_trips': self._round_trips,
+            'skipped': self._skipped,
+            'available': time.monotonic() >= self._down_until,
+            'open_connections': len(self._idle)
+        }
+
+
+class NearCache(CacheBackend):
+    """Short-lived in-process copy of a remote cache's hot entries"""
+
+    def __init__(self, remote: CacheBackend, near: InProcessCache, ttl: float = CACHE_NEAR_TTL_SECONDS):
+        """
+        Initialize near-cache
+
+        Args:
+            remote: Shared backend holding the authoritative entries
+            near: Local store for recently read or written entries
+            ttl: Seconds an entry is served locally before the remote is asked again
+        """
+        self.remote = remote
+        self.near = near
+        self.ttl = ttl
+        self.shared = remote.shared
+
+    def _near_ttl(self, ttl: Optional[float]) -> float:
+        return min(ttl, self.ttl) if ttl else self.ttl
+
+    async def get(self, key: str) -> Optional[bytes]:
+        value = self.near.get_local(key)
+        if value is None:
+            value = await self.remote.get(key)
+            if value is not None:
+                self.near.set_local(key, value, self.ttl)
+        return value
+
+    async def get_many(self, keys: Sequence[str]) -> Dict[str, bytes]:
+        found = {}
+        missing = []
+        for key in keys:
+            value = self.near.get_local(key)
+            if value is None:
+                missing.append(key)
+            else:
+                found[key] = value
+        if missing:
+            fetched = await self.remote.get_many(missing)
+            for key, value in fetched.items():
+                self.near.set_local(key, value, self.ttl)
+            found.update(fetched)
+        return found
+
+    async def set(self, key: str, value: bytes, ttl: Optional[float] = None):
+        self.near.set_local(key, value, self._near_ttl(ttl))
+        await self.remote.set(key, value, ttl)
+
+    async def set_many(self, items: Dict[str, bytes], ttl: Optional[float] = None):
+        for key, value in items.items():
+            self.near.set_local(key, value, self._near_ttl(ttl))
+        await self.remote.set_many(items, ttl)
+
+    async def delete(self, key: str):
+        self.near.delete_local(key)
+        await self.remote.delete(key)
+
+    async def close(self):
+        await self.remote.close()
+
+    def get_stats(self) -> Dict:
+        return {**self.remote.get_stats(), 'near': self.near.get_stats()}
+
+
+def create_cache_backend(url: str = CACHE_BACKEND_URL) -> CacheBackend:
+    """
+    Build the cache backend described by a URL
+
+    Args:
+        url: 'memory://' or 'redis://[:password@]host[:port][/db]'
+
+    Returns:
+        InProcessCache, or RedisCache behind a NearCache (unless
+        CACHE_NEAR_TTL_SECONDS is 0)
+
+    Raises:
+        ValueError: If the URL scheme is not supported
+
+    Example:
+        >>> create_cache_backend("redis://cache.internal:6379/0").shared
+        True
+    """
+    parsed = urlparse(url)
+    if parsed.scheme in ('', 'memory'):
+        return InProcessCache()
+    if parsed.scheme == 'redis':
+        remote = RedisCache(
+            host=parsed.hostname or "127.0.0.1",
+            port=parsed.port or 6379,
+            db=int(parsed.path.lstrip('/') or 0),
+            password=parsed.password
+        )
+        logger.info(f"🗄️ Shared cache backend: redis://{remote.host}:{remote.port}/{remote.db}")
+        if CACHE_NEAR_TTL_SECONDS <= 0:
+            return remote
+        return NearCache(remote, InProcessCache(), CACHE_NEAR_TTL_SECONDS)
+    raise ValueError(f"Unsupported CACHE_BACKEND_URL scheme: {parsed.scheme!r}")
@@ -7,7 +7,7 @@ import re
 import json
 from pathlib import Path
 from datetime import datetime
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 import logging
 
 logger = logging.getLogger(__name__)
@@ -36,6 +36,56 @@ def clean_text(text: str) -> str:
     return text
 
 
+SENTENCE_TERMINATORS = "۔؟!?."
+
+
+def split_sentences(text: str) -> List[str]:
+    """
+    Split text into sentences at Urdu and English sentence boundaries
+    Boundaries are ۔ ؟ ! ? and '.' (a '.' only when followed by whitespace
+    or the end of text, so numbers like 25.5 stay intact)
+
+    Args:
+        text: Input text string
+
+    Returns:
+        List of sentences with their terminators, empty list for blank text
+
+    Example:
+        >>> split_sentences("السلام علیکم! کیا حال ہے؟")
+        ['السلام علیکم!', 'کیا حال ہے؟']
+    """
+    if not text:
+        return []
+
+    sentences = []
+    start = 0
+    length = len(text)
+    i = 0
+
+    while i < length:
+        char = text[i]
+        if char in SENTENCE_TERMINATORS:
+            next_char = text[i + 1] if i + 1 < length else ' '
+            if char == '.' and not next_char.isspace() and next_char not in SENTENCE_TERMINATORS:
+                i += 1
+                continue
+            # Keep runs of terminators ("!!", "?!") with their sentence
+            while i + 1 < length and text[i + 1] in SENTENCE_TERMINATORS:
+                i += 1
+            sentence = text[start:i + 1].strip()
+            if sentence:
+                sentences.append(sentence)
+            start = i + 1
+        i += 1
+
+    tail = text[start:].strip()
+    if tail:
+        sentences.append(tail)
+
+    return sentences
+
+
 def is_urdu_text(text: str) -> bool:
     """
     Check if text contains Urdu characters
@@ -0,0 +1,82 @@
+"""
+Fast JSON responses for Urdu Voice Assistant
+Serializes response bodies with orjson when it is installed, and with the
+standard library otherwise; Urdu text is written as UTF-8, never escaped
+"""
+
+import json
+from datetime import date, datetime
+from pathlib import Path
+from typing import Any
+import sys
+
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depends on the environment
+    orjson = None
+    logger.debug("orjson not installed, using the standard json encoder")
+
+
+def _default(value: Any) -> Any:
+    """Encode the types FastAPI endpoints return besides plain JSON values"""
+    if isinstance(value, BaseModel):
+        return value.model_dump()
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Path):
+        return str(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    """
+    Serialize content to compact UTF-8 JSON bytes
+
+    Args:
+        content: JSON-compatible value (datetimes and pydantic models allowed)
+
+    Returns:
+        Encoded body
+
+    Example:
+        >>> dumps({'response_text': 'سلام'})
+        b'{"response_text":"\\xd8\\xb3\\xd9\\x84\\xd8\\xa7\\xd9\\x85"}'
+    """
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(
+        content, ensure_ascii=False, separators=(',', ':'), default=_default
+    ).encode('utf-8')
+
+
+
+def loads(data: bytes) -> Any:
+    """
+    Parse JSON bytes (orjson when installed)
+
+    Args:
+        data: Encoded JSON
+
+    Returns:
+        Decoded value
+
+    Raises:
+        ValueError: If the data is not valid JSON
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with dumps()"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
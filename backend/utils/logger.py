@@ -1,96 +1,346 @@
 """
 Logging utility for Urdu Voice Assistant
 Provides configured logger with file and console handlers
+
+All loggers share one in-memory queue. A single background listener thread
+owns the console handler and one daily-rotating file handler, so logging a
+line on the request path is just a queue put and never waits on disk I/O.
 """
 
+import atexit
+import json
 import logging
+import logging.handlers
+import os
+import queue
 import sys
+import threading
 from pathlib import Path
-from datetime import datetime
+from datetime import datetime, timedelta
 from typing import Optional
 
 # Import config
-import os
 sys.path.append(str(Path(__file__).resolve().parent.parent))
-from config import LOG_DIR, LOG_LEVEL, LOG_FORMAT, LOG_DATE_FORMAT
+from config import LOG_DIR, LOG_LEVEL, LOG_FORMAT, LOG_DATE_FORMAT, LOG_BACKUP_DAYS
 
+LOG_FILE_PREFIX = "assistant"
 
-def setup_logger(name: str, log_file: Optional[str] = None) -> logging.Logger:
+_lock = threading.Lock()
+_log_queue: Optional[queue.SimpleQueue] = None
+_listener: Optional[logging.handlers.QueueListener] = None
+
+# Loggers whose records go only to their own file (e.g. the JSONL request log)
+_dedicated_loggers = set()
+
+
+class DailyFileHandler(logging.FileHandler):
     """
-    Set up and configure logger with console and file handlers
-    
-    Args:
-        name: Logger name (usually __name__ from calling module)
-        log_file: Optional custom log file name
-        
-    Returns:
-        Configured logger instance
+    File handler writing to <prefix>_YYYYMMDD<suffix> and switching files at midnight
+
+    Only the listener thread calls emit(), so the date check needs no locking.
+    Files older than `backup_days` are removed when the day rolls over.
     """
-    
-    # Create logger
-    logger = logging.getLogger(name)
-    
-    # Prevent duplicate handlers
-    if logger.handlers:
-        return logger
-    
-    # Set logging level
-    logger.setLevel(getattr(logging, LOG_LEVEL))
-    
+
+    def __init__(
+        self,
+        directory: Path,
+        prefix: str = LOG_FILE_PREFIX,
+        backup_days: int = LOG_BACKUP_DAYS,
+        suffix: str = ".log"
+    ):
+        self.directory = Path(directory)
+        self.prefix = prefix
+        self.suffix = suffix
+        self.backup_days = backup_days
+        self._next_rollover = 0.0
+        super().__init__(self._path_for(datetime.now()), encoding='utf-8', mode='a', delay=True)
+        self._schedule_rollover(datetime.now())
+
+    def _path_for(self, moment: datetime) -> str:
+        """Log file path for the day of `moment`"""
+        return str(self.directory / f"{self.prefix}_{moment.strftime('%Y%m%d')}{self.suffix}")
+
+    def _schedule_rollover(self, moment: datetime):
+        """Remember when the next midnight is, as a timestamp"""
+        midnight = (moment + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+        self._next_rollover = midnight.timestamp()
+
+    def _rollover(self):
+        """Close today's file, point at the new day's file and prune old ones"""
+        now = datetime.now()
+        if self.stream is not None:
+            self.stream.close()
+            self.stream = None
+        self.baseFilename = os.path.abspath(self._path_for(now))
+        self._schedule_rollover(now)
+        self._prune(now)
+
+    def _prune(self, now: datetime):
+        """Delete log files older than the retention period"""
+        if self.backup_days <= 0:
+            return
+        cutoff = (now - timedelta(days=self.backup_days)).strftime('%Y%m%d')
+        for path in self.directory.glob(f"{self.prefix}_*{self.suffix}"):
+            stamp = path.stem[len(self.prefix) + 1:]
+            if stamp.isdigit() and stamp < cutoff:
+                try:
+                    path.unlink()
+                except OSError:
+                    pass
+
+    def emit(self, record: logging.LogRecord):
+        if record.created >= self._next_rollover:
+            self._rollover()
+        super().emit(record)
+
+
+class _InProcessQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler for a queue consumed in the same process
+
+    The stock prepare() copies the record and formats it on the calling
+    thread. Here we only freeze the message arguments and traceback text and
+    leave the full formatting (timestamp etc.) to the listener thread.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        if record.args:
+            record.msg = record.getMessage()
+            record.args = None
+        if record.exc_info:
+            record.exc_text = _exc_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+_exc_formatter = logging.Formatter()
+
+
+class _SharedOutputFilter(logging.Filter):
+    """Keep records of dedicated loggers out of the console and main log file"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.name not in _dedicated_loggers
+
+
+class JSONLineFormatter(logging.Formatter):
+    """Serialize a dict message as one JSON line (runs on the listener thread)"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        if isinstance(record.msg, dict):
+            return json.dumps(record.msg, ensure_ascii=False, separators=(',', ':'))
+        return json.dumps({'message': record.getMessage()}, ensure_ascii=False)
+
+
+def _build_handlers():
+    """Create the console and file handlers owned by the listener thread"""
     # Create formatter with UTF-8 support for Urdu text
     formatter = logging.Formatter(
         fmt=LOG_FORMAT,
         datefmt=LOG_DATE_FORMAT
     )
-    
+
     # Console Handler (outputs to terminal)
     console_handler = logging.StreamHandler(sys.stdout)
     console_handler.setLevel(logging.DEBUG)
     console_handler.setFormatter(formatter)
-    
+    console_handler.addFilter(_SharedOutputFilter())
+
     # Ensure console supports UTF-8 encoding
     if hasattr(console_handler.stream, 'reconfigure'):
         console_handler.stream.reconfigure(encoding='utf-8')
-    
-    logger.addHandler(console_handler)
-    
-    # File Handler (saves to log file)
+
+    handlers = [console_handler]
+
+    # File Handler (one shared daily log file)
     try:
-        # Create log filename with date
-        if log_file is None:
-            log_filename = f"assistant_{datetime.now().strftime('%Y%m%d')}.log"
-        else:
-            log_filename = log_file
-            
-        log_filepath = LOG_DIR / log_filename
-        
-        # Create file handler with UTF-8 encoding
-        file_handler = logging.FileHandler(
-            log_filepath,
-            encoding='utf-8',
-            mode='a'  # Append mode
-        )
+        LOG_DIR.mkdir(parents=True, exist_ok=True)
+        file_handler = DailyFileHandler(LOG_DIR)
         file_handler.setLevel(logging.INFO)
         file_handler.setFormatter(formatter)
-        
-        logger.addHandler(file_handler)
-        
+        file_handler.addFilter(_SharedOutputFilter())
+        handlers.append(file_handler)
     except Exception as e:
-        logger.error(f"Failed to create file handler: {e}")
-    
+        print(f"Failed to create file handler: {e}", file=sys.stderr)
+
+    return handlers
+
+
+def _start_listener():
+    """Start the background listener thread (caller holds _lock)"""
+    global _log_queue, _listener
+
+    if _log_queue is None:
+        _log_queue = queue.SimpleQueue()
+
+    _listener = logging.handlers.QueueListener(
+        _log_queue,
+        *_build_handlers(),
+        respect_handler_level=True
+    )
+    _listener.start()
+
+
+def _ensure_listener():
+    """Start the shared listener once per process"""
+    if _listener is None:
+        with _lock:
+            if _listener is None:
+                _start_listener()
+
+
+def _stop_listener_before_fork():
+    """
+    Drain the queue and stop the listener thread before fork()
+
+    A thread caught in the middle of writing a record would leave the
+    stream's lock held forever in the child.
+    """
+    if _listener is not None and _listener._thread is not None:
+        _listener.stop()
+
+
+def _resume_listener_in_parent():
+    """Restart the listener stopped for fork() with the same handlers"""
+    if _listener is not None and _listener._thread is None:
+        _listener.start()
+
+
+def _restart_listener_after_fork():
+    """The listener thread does not survive fork(); start a fresh one in the child"""
+    global _listener, _log_queue
+    if _listener is not None:
+        _log_queue = queue.SimpleQueue()
+        _listener = None
+        for name in list(logging.root.manager.loggerDict):
+            for handler in getattr(logging.getLogger(name), 'handlers', []):
+                if isinstance(handler, logging.handlers.QueueHandler):
+                    handler.queue = _log_queue
+        _start_listener()
+
+
+def shutdown_logging():
+    """
+    Flush queued records and stop the listener thread
+
+    Registered with atexit; safe to call more than once.
+    """
+    global _listener
+    with _lock:
+        if _listener is not None:
+            _listener.stop()
+            for handler in _listener.handlers:
+                handler.close()
+            _listener = None
+
+
+atexit.register(shutdown_logging)
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(
+        before=_stop_listener_before_fork,
+        after_in_parent=_resume_listener_in_parent,
+        after_in_child=_restart_listener_after_fork
+    )
+
+
+def setup_logger(name: str, log_file: Optional[str] = None) -> logging.Logger:
+    """
+    Set up and configure logger with console and file handlers
+
+    Args:
+        name: Logger name (usually __name__ from calling module)
+        log_file: Optional custom log file name; records from this logger
+                  are also written to that file
+
+    Returns:
+        Configured logger instance
+    """
+
+    # Create logger
+    logger = logging.getLogger(name)
+
+    # Prevent duplicate handlers
+    if logger.handlers:
+        return logger
+
+    # Set logging level
+    logger.setLevel(getattr(logging, LOG_LEVEL))
+
+    _ensure_listener()
+
+    # Records go through the shared queue to the listener thread
+    logger.addHandler(_InProcessQueueHandler(_log_queue))
+
+    if log_file is not None:
+        _add_custom_file(name, log_file)
+
     # Prevent propagation to root logger
     logger.propagate = False
-    
+
+    return logger
+
+
+def _add_custom_file(name: str, log_file: str):
+    """Attach an extra file, fed by the listener, for one logger's records"""
+    try:
+        file_handler = logging.FileHandler(LOG_DIR / log_file, encoding='utf-8', mode='a', delay=True)
+        file_handler.setLevel(logging.INFO)
+        file_handler.setFormatter(logging.Formatter(fmt=LOG_FORMAT, datefmt=LOG_DATE_FORMAT))
+        file_handler.addFilter(logging.Filter(name))
+        with _lock:
+            _listener.handlers = _listener.handlers + (file_handler,)
+    except Exception as e:
+        logging.getLogger(name).error(f"Failed to create file handler: {e}")
+
+
+def setup_jsonl_logger(name: str, prefix: str) -> logging.Logger:
+    """
+    Set up a logger that writes dict messages as JSON lines to its own daily file
+
+    Records skip the console and the main log. Serialization happens on the
+    listener thread, so callers must not mutate a dict after logging it.
+
+    Args:
+        name: Logger name
+        prefix: File name prefix; files are <prefix>_YYYYMMDD.jsonl in LOG_DIR
+
+    Returns:
+        Configured logger instance
+
+    Example:
+        >>> log = setup_jsonl_logger("requests", "requests")
+        >>> log.info({'intent': 'greeting', 'total_ms': 12.5})
+    """
+    logger = logging.getLogger(name)
+    if logger.handlers:
+        return logger
+
+    logger.setLevel(logging.INFO)
+    _ensure_listener()
+
+    try:
+        LOG_DIR.mkdir(parents=True, exist_ok=True)
+        file_handler = DailyFileHandler(LOG_DIR, prefix=prefix, suffix=".jsonl")
+        file_handler.setFormatter(JSONLineFormatter())
+        file_handler.addFilter(logging.Filter(name))
+        with _lock:
+            _dedicated_loggers.add(name)
+            _listener.handlers = _listener.handlers + (file_handler,)
+    except Exception as e:
+        print(f"Failed to create JSONL handler: {e}", file=sys.stderr)
+
+    logger.addHandler(_InProcessQueueHandler(_log_queue))
+    logger.propagate = False
     return logger
 
 
 def get_logger(name: str) -> logging.Logger:
     """
     Get or create a logger instance
-    
+
     Args:
         name: Logger name
-        
+
     Returns:
         Logger instance
     """
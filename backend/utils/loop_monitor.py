@@ -0,0 +1,188 @@
+"""
+Event loop lag monitor for Urdu Voice Assistant
+Measures how late the event loop runs scheduled callbacks and captures the
+stack of whatever blocks it
+
+A probe task sleeps for a fixed interval and records how much later than
+requested it woke up; that lag goes into a histogram. A watchdog thread
+watches the probe's heartbeat: when the loop has not come back within the
+threshold, it grabs the loop thread's current stack - the blocking code,
+caught in the act - and logs it.
+"""
+
+import asyncio
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from config import (
+    LOOP_LAG_INTERVAL_MS,
+    LOOP_LAG_THRESHOLD_MS,
+    LOOP_STALL_HISTORY
+)
+from utils.logger import setup_logger
+from utils.metrics import REGISTRY
+
+logger = setup_logger(__name__)
+
+LOOP_LAG = REGISTRY.histogram(
+    "assistant_event_loop_lag_seconds",
+    "How late the event loop ran a scheduled probe",
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+)
+LOOP_STALLS_TOTAL = REGISTRY.counter(
+    "assistant_event_loop_stalls_total",
+    "Times the event loop was blocked for longer than the lag threshold"
+)
+
+# Innermost frames kept per captured stack
+_MAX_STACK_FRAMES = 40
+
+
+class LoopLagMonitor:
+    """Probe task plus watchdog thread measuring event loop responsiveness"""
+
+    def __init__(
+        self,
+        interval_ms: float = LOOP_LAG_INTERVAL_MS,
+        threshold_ms: float = LOOP_LAG_THRESHOLD_MS,
+        history: int = LOOP_STALL_HISTORY
+    ):
+        """
+        Initialize monitor
+
+        Args:
+            interval_ms: Probe period
+            threshold_ms: Lag above which a stall is recorded with its stack
+            history: Number of recent stalls kept
+        """
+        self.interval = interval_ms / 1000
+        self.threshold = threshold_ms / 1000
+        self.stalls: deque = deque(maxlen=history)
+
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._loop_thread_id: Optional[int] = None
+
+        # Written by the probe, read by the watchdog (single floats, no lock needed)
+        self._heartbeat = time.monotonic()
+        self._stall_open: Optional[Dict] = None
+
+        self._probes = 0
+        self._max_lag = 0.0
+        self._total_lag = 0.0
+
+    async def start(self):
+        """Start the probe task on the running loop and the watchdog thread"""
+        if self._task is not None:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.create_task(self._probe(), name="loop-lag-probe")
+        self._watchdog = threading.Thread(target=self._watch, name="loop-lag-watchdog", daemon=True)
+        self._watchdog.start()
+        logger.info(
+            f"⏱️ Event loop monitor started: interval={self.interval * 1000:.0f}ms, "
+            f"threshold={self.threshold * 1000:.0f}ms"
+        )
+
+    async def stop(self):
+        """Stop the probe task and the watchdog thread"""
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._watchdog is not None:
+            self._watchdog.join(timeout=1)
+            self._watchdog = None
+
+    async def _probe(self):
+        """Sleep for the interval and record how late the wake-up was"""
+        loop = asyncio.get_running_loop()
+        while True:
+            scheduled = loop.time()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - scheduled - self.interval)
+            self._heartbeat = time.monotonic()
+
+            self._probes += 1
+            self._total_lag += lag
+            if lag > self._max_lag:
+                self._max_lag = lag
+            LOOP_LAG.observe(lag)
+
+            if lag > self.threshold:
+                self._close_stall(lag)
+
+    def _close_stall(self, lag: float):
+        """Record a finished stall, completing the one the watchdog opened"""
+        LOOP_STALLS_TOTAL.inc()
+        stall = self._stall_open
+        self._stall_open = None
+        if stall is None:
+            # Shorter than one watchdog check: the stack was not captured
+            stall = {'detected_at': datetime.now().isoformat(), 'stack': None}
+            self.stalls.append(stall)
+        stall['lag_ms'] = round(lag * 1000, 1)
+        logger.warning(f"🐢 Event loop blocked for {lag * 1000:.0f} ms")
+
+    def _watch(self):
+        """Watchdog thread: capture the loop thread's stack while it is blocked"""
+        check_every = max(self.threshold / 2, 0.01)
+        while not self._stop.wait(check_every):
+            overdue = time.monotonic() - self._heartbeat - self.interval
+            if overdue <= self.threshold or self._stall_open is not None:
+                continue
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            stack = traceback.format_list(traceback.extract_stack(frame)[-_MAX_STACK_FRAMES:])
+            stall = {
+                'detected_at': datetime.now().isoformat(),
+                'blocked_for_ms_at_capture': round(overdue * 1000, 1),
+                'lag_ms': None,
+                'stack': [line.rstrip() for line in stack]
+            }
+            self._stall_open = stall
+            self.stalls.append(stall)
+            logger.warning(
+                f"🐢 Event loop blocked for {overdue * 1000:.0f} ms so far, in:\n" + "".join(stack[-6:])
+            )
+
+    def get_stalls(self) -> List[Dict]:
+        """
+        Get recent stalls, newest first
+
+        Returns:
+            List of stalls with capture time, lag and the blocking stack
+        """
+        return list(reversed(self.stalls))
+
+    def get_stats(self) -> Dict:
+        """
+        Get lag statistics
+
+        Returns:
+            Dictionary with probe count, mean and max lag and stall count
+        """
+        return {
+            'running': self._task is not None,
+            'interval_ms': self.interval * 1000,
+            'threshold_ms': self.threshold * 1000,
+            'probes': self._probes,
+            'mean_lag_ms': round(self._total_lag / self._probes * 1000, 3) if self._probes else 0.0,
+            'max_lag_ms': round(self._max_lag * 1000, 3),
+            'stalls': int(LOOP_STALLS_TOTAL.total())
+        }
@@ -0,0 +1,255 @@
+"""
+Memory instrumentation utility for Urdu Voice Assistant
+Process RSS, deep sizes of in-process structures and tracemalloc snapshot diffs
+
+tracemalloc is only started on request (or at startup with
+TRACEMALLOC_FRAMES > 0) because tracing slows every allocation down.
+"""
+
+import gc
+import sys
+import tracemalloc
+from collections import deque
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from config import TRACEMALLOC_FRAMES
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Containers whose items are counted as part of the owner
+_CONTAINERS = (dict, list, tuple, set, frozenset, deque)
+
+# Objects from these packages are walked into; others count shallow only
+_OWN_MODULES = ('services.', 'utils.')
+
+
+def deep_sizeof(obj: Any) -> Dict[str, int]:
+    """
+    Approximate the memory held by an object and everything it owns
+
+    Walks builtin containers and the attributes of this application's own
+    classes; other objects (futures, executors, modules, ...) are counted
+    shallow. Shared objects are counted once.
+
+    Args:
+        obj: Root object
+
+    Returns:
+        Dictionary with 'bytes' and 'objects' counts
+
+    Example:
+        >>> deep_sizeof({'greeting': ['سلام', 'ہیلو']})
+        {'bytes': 460, 'objects': 4}
+    """
+    seen = set()
+    stack = [obj]
+    total = 0
+    count = 0
+
+    while stack:
+        current = stack.pop()
+        if id(current) in seen:
+            continue
+        seen.add(id(current))
+        total += sys.getsizeof(current)
+        count += 1
+
+        if isinstance(current, dict):
+            stack.extend(current.keys())
+            stack.extend(current.values())
+        elif isinstance(current, _CONTAINERS):
+            stack.extend(current)
+        elif type(current).__module__.startswith(_OWN_MODULES):
+            if hasattr(current, '__dict__'):
+                stack.append(vars(current))
+            for cls in type(current).__mro__:
+                for slot in getattr(cls, '__slots__', ()):
+                    if hasattr(current, slot):
+                        stack.append(getattr(current, slot))
+
+    return {'bytes': total, 'objects': count}
+
+
+def process_memory() -> Dict[str, Optional[int]]:
+    """
+    Get resident set size of this process
+
+    Returns:
+        Dictionary with 'rss_bytes' and 'peak_rss_bytes' (None when unavailable)
+    """
+    rss = peak = None
+    try:
+        # Linux: current and peak RSS from procfs
+        with open('/proc/self/status', 'r') as status:
+            for line in status:
+                if line.startswith('VmRSS:'):
+                    rss = int(line.split()[1]) * 1024
+                elif line.startswith('VmHWM:'):
+                    peak = int(line.split()[1]) * 1024
+    except OSError:
+        try:
+            import resource
+            maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            # ru_maxrss is bytes on macOS and kilobytes elsewhere
+            peak = maxrss if sys.platform == 'darwin' else maxrss * 1024
+        except (ImportError, OSError):
+            pass
+    return {'rss_bytes': rss, 'peak_rss_bytes': peak}
+
+
+def proportional_memory() -> Dict[str, Optional[int]]:
+    """
+    Get how much of this process's memory is shared with other processes
+
+    Pss splits every shared page evenly between the processes mapping it,
+    so summing Pss over forked workers gives their real combined footprint,
+    where summing RSS counts the copy-on-write pages once per worker.
+
+    Returns:
+        Dictionary with 'pss_bytes', 'private_bytes' and 'shared_bytes'
+        (None when /proc/self/smaps_rollup is unavailable)
+    """
+    fields = {}
+    try:
+        with open('/proc/self/smaps_rollup', 'r') as rollup:
+            for line in rollup:
+                parts = line.split()
+                if len(parts) == 3 and parts[2] == 'kB':
+                    fields[parts[0].rstrip(':')] = int(parts[1]) * 1024
+    except (OSError, ValueError):
+        return {'pss_bytes': None, 'private_bytes': None, 'shared_bytes': None}
+    return {
+        'pss_bytes': fields.get('Pss'),
+        'private_bytes': fields.get('Private_Clean', 0) + fields.get('Private_Dirty', 0),
+        'shared_bytes': fields.get('Shared_Clean', 0) + fields.get('Shared_Dirty', 0)
+    }
+
+
+class MemoryInspector:
+    """Takes tracemalloc snapshots and diffs each one against the previous"""
+
+    def __init__(self, frames: int = TRACEMALLOC_FRAMES):
+        """
+        Initialize memory inspector
+
+        Args:
+            frames: Traceback depth recorded per allocation; > 0 starts tracing now
+        """
+        self.frames = max(frames, 1)
+        self._baseline: Optional[tracemalloc.Snapshot] = None
+        if frames > 0:
+            self.start()
+
+    @property
+    def tracing(self) -> bool:
+        return tracemalloc.is_tracing()
+
+    def start(self):
+        """Start tracing allocations (no-op if already tracing)"""
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+            logger.info(f"🧠 tracemalloc started ({self.frames} frames)")
+
+    def stop(self):
+        """Stop tracing and drop the baseline snapshot"""
+        self._baseline = None
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+            logger.info("🧠 tracemalloc stopped")
+
+    def snapshot(self, limit: int = 20, group_by: str = 'lineno') -> Dict:
+        """
+        Take a snapshot and compare it with the previous one
+
+        The first call only starts tracing (if needed) and records the
+        baseline; later calls report the top allocation sites and what grew
+        since the previous call. Blocking - run it off the event loop.
+
+        Args:
+            limit: Number of entries in each top list
+            group_by: 'lineno', 'filename' or 'traceback'
+
+        Returns:
+            Dictionary with traced totals, top allocations and top growth
+        """
+        if group_by not in ('lineno', 'filename', 'traceback'):
+            raise ValueError("group_by must be 'lineno', 'filename' or 'traceback'")
+
+        started_now = not tracemalloc.is_tracing()
+        self.start()
+        gc.collect()
+
+        current = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ))
+        traced, peak = tracemalloc.get_traced_memory()
+
+        result = {
+            'tracing_started_now': started_now,
+            'traced_bytes': traced,
+            'traced_peak_bytes': peak,
+            'tracemalloc_overhead_bytes': tracemalloc.get_tracemalloc_memory(),
+            'top': [self._stat(stat) for stat in current.statistics(group_by)[:limit]],
+            'growth': None
+        }
+
+        if self._baseline is not None:
+            diff = current.compare_to(self._baseline, group_by)
+            result['growth'] = [
+                self._stat(stat) for stat in diff[:limit] if stat.size_diff > 0
+            ]
+        self._baseline = current
+        return result
+
+    @staticmethod
+    def _stat(stat) -> Dict:
+        """Convert a tracemalloc Statistic / StatisticDiff to a dictionary"""
+        entry = {
+            'where': [f"{frame.filename}:{frame.lineno}" for frame in stat.traceback],
+            'size_bytes': stat.size,
+            'count': stat.count
+        }
+        if hasattr(stat, 'size_diff'):
+            entry['size_diff_bytes'] = stat.size_diff
+            entry['count_diff'] = stat.count_diff
+        return entry
+
+    def get_status(self) -> Dict:
+        """
+        Get tracemalloc status without taking a snapshot
+
+        Returns:
+            Dictionary with tracing flag and traced memory totals
+        """
+        if not tracemalloc.is_tracing():
+            return {'tracing': False, 'has_baseline': False}
+        traced, peak = tracemalloc.get_traced_memory()
+        return {
+            'tracing': True,
+            'frames': tracemalloc.get_traceback_limit(),
+            'has_baseline': self._baseline is not None,
+            'traced_bytes': traced,
+            'traced_peak_bytes': peak
+        }
+
+
+def structure_footprints(structures: Dict[str, Any]) -> List[Dict]:
+    """
+    Deep sizes of named structures, largest first
+
+    Args:
+        structures: Name -> object
+
+    Returns:
+        List of dictionaries with name, bytes and objects
+    """
+    sizes = []
+    for name, obj in structures.items():
+        size = deep_sizeof(obj)
+        sizes.append({'name': name, 'bytes': size['bytes'], 'objects': size['objects']})
+    sizes.sort(key=lambda entry: entry['bytes'], reverse=True)
+    return sizes
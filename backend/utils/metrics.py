@@ -0,0 +1,296 @@
+"""
+Metrics utility for Urdu Voice Assistant
+Counters, gauges and histograms rendered in Prometheus text format
+
+Recording is lock-free: every metric is written from the event loop
+thread only, and an observation is a dict lookup plus a couple of integer
+increments, so it is cheap enough to leave on at full load.
+
+Metrics are per process. Under serve.py every sample carries a worker
+label, and each worker adds the latest samples the other workers
+published (utils/worker_stats.py) to its own, so a scrape shows the whole
+server whichever worker answers it.
+"""
+
+from bisect import bisect_left
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# Latency buckets in seconds (sub-millisecond matching up to slow gTTS calls)
+DEFAULT_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    """Render a Prometheus label set such as {intent="greeting",cache="hit"}"""
+    parts = []
+    for name, value in zip(names, values):
+        escaped = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        parts.append(f'{name}="{escaped}"')
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    """Render a sample value, keeping integers free of a trailing .0"""
+    if value == float('inf'):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Counter:
+    """Monotonically increasing counter with optional labels"""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labelvalues: str, amount: float = 1):
+        """
+        Increment the counter
+
+        Args:
+            *labelvalues: One value per label name, in order
+            amount: Amount to add
+        """
+        self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def value(self, *labelvalues: str) -> float:
+        """Get the current value for a label set"""
+        return self._values.get(labelvalues, 0)
+
+    def total(self) -> float:
+        """Get the sum across all label sets"""
+        return sum(self._values.values())
+
+    def header(self) -> List[str]:
+        """Render the HELP and TYPE lines"""
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+
+    def samples(self, extra: str = "") -> List[str]:
+        """Render sample lines, with extra label pairs on each"""
+        if not self.labelnames and not self._values:
+            return [f"{self.name}{_format_labels((), (), extra)} 0"]
+        return [
+            f"{self.name}{_format_labels(self.labelnames, labelvalues, extra)} {_format_value(value)}"
+            for labelvalues, value in sorted(self._values.items())
+        ]
+
+    def render(self, extra: str = "") -> List[str]:
+        """Render samples in Prometheus text format"""
+        return self.header() + self.samples(extra)
+
+
+class Gauge:
+    """Gauge whose value is read from a callback at scrape time"""
+
+    def __init__(self, name: str, documentation: str, callback: Callable[[], float] = None):
+        self.name = name
+        self.documentation = documentation
+        self.callback = callback
+        self._value = 0.0
+
+    def set(self, value: float):
+        """Set the gauge value (ignored when a callback is configured)"""
+        self._value = value
+
+    def get(self) -> float:
+        """Get the current value"""
+        if self.callback is not None:
+            try:
+                return float(self.callback())
+            except Exception:
+                return float('nan')
+        return self._value
+
+    def header(self) -> List[str]:
+        """Render the HELP and TYPE lines"""
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge"]
+
+    def samples(self, extra: str = "") -> List[str]:
+        """Render the sample line, with extra label pairs"""
+        return [f"{self.name}{_format_labels((), (), extra)} {_format_value(self.get())}"]
+
+    def render(self, extra: str = "") -> List[str]:
+        """Render the sample in Prometheus text format"""
+        return self.header() + self.samples(extra)
+
+
+class Histogram:
+    """Fixed-bucket histogram with optional labels"""
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [count per bucket..., overflow count, sum]
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, *labelvalues: str):
+        """
+        Record an observation
+
+        Args:
+            value: Observed value (seconds for latency histograms)
+            *labelvalues: One value per label name, in order
+        """
+        series = self._series.get(labelvalues)
+        if series is None:
+            series = self._series[labelvalues] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def count(self, *labelvalues: str) -> int:
+        """Get the number of observations for a label set"""
+        series = self._series.get(labelvalues)
+        return int(sum(series[:-1])) if series else 0
+
+    def header(self) -> List[str]:
+        """Render the HELP and TYPE lines"""
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+
+    def samples(self, extra: str = "") -> List[str]:
+        """Render cumulative buckets, sum and count, with extra label pairs on each"""
+        lines = []
+        le_prefix = f'{extra},le=' if extra else 'le='
+        for labelvalues, series in sorted(self._series.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), series[:-1]):
+                cumulative += bucket_count
+                le = _format_labels(self.labelnames, labelvalues, f'{le_prefix}"{_format_value(bound)}"')
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            labels = _format_labels(self.labelnames, labelvalues, extra)
+            lines.append(f"{self.name}_sum{labels} {_format_value(series[-1])}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+    def render(self, extra: str = "") -> List[str]:
+        """Render cumulative buckets, sum and count in Prometheus text format"""
+        return self.header() + self.samples(extra)
+
+
+class MetricsRegistry:
+    """Collection of metrics exposed together at /metrics"""
+
+    def __init__(self):
+        self._metrics = {}
+
+    def register(self, metric):
+        """Add a metric to the registry and return it"""
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        """Create and register a counter"""
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, callback: Callable[[], float] = None) -> Gauge:
+        """Create and register a gauge"""
+        return self.register(Gauge(name, documentation, callback))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ) -> Histogram:
+        """Create and register a histogram"""
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def samples(self, extra: str = "") -> Dict[str, List[str]]:
+        """
+        Render the sample lines of every metric, without HELP and TYPE
+
+        Args:
+            extra: Label pairs added to every sample, e.g. 'worker="0"'
+
+        Returns:
+            Metric name -> sample lines
+        """
+        return {name: metric.samples(extra) for name, metric in self._metrics.items()}
+
+    def render(self, extra: str = "", peers: Optional[Sequence[Dict[str, List[str]]]] = None) -> str:
+        """
+        Render all metrics in Prometheus text exposition format
+
+        Args:
+            extra: Label pairs added to every sample, e.g. 'worker="0"'
+            peers: Output of samples() from other processes; their lines
+                are listed under the same metric families as ours
+
+        Returns:
+            Exposition text ending with a newline
+        """
+        lines = []
+        for name, metric in self._metrics.items():
+            lines.extend(metric.render(extra))
+            for peer in peers or ():
+                lines.extend(peer.get(name, ()))
+        return "\n".join(lines) + "\n"
+
+
+# Process-wide registry and the request pipeline metrics
+REGISTRY = MetricsRegistry()
+
+STAGE_LATENCY = REGISTRY.histogram(
+    "assistant_stage_duration_seconds",
+    "Latency of each command processing stage",
+    labelnames=("stage", "intent", "cache")
+)
+REQUEST_LATENCY = REGISTRY.histogram(
+    "assistant_request_duration_seconds",
+    "Total command processing latency",
+    labelnames=("intent", "cache")
+)
+INTENTS_TOTAL = REGISTRY.counter(
+    "assistant_intents_total",
+    "Commands processed by detected intent",
+    labelnames=("intent",)
+)
+UNKNOWN_INTENTS_TOTAL = REGISTRY.counter(
+    "assistant_unknown_intents_total",
+    "Commands whose intent could not be detected"
+)
+TTS_CACHE_TOTAL = REGISTRY.counter(
+    "assistant_tts_segment_cache_total",
+    "Sentence segments requested from the TTS scheduler by cache outcome",
+    labelnames=("outcome",)
+)
+TTS_FAILURES_TOTAL = REGISTRY.counter(
+    "assistant_tts_failures_total",
+    "Sentence segments whose synthesis failed"
+)
+TTS_QUEUE_WAIT = REGISTRY.histogram(
+    "assistant_tts_queue_wait_seconds",
+    "Time a synthesis job waited in the TTS queue",
+    labelnames=("priority",)
+)
+SPECULATIONS_TOTAL = REGISTRY.counter(
+    "assistant_speculations_total",
+    "Responses started from interim transcripts by outcome (started, reused, discarded)",
+    labelnames=("outcome",)
+)
+ANALYTICS_RECORDS_TOTAL = REGISTRY.counter(
+    "assistant_analytics_records_total",
+    "Interaction records by outcome (written, dropped when the buffer is full, failed to write)",
+    labelnames=("outcome",)
+)
+RATE_LIMITED_TOTAL = REGISTRY.counter(
+    "assistant_rate_limited_total",
+    "Requests rejected with 429 by endpoint and limit (user, ip)",
+    labelnames=("path", "scope")
+)
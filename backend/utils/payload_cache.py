@@ -0,0 +1,127 @@
+"""
+Precomputed response payloads for Urdu Voice Assistant
+Serializes read-mostly JSON payloads once per data version, with a strong ETag
+
+Endpoints whose content only changes when the underlying data changes
+(/, /commands, /intents) keep a ready-to-send body. Each request then
+costs a version check and, for clients that send If-None-Match, an empty
+304 response.
+"""
+
+import hashlib
+from pathlib import Path
+from typing import Any, Callable, Dict, Hashable, Optional
+import sys
+
+from fastapi import Request, Response
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from config import STATIC_PAYLOAD_MAX_AGE
+from utils.json_response import dumps
+
+
+def _cache_control(max_age: int) -> str:
+    """Cache-Control value: always revalidate, or allow caching for max_age seconds"""
+    return "no-cache" if max_age <= 0 else f"public, max-age={max_age}"
+
+
+class PrecomputedPayload:
+    """A serialized JSON body with its strong ETag"""
+
+    __slots__ = ('version', 'body', 'etag', 'headers')
+
+    def __init__(self, version: Hashable, content: Any, max_age: int = STATIC_PAYLOAD_MAX_AGE):
+        """
+        Serialize a payload
+
+        Args:
+            version: Data version the payload was built from
+            content: JSON-serializable content
+            max_age: Seconds clients may reuse the payload without revalidating
+        """
+        self.version = version
+        self.body = dumps(content)
+        self.etag = f'"{hashlib.sha256(self.body).hexdigest()[:32]}"'
+        self.headers = {'ETag': self.etag, 'Cache-Control': _cache_control(max_age)}
+
+    def matches(self, if_none_match: Optional[str]) -> bool:
+        """
+        Check an If-None-Match header against this payload's ETag
+
+        Uses the weak comparison RFC 9110 prescribes for If-None-Match.
+        """
+        if not if_none_match:
+            return False
+        if if_none_match.strip() == '*':
+            return True
+        for tag in if_none_match.split(','):
+            tag = tag.strip()
+            if tag.startswith('W/'):
+                tag = tag[2:]
+            if tag == self.etag:
+                return True
+        return False
+
+    def respond(self, request: Request) -> Response:
+        """
+        Build the response for a request
+
+        Returns:
+            304 Not Modified if the client already has this version, else
+            200 with the precomputed body
+        """
+        if self.matches(request.headers.get('if-none-match')):
+            return Response(status_code=304, headers=self.headers)
+        return Response(content=self.body, media_type='application/json', headers=self.headers)
+
+
+class PayloadCache:
+    """Named precomputed payloads, rebuilt only when their data version changes"""
+
+    def __init__(self):
+        self._payloads: Dict[str, PrecomputedPayload] = {}
+        self._builds = 0
+
+    def get(self, name: str, version: Hashable, build: Callable[[], Any]) -> PrecomputedPayload:
+        """
+        Get a payload, building it if missing or stale
+
+        Args:
+            name: Payload name
+            version: Current version of the data behind it
+            build: Returns the content; only called on a miss
+
+        Returns:
+            PrecomputedPayload for this version
+
+        Example:
+            >>> payloads.get('intents', detector.version, lambda: {...}).respond(request)
+        """
+        payload = self._payloads.get(name)
+        if payload is None or payload.version != version:
+            payload = PrecomputedPayload(version, build())
+            self._payloads[name] = payload
+            self._builds += 1
+        return payload
+
+    def invalidate(self, name: Optional[str] = None):
+        """Drop one payload, or all of them"""
+        if name is None:
+            self._payloads.clear()
+        else:
+            self._payloads.pop(name, None)
+
+    def get_stats(self) -> Dict:
+        """
+        Get cache contents
+
+        Returns:
+            Dictionary with payload names, sizes, ETags and build count
+        """
+        return {
+            'builds': self._builds,
+            'payloads': {
+                name: {'bytes': len(payload.body), 'etag': payload.etag}
+                for name, payload in self._payloads.items()
+            }
+        }
@@ -0,0 +1,216 @@
+"""
+Request profiling utility for Urdu Voice Assistant
+Runs cProfile around selected command requests and stores pstats files
+
+A request is profiled when it carries the admin token in the X-Profile
+header or when it is picked by PROFILE_SAMPLE_RATE. With no admin token
+and a zero sample rate the profiler is inactive and the request path only
+checks one boolean.
+
+The profiler is switched on only while the profiled coroutine itself is
+running, and off whenever it awaits. Other requests that the event loop
+interleaves do not show up in its profile. Work done in TTS worker
+threads or processes appears as time spent awaiting.
+"""
+
+import asyncio
+import cProfile
+import hmac
+import json
+import random
+import re
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Coroutine, Dict, List, Optional
+import sys
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from config import ADMIN_TOKEN, PROFILE_DIR, PROFILE_SAMPLE_RATE, PROFILE_MAX_FILES
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+PROFILE_HEADER = "X-Profile"
+PROFILE_SUFFIX = ".prof"
+
+_PROFILE_NAME = re.compile(r"^profile_[0-9_]+_[a-z]+\.prof$")
+
+
+class _ProfiledCoroutine:
+    """Awaitable that drives a coroutine with the profiler enabled only during its steps"""
+
+    def __init__(self, coro: Coroutine, profiler: cProfile.Profile):
+        self.coro = coro
+        self.profiler = profiler
+
+    def __await__(self):
+        coro, profiler = self.coro, self.profiler
+        value, error = None, None
+        while True:
+            profiler.enable()
+            try:
+                if error is not None:
+                    yielded = coro.throw(error)
+                else:
+                    yielded = coro.send(value)
+            except StopIteration as stop:
+                return stop.value
+            finally:
+                profiler.disable()
+            try:
+                value, error = (yield yielded), None
+            except BaseException as e:
+                value, error = None, e
+
+
+class RequestProfiler:
+    """Decides which requests to profile and stores their profiles"""
+
+    def __init__(
+        self,
+        directory: Path = PROFILE_DIR,
+        admin_token: str = ADMIN_TOKEN,
+        sample_rate: float = PROFILE_SAMPLE_RATE,
+        max_files: int = PROFILE_MAX_FILES
+    ):
+        """
+        Initialize request profiler
+
+        Args:
+            directory: Where profiles are written
+            admin_token: Token accepted in the X-Profile header (empty disables it)
+            sample_rate: Fraction (0.0-1.0) of requests profiled without a header
+            max_files: Number of newest profiles kept
+        """
+        self.directory = Path(directory)
+        self.admin_token = admin_token
+        self.sample_rate = min(max(sample_rate, 0.0), 1.0)
+        self.max_files = max_files
+        # Checked on every request; everything else is only touched when True
+        self.active = bool(admin_token) or self.sample_rate > 0
+        self._written = 0
+
+    def select(self, header_value: Optional[str]) -> Optional[str]:
+        """
+        Decide whether to profile a request
+
+        Args:
+            header_value: Value of the X-Profile header, if any
+
+        Returns:
+            'header' or 'sampled' when the request should be profiled, else None
+        """
+        if header_value and self.admin_token and _tokens_match(header_value, self.admin_token):
+            return 'header'
+        if self.sample_rate > 0 and random.random() < self.sample_rate:
+            return 'sampled'
+        return None
+
+    async def run(self, coro: Coroutine, trigger: str, label: Dict[str, Any]) -> Any:
+        """
+        Await a coroutine under cProfile and save the profile
+
+        Args:
+            coro: Coroutine to run (e.g. CommandService.process_command(...))
+            trigger: 'header' or 'sampled'
+            label: Request details stored next to the profile
+
+        Returns:
+            The coroutine's result
+        """
+        profiler = cProfile.Profile()
+        started = time.perf_counter()
+        try:
+            return await _ProfiledCoroutine(coro, profiler)
+        finally:
+            wall_ms = (time.perf_counter() - started) * 1000
+            try:
+                await asyncio.to_thread(self._save, profiler, trigger, label, wall_ms)
+            except Exception as e:
+                logger.error(f"❌ Failed to save profile: {e}")
+
+    def _save(self, profiler: cProfile.Profile, trigger: str, label: Dict[str, Any], wall_ms: float):
+        """Write the pstats file and its JSON sidecar, then prune old profiles"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        name = f"profile_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}_{trigger}{PROFILE_SUFFIX}"
+        path = self.directory / name
+        profiler.dump_stats(str(path))
+        meta = dict(label, trigger=trigger, wall_ms=round(wall_ms, 3), created=datetime.now().isoformat())
+        path.with_suffix(".json").write_text(json.dumps(meta, ensure_ascii=False), encoding='utf-8')
+        self._written += 1
+        logger.info(f"🔬 Profile saved: {name} ({wall_ms:.1f} ms, {trigger})")
+        self._prune()
+
+    def _prune(self):
+        """Keep only the newest max_files profiles"""
+        profiles = sorted(self.directory.glob(f"profile_*{PROFILE_SUFFIX}"))
+        for path in profiles[:max(0, len(profiles) - self.max_files)]:
+            path.unlink(missing_ok=True)
+            path.with_suffix(".json").unlink(missing_ok=True)
+
+    def list_profiles(self) -> List[Dict]:
+        """
+        List stored profiles, newest first
+
+        Returns:
+            List of dictionaries with file name, size and request details
+        """
+        if not self.directory.exists():
+            return []
+        profiles = []
+        for path in sorted(self.directory.glob(f"profile_*{PROFILE_SUFFIX}"), reverse=True):
+            entry = {'name': path.name, 'size_bytes': path.stat().st_size}
+            try:
+                entry.update(json.loads(path.with_suffix(".json").read_text(encoding='utf-8')))
+            except (OSError, ValueError):
+                pass
+            profiles.append(entry)
+        return profiles
+
+    def get_profile_path(self, name: str) -> Optional[Path]:
+        """
+        Resolve a profile file name safely
+
+        Args:
+            name: File name as returned by list_profiles()
+
+        Returns:
+            Path to the file, or None if the name is invalid or missing
+        """
+        if not _PROFILE_NAME.match(name):
+            return None
+        path = self.directory / name
+        return path if path.is_file() else None
+
+    def get_stats(self) -> Dict:
+        """
+        Get profiler settings and counters
+
+        Returns:
+            Dictionary with active flag, trigger settings and profiles written
+        """
+        return {
+            'active': self.active,
+            'header_enabled': bool(self.admin_token),
+            'sample_rate': self.sample_rate,
+            'written': self._written
+        }
+
+
+def is_admin(token: Optional[str]) -> bool:
+    """
+    Check an admin token against ADMIN_TOKEN in constant time
+
+    Args:
+        token: Token sent by the client
+
+    Returns:
+        True only if admin access is configured and the token matches
+    """
+    return bool(ADMIN_TOKEN) and bool(token) and _tokens_match(token, ADMIN_TOKEN)
+
+
+def _tokens_match(given: str, expected: str) -> bool:
+    """Constant-time comparison that also accepts non-ASCII header values"""
+    return hmac.compare_digest(given.encode('utf-8'), expected.encode('utf-8'))
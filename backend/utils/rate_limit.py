@@ -0,0 +1,332 @@
+"""
+Client rate limiting for Urdu Voice Assistant
+Token buckets per user and per client IP, checked before a request runs
+
+Each limited endpoint (RATE_LIMITS) lets a user make `per_minute` requests
+per minute after an initial burst. The client IP has its own bucket,
+RATE_LIMIT_IP_FACTOR times larger, and both must admit a request: a client
+cannot escape its limit by sending a new user_id every time, and users
+behind one NAT do not starve each other. A rejected request consumes no
+tokens.
+
+A bucket is stored as one float, the time at which it will be full again
+(the "theoretical arrival time" form of a token bucket, GCRA). Refill is
+lazy: the tokens a bucket holds follow from that time and the clock when
+its key is next seen. A full bucket carries no state, so it is simply
+dropped. Keys are kept in least-recently-used order and every check
+drops a few full buckets from the front, so idle clients free their
+memory without a sweep, and RATE_LIMIT_MAX_KEYS caps the total.
+
+Buckets are per process. Under serve.py with N workers, a client whose
+connections land on different workers may get up to N times the limit.
+
+Behind a reverse proxy every connection comes from the proxy, so
+ForwardedClientMiddleware replaces the client address with the one the
+proxy forwarded, for peers listed in FORWARDED_ALLOW_IPS only.
+"""
+
+import math
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+import sys
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from config import (
+    FORWARDED_ALLOW_IPS,
+    RATE_LIMIT_ENABLED,
+    RATE_LIMITS,
+    RATE_LIMIT_IP_FACTOR,
+    RATE_LIMIT_MAX_KEYS,
+    SESSION_MAX_USER_ID_LENGTH
+)
+from utils.json_response import dumps, loads
+from utils.logger import setup_logger
+from utils.metrics import RATE_LIMITED_TOTAL
+
+logger = setup_logger(__name__)
+
+USER_ID_HEADER = b"x-user-id"
+FORWARDED_FOR_HEADER = b"x-forwarded-for"
+MAX_PARSED_BODY_BYTES = 8192  # Larger bodies are not searched for a user_id
+EXPIRE_PER_CHECK = 4  # Full buckets dropped per check (keeps each check O(1))
+
+
+class _Limit:
+    """Rate of one bucket as GCRA parameters"""
+
+    __slots__ = ('interval', 'tolerance')
+
+    def __init__(self, per_minute: float, burst: float):
+        # Seconds one request costs, and how far ahead of the clock a burst may run
+        self.interval = 60.0 / max(per_minute, 0.001)
+        self.tolerance = self.interval * (max(burst, 1) - 1)
+
+
+class RateLimiter:
+    """Per-endpoint token buckets for users and client IPs"""
+
+    def __init__(
+        self,
+        limits: Dict[str, Tuple[float, int]] = RATE_LIMITS,
+        ip_factor: float = RATE_LIMIT_IP_FACTOR,
+        max_keys: int = RATE_LIMIT_MAX_KEYS,
+        enabled: bool = RATE_LIMIT_ENABLED
+    ):
+        """
+        Initialize rate limiter
+
+        Args:
+            limits: Path -> (requests per minute, burst) for one user
+            ip_factor: Multiple of the user limit allowed per client IP
+            max_keys: Buckets kept at most (least recently used go first)
+            enabled: Limit requests at all
+        """
+        self.enabled = enabled
+        self.max_keys = max(1, max_keys)
+        self._limits: Dict[str, Tuple[_Limit, _Limit]] = {
+            path: (_Limit(per_minute, burst), _Limit(per_minute * ip_factor, burst * ip_factor))
+            for path, (per_minute, burst) in limits.items()
+        }
+        # Path -> (user buckets, IP buckets), each key -> time the bucket is full again
+        self._buckets: Dict[str, Tuple[OrderedDict, OrderedDict]] = {
+            path: (OrderedDict(), OrderedDict()) for path in limits
+        }
+        self.paths = frozenset(limits) if enabled else frozenset()
+        self._size = 0
+        self.stats = {'admitted': 0, 'limited': 0, 'expired': 0, 'evicted': 0}
+
+    def acquire(self, path: str, client_ip: str, user_id: Optional[str] = None) -> float:
+        """
+        Take a token from the user's and the client IP's bucket
+
+        Args:
+            path: Request path (paths without a limit are always admitted)
+            client_ip: Client address
+            user_id: User identifier, if the request carries one
+
+        Returns:
+            0.0 if the request is admitted, else the seconds until it would be
+
+        Example:
+            >>> wait = limiter.acquire("/api/v1/test-speech", "203.0.113.7", "user123")
+            >>> wait == 0.0
+            True
+        """
+        limits = self._limits.get(path)
+        if limits is None or not self.enabled:
+            return 0.0
+        now = time.monotonic()
+        user_limit, ip_limit = limits
+        user_buckets, ip_buckets = self._buckets[path]
+
+        ip_full_at = ip_buckets.get(client_ip, now)
+        if ip_full_at < now:
+            ip_full_at = now
+        wait = ip_full_at - ip_limit.tolerance - now
+        scope = 'ip'
+        if user_id:
+            user_full_at = user_buckets.get(user_id, now)
+            if user_full_at < now:
+                user_full_at = now
+            user_wait = user_full_at - user_limit.tolerance - now
+            if user_wait > wait:
+                wait, scope = user_wait, 'user'
+
+        if wait > 0:
+            self.stats['limited'] += 1
+            RATE_LIMITED_TOTAL.inc(path, scope)
+            return wait
+
+        self._store(ip_buckets, client_ip, ip_full_at + ip_limit.interval, now)
+        if user_id:
+            self._store(user_buckets, user_id, user_full_at + user_limit.interval, now)
+        self.stats['admitted'] += 1
+        return 0.0
+
+    def _store(self, buckets: OrderedDict, key: str, full_at: float, now: float):
+        """Save a bucket as most recently used and drop full or excess ones"""
+        if key in buckets:
+            buckets[key] = full_at
+            buckets.move_to_end(key)
+        else:
+            buckets[key] = full_at
+            self._size += 1
+
+        # The bucket just stored is never full, so the loop stops at it
+        for _ in range(EXPIRE_PER_CHECK):
+            oldest, oldest_full_at = next(iter(buckets.items()))
+            if oldest_full_at > now:
+                break
+            del buckets[oldest]
+            self._size -= 1
+            self.stats['expired'] += 1
+
+        if self._size > self.max_keys:
+            # Forgets the least recently used client's debt; counted, and only under key floods
+            buckets.popitem(last=False)
+            self._size -= 1
+            self.stats['evicted'] += 1
+
+    def get_stats(self) -> Dict:
+        """
+        Get limiter counters
+
+        Returns:
+            Dictionary with enabled flag, tracked buckets, limits and counters
+        """
+        return {
+            'enabled': self.enabled,
+            'buckets': self._size,
+            'max_keys': self.max_keys,
+            'limits_per_minute': {
+                path: round(60.0 / user_limit.interval, 2)
+                for path, (user_limit, _) in self._limits.items()
+            },
+            **self.stats
+        }
+
+
+def retry_after(wait: float) -> int:
+    """Whole seconds for a Retry-After header (at least 1)"""
+    return max(1, math.ceil(wait))
+
+
+_TOO_MANY_REQUESTS = dumps({'detail': 'Too many requests, please slow down'})
+
+
+class RateLimitMiddleware:
+    """
+    Pure ASGI middleware answering 429 with Retry-After for clients over
+    their limit; requests to other paths pass with one set lookup
+
+    The user comes from the X-User-ID header or, for POST requests, from
+    the user_id field of a JSON body (read once and replayed to the app).
+    The client IP is the ASGI client address (see ForwardedClientMiddleware).
+    """
+
+    def __init__(self, app, limiter: RateLimiter):
+        self.app = app
+        self.limiter = limiter
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or scope['path'] not in self.limiter.paths or scope['method'] == 'OPTIONS':
+            await self.app(scope, receive, send)
+            return
+
+        user_id = _header(scope, USER_ID_HEADER)
+        if user_id is None and scope['method'] == 'POST':
+            body, receive = await _buffer_body(receive)
+            user_id = _body_user_id(body)
+        if user_id is not None and len(user_id) > SESSION_MAX_USER_ID_LENGTH:
+            user_id = None
+
+        client = scope.get('client')
+        wait = self.limiter.acquire(scope['path'], client[0] if client else 'unknown', user_id)
+        if wait > 0:
+            logger.debug("🚦 Rate limited %s (user: %s)", scope['path'], user_id or 'anonymous')
+            await send({
+                'type': 'http.response.start',
+                'status': 429,
+                'headers': [
+                    (b'content-type', b'application/json'),
+                    (b'content-length', str(len(_TOO_MANY_REQUESTS)).encode()),
+                    (b'retry-after', str(retry_after(wait)).encode())
+                ]
+            })
+            await send({'type': 'http.response.body', 'body': _TOO_MANY_REQUESTS})
+            return
+
+        await self.app(scope, receive, send)
+
+
+class ForwardedClientMiddleware:
+    """
+    Pure ASGI middleware that sets the client address of HTTP and WebSocket
+    requests from X-Forwarded-For when the connecting peer is a trusted proxy
+
+    Entries are read from the right, skipping trusted proxies; entries to
+    the left of the first untrusted one were written by the client and are
+    ignored. With "*" every peer is trusted and the rightmost entry, the
+    address the nearest proxy saw, is used. uvicorn's own proxy header
+    handling is turned off (serve.py, main.py) because with "*" it takes
+    the leftmost entry, which the client chooses.
+    """
+
+    def __init__(self, app, trusted: str = FORWARDED_ALLOW_IPS):
+        hosts = {host.strip() for host in trusted.split(',') if host.strip()}
+        self.app = app
+        self.always_trust = '*' in hosts
+        self.trusted = frozenset(hosts - {'*'})
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] in ('http', 'websocket'):
+            client = scope.get('client')
+            if client is not None and (self.always_trust or client[0] in self.trusted):
+                forwarded = _header(scope, FORWARDED_FOR_HEADER)
+                host = self.client_host(forwarded) if forwarded else None
+                if host:
+                    scope['client'] = (host, 0)
+        await self.app(scope, receive, send)
+
+    def client_host(self, forwarded: str) -> Optional[str]:
+        """
+        Pick the client address from an X-Forwarded-For value
+
+        Args:
+            forwarded: Header value, e.g. "198.51.100.4, 10.0.0.2"
+
+        Returns:
+            Client address, None if every entry is a trusted proxy
+        """
+        hosts = [host.strip() for host in forwarded.split(',')]
+        if self.always_trust:
+            return hosts[-1]
+        for host in reversed(hosts):
+            if host not in self.trusted:
+                return host
+        return None
+
+
+def _header(scope, name: bytes) -> Optional[str]:
+    """First value of a request header, None if absent"""
+    for key, value in scope['headers']:
+        if key == name:
+            return value.decode('latin-1')
+    return None
+
+
+async def _buffer_body(receive):
+    """
+    Read the whole request body
+
+    Returns:
+        Tuple of (body, receive callable that replays the messages read)
+    """
+    messages = []
+    while True:
+        message = await receive()
+        messages.append(message)
+        if message['type'] != 'http.request' or not message.get('more_body', False):
+            break
+    body = b''.join(message.get('body', b'') for message in messages)
+
+    async def replay():
+        if messages:
+            return messages.pop(0)
+        return await receive()
+
+    return body, replay
+
+
+def _body_user_id(body: bytes) -> Optional[str]:
+    """user_id field of a JSON object body, None if there is none"""
+    if not body or len(body) > MAX_PARSED_BODY_BYTES:
+        return None
+    try:
+        data = loads(body)
+    except ValueError:
+        return None
+    user_id = data.get('user_id') if isinstance(data, dict) else None
+    return user_id if isinstance(user_id, str) and user_id else None
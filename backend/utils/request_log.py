@@ -0,0 +1,161 @@
+"""
+Structured request log for Urdu Voice Assistant
+Writes one JSON line per processed command to logs/requests_YYYYMMDD.jsonl
+
+The record is a plain dict handed to the shared logging queue; JSON
+serialization and the file write happen on the listener thread. Successful
+requests are sampled with REQUEST_LOG_SAMPLE_RATE; errors, unknown intents
+and rejected requests are always logged. User text is only stored when
+REQUEST_LOG_INCLUDE_TEXT is set (the file then doubles as a replay corpus
+for tools/replay_load.py).
+"""
+
+import random
+import time
+from pathlib import Path
+from typing import Dict, Optional
+import sys
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from config import (
+    AUDIO_OUTPUT_DIR,
+    REQUEST_LOG_ENABLED,
+    REQUEST_LOG_SAMPLE_RATE,
+    REQUEST_LOG_INCLUDE_TEXT
+)
+from utils.logger import setup_jsonl_logger
+
+REQUEST_LOG_PREFIX = "requests"
+
+# Outcomes that are logged regardless of sampling
+ALWAYS_LOGGED_STATUSES = ('error', 'busy')
+
+
+class RequestLog:
+    """Sampled JSONL log of processed commands"""
+
+    def __init__(
+        self,
+        enabled: bool = REQUEST_LOG_ENABLED,
+        sample_rate: float = REQUEST_LOG_SAMPLE_RATE,
+        audio_dir: Path = AUDIO_OUTPUT_DIR,
+        include_text: bool = REQUEST_LOG_INCLUDE_TEXT
+    ):
+        """
+        Initialize request log
+
+        Args:
+            enabled: Write records at all
+            sample_rate: Fraction (0.0-1.0) of successful requests written
+            audio_dir: Directory used to look up audio file sizes
+            include_text: Store the user's text, not just its length
+        """
+        self.enabled = enabled
+        self.sample_rate = min(max(sample_rate, 0.0), 1.0)
+        self.audio_dir = Path(audio_dir)
+        self.include_text = include_text
+        self._logger = setup_jsonl_logger("request_log", REQUEST_LOG_PREFIX) if enabled else None
+        self._written = 0
+        self._sampled_out = 0
+
+    def should_log(self, status: str, intent: Optional[str]) -> bool:
+        """
+        Decide whether a request is written
+
+        Args:
+            status: 'ok', 'error' or 'busy'
+            intent: Detected intent (unknown intents are always logged)
+
+        Returns:
+            True if the record should be written
+        """
+        if not self.enabled:
+            return False
+        if self._always_logged(status, intent):
+            return True
+        if self.sample_rate >= 1.0 or random.random() < self.sample_rate:
+            return True
+        self._sampled_out += 1
+        return False
+
+    @staticmethod
+    def _always_logged(status: str, intent: Optional[str]) -> bool:
+        """Whether a request bypasses sampling"""
+        return status in ALWAYS_LOGGED_STATUSES or intent == 'unknown'
+
+    def record(
+        self,
+        status: str,
+        user_id: Optional[str] = None,
+        text: str = "",
+        intent: Optional[str] = None,
+        confidence: Optional[float] = None,
+        language: Optional[str] = None,
+        cache: str = 'none',
+        timings: Optional[Dict[str, float]] = None,
+        audio_file: Optional[str] = None,
+        response_text: str = ""
+    ):
+        """
+        Write one request record if it passes sampling
+
+        Args:
+            status: 'ok', 'error' or 'busy'
+            user_id: User identifier
+            text: User command text (only its length unless include_text)
+            intent: Detected intent
+            confidence: Intent confidence score
+            language: Speech language
+            cache: Audio cache outcome ('hit', 'miss', 'error', 'none')
+            timings: Stage durations in seconds
+            audio_file: Generated audio file name
+            response_text: Response text (only its length is logged)
+        """
+        if not self.should_log(status, intent):
+            return
+
+        entry = {
+            'ts': round(time.time(), 3),
+            'status': status,
+            'user': user_id,
+            'intent': intent,
+            'confidence': round(confidence, 3) if confidence is not None else None,
+            'lang': language,
+            'cache': cache,
+            'text_len': len(text),
+            'response_len': len(response_text),
+            'audio_bytes': self._audio_size(audio_file),
+            'ms': {stage: round(seconds * 1000, 3) for stage, seconds in (timings or {}).items()}
+        }
+        if self.include_text:
+            entry['text'] = text
+        # Only sampled records stand for more than one request; always-logged
+        # ones carry no rate so analyzers count them once
+        if self.sample_rate < 1.0 and not self._always_logged(status, intent):
+            entry['sample_rate'] = self.sample_rate
+
+        self._logger.info(entry)
+        self._written += 1
+
+    def _audio_size(self, audio_file: Optional[str]) -> Optional[int]:
+        """Size in bytes of a generated audio file, None if missing"""
+        if not audio_file:
+            return None
+        try:
+            return (self.audio_dir / audio_file).stat().st_size
+        except OSError:
+            return None
+
+    def get_stats(self) -> Dict:
+        """
+        Get request log counters
+
+        Returns:
+            Dictionary with enabled flag, sample rate and record counts
+        """
+        return {
+            'enabled': self.enabled,
+            'sample_rate': self.sample_rate,
+            'written': self._written,
+            'sampled_out': self._sampled_out
+        }
@@ -0,0 +1,161 @@
+"""
+Local stand-in for a Redis server
+In-memory RESP server with the commands RedisCache uses
+
+For development and benchmarks without a Redis installation: several
+local processes (or serve.py workers) can share a cache through it, and
+benchmarks/bench_cache_backend.py runs the network backend against it.
+It is single-process and keeps nothing on disk; use a real Redis server
+in production.
+
+Supported: PING, GET, MGET, SET (EX/PX), DEL, EXISTS, SELECT, AUTH,
+FLUSHDB, DBSIZE.
+
+Usage:
+    cd backend
+    python -m utils.resp_server [--host 127.0.0.1] [--port 6379]
+"""
+
+import argparse
+import asyncio
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+import sys
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+
+def _bulk(value: Optional[bytes]) -> bytes:
+    return b'$-1\r\n' if value is None else b'$%d\r\n%s\r\n' % (len(value), value)
+
+
+class LocalRespServer:
+    """Minimal in-memory Redis protocol server"""
+
+    def __init__(self):
+        self._data: Dict[bytes, Tuple[bytes, float]] = {}  # key -> (value, expires)
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._clients = set()
+        self.commands = 0
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> int:
+        """
+        Start listening
+
+        Args:
+            host: Interface to bind
+            port: Port to bind (0 picks a free one)
+
+        Returns:
+            The bound port
+        """
+        self._server = await asyncio.start_server(self._serve, host, port)
+        return self._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        """Stop listening and close all client connections"""
+        if self._server is not None:
+            self._server.close()
+            for task in list(self._clients):
+                task.cancel()
+            await asyncio.gather(*self._clients, return_exceptions=True)
+            await self._server.wait_closed()
+            self._server = None
+
+    def _get(self, key: bytes) -> Optional[bytes]:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        value, expires = entry
+        if expires and expires < time.monotonic():
+            del self._data[key]
+            return None
+        return value
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        task = asyncio.current_task()
+        self._clients.add(task)
+        try:
+            while True:
+                command = await self._read_command(reader)
+                if command is None:
+                    break
+                self.commands += 1
+                writer.write(self._dispatch(command))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            pass
+        finally:
+            self._clients.discard(task)
+            writer.close()
+
+    @staticmethod
+    async def _read_command(reader: asyncio.StreamReader) -> Optional[List[bytes]]:
+        line = await reader.readline()
+        if not line:
+            return None
+        if not line.startswith(b'*'):
+            # Inline command (e.g. typed into telnet)
+            return line.split()
+        args = []
+        for _ in range(int(line[1:-2])):
+            length = int((await reader.readline())[1:-2])
+            args.append((await reader.readexactly(length + 2))[:-2])
+        return args
+
+    def _dispatch(self, args: List[bytes]) -> bytes:
+        name = args[0].upper() if args else b''
+        if name == b'PING':
+            return b'+PONG\r\n'
+        if name in (b'SELECT', b'AUTH'):
+            return b'+OK\r\n'
+        if name == b'GET' and len(args) == 2:
+            return _bulk(self._get(args[1]))
+        if name == b'MGET' and len(args) > 1:
+            return b'*%d\r\n' % (len(args) - 1) + b''.join(_bulk(self._get(key)) for key in args[1:])
+        if name == b'SET' and len(args) >= 3:
+            expires = 0.0
+            options = [arg.upper() for arg in args[3:]]
+            if b'EX' in options:
+                expires = time.monotonic() + int(args[3 + options.index(b'EX') + 1])
+            elif b'PX' in options:
+                expires = time.monotonic() + int(args[3 + options.index(b'PX') + 1]) / 1000
+            self._data[args[1]] = (args[2], expires)
+            return b'+OK\r\n'
+        if name in (b'DEL', b'EXISTS') and len(args) > 1:
+            present = [key for key in args[1:] if self._get(key) is not None]
+            if name == b'DEL':
+                for key in present:
+                    del self._data[key]
+            return b':%d\r\n' % len(present)
+        if name == b'FLUSHDB':
+            self._data.clear()
+            return b'+OK\r\n'
+        if name == b'DBSIZE':
+            return b':%d\r\n' % len(self._data)
+        return b'-ERR unknown or malformed command ' + name + b'\r\n'
+
+
+async def _main(host: str, port: int):
+    server = LocalRespServer()
+    bound = await server.start(host, port)
+    logger.info(f"🗄️ Local cache server listening on {host}:{bound}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to bind")
+    parser.add_argument("--port", type=int, default=6379, help="Port to bind")
+    args = parser.parse_args()
+    try:
+        asyncio.run(_main(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
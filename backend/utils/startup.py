@@ -0,0 +1,137 @@
+"""
+Cold start timing for Urdu Voice Assistant
+Measures the time from process start to the first served request
+
+Milestones (main module imported, services ready, first response sent)
+are recorded as seconds since the process started, read from procfs.
+Where procfs is not available, they are measured from the moment this
+module was imported. The first-request total is checked against
+STARTUP_BUDGET_MS.
+"""
+
+import os
+import time
+from pathlib import Path
+from typing import Dict, Optional
+import sys
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from config import STARTUP_BUDGET_MS
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+_IMPORTED_AT = time.perf_counter()
+
+
+def _process_age() -> Optional[float]:
+    """Seconds since this process started (Linux procfs, 10 ms resolution), or None"""
+    try:
+        with open('/proc/self/stat', 'r') as stat:
+            # Field 22 (starttime) counts clock ticks since boot; comm (field 2) may contain spaces
+            fields = stat.read().rsplit(')', 1)[1].split()
+        with open('/proc/uptime', 'r') as uptime:
+            since_boot = float(uptime.read().split()[0])
+        return max(0.0, since_boot - int(fields[19]) / os.sysconf('SC_CLK_TCK'))
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class StartupTimer:
+    """Records startup milestones relative to process start"""
+
+    def __init__(self, budget_ms: float = STARTUP_BUDGET_MS):
+        """
+        Initialize timer
+
+        Args:
+            budget_ms: Allowed time from process start to the first served request
+        """
+        self.budget_ms = budget_ms
+        self._reset(fallback_origin=_IMPORTED_AT)
+
+    def _reset(self, fallback_origin: float):
+        """Set time zero to the process start (or fallback_origin) and clear milestones"""
+        age = _process_age()
+        self.source = 'process' if age is not None else 'import'
+        # perf_counter value that corresponds to time zero
+        self._origin = time.perf_counter() - age if age is not None else fallback_origin
+        self.milestones: Dict[str, float] = {}
+        self.first_request_done = False
+
+    def restart(self):
+        """
+        Measure again from the start of this process
+
+        Called in a forked worker: the milestones recorded by the parent
+        before the fork are dropped and time zero becomes the fork.
+        """
+        self._reset(fallback_origin=time.perf_counter())
+
+    def mark(self, name: str) -> float:
+        """
+        Record a milestone
+
+        Args:
+            name: Milestone name
+
+        Returns:
+            Milliseconds since time zero
+        """
+        elapsed_ms = (time.perf_counter() - self._origin) * 1000
+        self.milestones[name] = round(elapsed_ms, 1)
+        return elapsed_ms
+
+    def first_request(self, path: str):
+        """Record the first served request and check it against the budget"""
+        if self.first_request_done:
+            return
+        self.first_request_done = True
+        elapsed_ms = self.mark('first_request')
+        if elapsed_ms > self.budget_ms:
+            logger.warning(
+                f"🐌 Cold start over budget: first request ({path}) served after "
+                f"{elapsed_ms:.0f} ms (budget {self.budget_ms:.0f} ms) - {self.milestones}"
+            )
+        else:
+            logger.info(f"⚡ Cold start: first request ({path}) served after {elapsed_ms:.0f} ms")
+
+    def get_stats(self) -> Dict:
+        """
+        Get recorded milestones
+
+        Returns:
+            Dictionary with milestones in ms, time-zero source and budget
+        """
+        return {
+            'measured_from': self.source,
+            'budget_ms': self.budget_ms,
+            'milestones_ms': dict(self.milestones),
+            'within_budget': (
+                self.milestones['first_request'] <= self.budget_ms
+                if 'first_request' in self.milestones else None
+            )
+        }
+
+
+class FirstRequestMiddleware:
+    """
+    Pure ASGI middleware that tells a StartupTimer when the first HTTP
+    response has been sent; after that it only checks one boolean
+    """
+
+    def __init__(self, app, timer: StartupTimer):
+        self.app = app
+        self.timer = timer
+
+    async def __call__(self, scope, receive, send):
+        if self.timer.first_request_done or scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message):
+            await send(message)
+            if message['type'] == 'http.response.body' and not message.get('more_body', False):
+                self.timer.first_request(scope.get('path', ''))
+
+        await self.app(scope, receive, send_wrapper)
@@ -0,0 +1,201 @@
+"""
+Per-worker statistics shared between pre-forked server processes
+Each worker publishes its counters into a fixed slot of a shared memory board
+
+serve.py creates the board in the parent before forking, so every worker
+(and the parent) maps the same pages. A worker only ever writes its own
+slot; any worker can read all slots to answer /api/v1/stats/workers with
+per-worker figures and their aggregate. Each slot carries a sequence
+number (odd while a write is in progress) so readers never return a
+half-written record.
+
+Prometheus samples do not fit fixed fields, so workers also publish them
+as one small file per slot in a directory the parent creates
+(WorkerMetricsExchange); the worker answering /metrics adds the others'
+latest samples to its own.
+"""
+
+import mmap
+import os
+import shutil
+import struct
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from utils.json_response import dumps, loads
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Slot layout: sequence, then the published fields in FIELDS order
+_FIELDS = (
+    ('pid', 'q'),
+    ('started_at', 'd'),
+    ('updated_at', 'd'),
+    ('restarts', 'q'),
+    ('commands', 'q'),
+    ('synthesized', 'q'),
+    ('rss_bytes', 'q'),
+    ('pss_bytes', 'q'),
+    ('private_bytes', 'q'),
+)
+FIELDS = tuple(name for name, _ in _FIELDS)
+_SEQ = struct.Struct('<Q')
+_RECORD = struct.Struct('<' + ''.join(code for _, code in _FIELDS))
+_SLOT_SIZE = _SEQ.size + _RECORD.size
+
+# Summed across workers in the aggregate
+_SUMMED = ('restarts', 'commands', 'synthesized', 'rss_bytes', 'pss_bytes', 'private_bytes')
+
+
+class WorkerStatsBoard:
+    """Fixed-size table of worker records in anonymous shared memory"""
+
+    def __init__(self, slots: int):
+        """
+        Initialize board (before forking, so children inherit the mapping)
+
+        Args:
+            slots: Number of worker slots
+        """
+        if slots < 1:
+            raise ValueError("slots must be at least 1")
+        self.slots = slots
+        # Anonymous mappings are MAP_SHARED: writes are visible across fork()
+        self._buffer = mmap.mmap(-1, _SLOT_SIZE * slots)
+
+    def write(self, slot: int, **values):
+        """
+        Update fields of one slot (only the owner of the slot may call this)
+
+        Args:
+            slot: Slot index
+            **values: Field name -> value; unspecified fields keep their value
+        """
+        unknown = set(values) - set(FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown worker stats fields: {sorted(unknown)}")
+        offset = slot * _SLOT_SIZE
+        seq = _SEQ.unpack_from(self._buffer, offset)[0]
+        record = dict(zip(FIELDS, _RECORD.unpack_from(self._buffer, offset + _SEQ.size)))
+        record.update(values)
+
+        _SEQ.pack_into(self._buffer, offset, seq + 1)
+        _RECORD.pack_into(self._buffer, offset + _SEQ.size, *(record[name] for name in FIELDS))
+        _SEQ.pack_into(self._buffer, offset, seq + 2)
+
+    def read(self, slot: int, retries: int = 100) -> Optional[Dict]:
+        """
+        Read one slot
+
+        Args:
+            slot: Slot index
+            retries: Attempts while the owner is mid-write
+
+        Returns:
+            Dictionary of fields, or None if the slot was never used
+        """
+        offset = slot * _SLOT_SIZE
+        for _ in range(retries):
+            before = _SEQ.unpack_from(self._buffer, offset)[0]
+            if before % 2:
+                continue
+            values = _RECORD.unpack_from(self._buffer, offset + _SEQ.size)
+            if _SEQ.unpack_from(self._buffer, offset)[0] == before:
+                record = dict(zip(FIELDS, values))
+                return record if record['pid'] else None
+        return None
+
+    def snapshot(self) -> Dict:
+        """
+        Get every used slot plus the aggregate over all workers
+
+        Returns:
+            Dictionary with 'workers' (list) and 'aggregate'
+
+        Example:
+            >>> board.snapshot()['aggregate']['workers']
+            4
+        """
+        now = time.time()
+        workers: List[Dict] = []
+        for slot in range(self.slots):
+            record = self.read(slot)
+            if record is None:
+                continue
+            record['slot'] = slot
+            record['uptime_seconds'] = round(now - record['started_at'], 1)
+            record['seconds_since_update'] = (
+                round(now - record['updated_at'], 1) if record['updated_at'] else None
+            )
+            workers.append(record)
+
+        aggregate = {'workers': len(workers)}
+        for name in _SUMMED:
+            aggregate[name] = sum(worker[name] for worker in workers)
+        return {'workers': workers, 'aggregate': aggregate}
+
+
+class WorkerMetricsExchange:
+    """Latest Prometheus samples of each worker, one JSON file per slot"""
+
+    def __init__(self, directory: Path, max_age: float):
+        """
+        Initialize exchange (before forking, so every worker uses the same directory)
+
+        Args:
+            directory: Existing directory private to this server
+            max_age: Seconds after which a worker's samples are considered
+                stale (the worker hung or is gone) and left out
+        """
+        self.directory = Path(directory)
+        self.max_age = max_age
+
+    def _path(self, slot: int) -> Path:
+        return self.directory / f"worker-{slot}.json"
+
+    def publish(self, slot: int, samples: Dict[str, List[str]]):
+        """
+        Replace one slot's samples (only the owner of the slot may call this)
+
+        Args:
+            slot: Slot index
+            samples: Metric name -> sample lines, as from MetricsRegistry.samples()
+        """
+        path = self._path(slot)
+        temporary = path.with_suffix(f".{os.getpid()}.tmp")
+        try:
+            temporary.write_bytes(dumps(samples))
+            # Atomic rename: readers see the old file or the new one, never half of it
+            os.replace(temporary, path)
+        except OSError as e:
+            logger.warning(f"⚠️ Could not publish metrics for slot {slot}: {e}")
+
+    def collect(self, exclude_slot: int) -> List[Dict[str, List[str]]]:
+        """
+        Read the samples of every other worker
+
+        Args:
+            exclude_slot: The caller's own slot, rendered from its live registry
+
+        Returns:
+            List of metric name -> sample lines, one per fresh worker
+        """
+        now = time.time()
+        peers = []
+        for path in sorted(self.directory.glob("worker-*.json")):
+            if path.name == self._path(exclude_slot).name:
+                continue
+            try:
+                if now - path.stat().st_mtime > self.max_age:
+                    continue
+                peers.append(loads(path.read_bytes()))
+            except (OSError, ValueError):
+                # Replaced or removed while reading; the next scrape picks it up
+                continue
+        return peers
+
+    def close(self):
+        """Remove the directory (parent process, after all workers stopped)"""
+        shutil.rmtree(self.directory, ignore_errors=True)
@@ -26,12 +26,23 @@ apiClient.interceptors.response.use(
   }
 );
 
+// One conversation per page load; the backend keeps its turns as history
+const SESSION_ID = 'web-' + Date.now().toString(36) + Math.random().toString(36).slice(2, 8);
+
 const api = {
   processCommand: async (text, language = 'auto') => {
     const response = await apiClient.post(API_ENDPOINTS.PROCESS_COMMAND, {
       text,
       language,
-      user_id: 'web_user_' + Date.now()
+      user_id: 'web_user_' + Date.now(),
+      session_id: SESSION_ID
+    });
+    return response.data;
+  },
+
+  getHistory: async (limit) => {
+    const response = await apiClient.get(`${API_ENDPOINTS.HISTORY}/${SESSION_ID}`, {
+      params: limit ? { limit } : {}
     });
     return response.data;
   },
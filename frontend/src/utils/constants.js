@@ -4,6 +4,7 @@ export const API_ENDPOINTS = {
   PROCESS_COMMAND: '/api/v1/process-command',
   GET_AUDIO: '/api/v1/audio',
   GET_COMMANDS: '/api/v1/commands',
+  HISTORY: '/api/v1/history',
   HEALTH: '/health',
 };
 